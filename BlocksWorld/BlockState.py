@@ -0,0 +1,164 @@
+"""
+Scalable block names and an integer-array Blocks World state.
+
+generate_configurations named blocks with chr(ord('A') + i), so past N = 26 the names walked into
+'[', '\\', ']', ... 'a'..'z' and beyond (ambiguous in prompts and in the move parser), the viewer
+only had colours for 'A'..'Z', and every simulate_moves call copied the whole list of stacks of
+one-character strings (once per streamed move in stepwise mode).
+
+Names: 'A'..'Z' for N <= 26, so the prompts and results of the paper sizes do not change, and
+'B1'..'BN' beyond that. Both parse back to a 0-based integer ID with `block_id`.
+
+State: each stack is an array('I') of block IDs (bottom first), so a move is validated and applied
+in place in O(1) (pop + append, top check on the last item) and the state never has to be copied
+while a sequence of moves is simulated. Names are only rebuilt for prompts, checkpoints and the
+viewer (to_lists).
+
+Example:
+    block_names(3)       # ['A', 'B', 'C'];  block_names(30)[:3] -> ['B1', 'B2', 'B3']
+    state = BlockState.from_lists([["B1", "B2"], ["B3"], []])
+    state.apply(["B3", 1, 2])                # O(1), in place; ValueError if illegal
+    state.to_lists()     # [['B1', 'B2'], [], ['B3']]
+"""
+import re
+from array import array
+
+LETTERS = 26
+_NAME = re.compile(r"([A-Z])|B([1-9]\d*)")
+
+
+#####NAMES#####
+def block_names(N: int) -> list:
+    """Names of N blocks: single letters up to 26 blocks, B1..BN beyond."""
+    if N <= LETTERS:
+        return [chr(ord('A') + i) for i in range(N)]
+    return [f"B{i + 1}" for i in range(N)]
+
+
+def block_id(name) -> int:
+    """'A' -> 0, 'Z' -> 25, 'B1' -> 0, 'B70' -> 69. Raises ValueError for any other name."""
+    match = _NAME.fullmatch(str(name).strip())
+    if not match:
+        raise ValueError(f"❌ Nombre de bloque inválido: {name!r} (se esperaba 'A'..'Z' o 'B1'..'BN')")
+    letter, number = match.groups()
+    return ord(letter) - ord('A') if letter else int(number) - 1
+
+
+#####STATE#####
+class BlockState:
+    __slots__ = ("stacks", "names", "ids")
+
+    def __init__(self, stacks: list, names: dict):
+        self.stacks = stacks          # una array('I') de IDs por stack (de abajo arriba)
+        self.names = names            # ID -> nombre tal como llegó
+        self.ids = {name: block for block, name in names.items()}
+
+    @classmethod
+    def from_lists(cls, state) -> "BlockState":
+        """
+        [["A", "B"], ["C"], []] -> BlockState. Raises ValueError on unknown or repeated names.
+        """
+        if isinstance(state, BlockState):
+            return state.copy()
+        names, stacks = {}, []
+        for stack in state:
+            ids = array('I')
+            for name in stack:
+                block = block_id(name)
+                if block in names:
+                    raise ValueError(f"❌ Estado inválido: bloque {name} repetido: {state}")
+                names[block] = name
+                ids.append(block)
+            stacks.append(ids)
+        return cls(stacks, names)
+
+    def copy(self) -> "BlockState":
+        return BlockState([array('I', stack) for stack in self.stacks], self.names)
+
+    #####QUERIES#####
+    def top(self, stack: int):
+        """Name of the top block of `stack`, or None if it is empty."""
+        ids = self.stacks[stack]
+        return self.names[ids[-1]] if ids else None
+
+    def to_lists(self) -> list:
+        names = self.names
+        return [[names[block] for block in stack] for stack in self.stacks]
+
+    def __len__(self):
+        return len(self.stacks)
+
+    def __eq__(self, other):
+        if isinstance(other, BlockState):
+            return self.stacks == other.stacks
+        if isinstance(other, (list, tuple)):
+            return self.to_lists() == [list(stack) for stack in other]
+        return NotImplemented
+
+    def __repr__(self):
+        return repr(self.to_lists())
+
+    #####MOVES#####
+    def apply(self, move) -> "BlockState":
+        """
+        Applies [block, from_stack, to_stack] in place, O(1), and returns the state. Raises
+        ValueError with the messages of simulate_moves.
+        """
+        block, from_stack, to_stack = move
+        stacks = self.stacks
+        if not (isinstance(from_stack, int) and isinstance(to_stack, int)
+                and 0 <= from_stack < len(stacks) and 0 <= to_stack < len(stacks)):
+            raise ValueError(f"❌ Índices de stack inválidos: {from_stack} -> {to_stack}")
+        source = stacks[from_stack]
+        if not source:
+            raise ValueError(f"❌ Stack {from_stack} está vacío, no se puede mover {block}")
+        if source[-1] != self.ids.get(block if isinstance(block, str) else str(block), -1):
+            raise ValueError(f"❌ El bloque {block} no está en la cima del stack {from_stack}")
+        stacks[to_stack].append(source.pop())
+        return self
+
+    def apply_all(self, moves) -> "BlockState":
+        for move in moves:
+            self.apply(move)
+        return self
+
+    @staticmethod
+    def apply_move(state: "BlockState", move) -> "BlockState":
+        """apply_move(state, move) -> state, for StreamingMoveValidator (no copies)."""
+        return state.apply(move)
+
+
+if __name__ == "__main__":
+    # Comparación con la simulación anterior (listas de strings) y tiempos para N = 100..2000
+    import time
+    from BlocksWorldPlanner import generate_configurations, plan
+
+    def legacy_simulate(initial_state, moves):
+        state = [stack.copy() for stack in initial_state]
+        for block, from_stack, to_stack in moves:
+            if not state[from_stack] or state[from_stack][-1] != block:
+                raise ValueError(block)
+            state[to_stack].append(state[from_stack].pop())
+        return state
+
+    for N in (4, 26, 27, 100, 500, 2000):
+        initial_state, goal_state = generate_configurations(N)
+        names = [block for stack in initial_state for block in stack]
+        assert len(set(names)) == N and [block_id(name) for name in sorted(names, key=block_id)] == list(range(N))
+        moves = plan(initial_state, goal_state)["moves"]
+        assert BlockState.from_lists(initial_state).apply_all(moves) == legacy_simulate(initial_state, moves) == goal_state
+
+        # Stepwise en streaming: antes se copiaba el estado entero en cada movimiento validado
+        t0 = time.perf_counter()
+        state = initial_state
+        for move in moves:
+            state = legacy_simulate(state, [move])
+        t_legacy = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        state = BlockState.from_lists(initial_state)
+        for move in moves:
+            state = BlockState.apply_move(state, move)
+        t_state = time.perf_counter() - t0
+        assert state == goal_state
+        print(f"N={N:3d} | nombres {names[0]}..{names[-1]} | movimiento a movimiento: listas "
+              f"{1000 * t_legacy:7.2f} ms, BlockState {1000 * t_state:6.2f} ms")
@@ -0,0 +1,311 @@
+"""
+A* planner and optimal-length oracle for Blocks World.
+
+BlocksWorldSolver asks the model for "the minimum sequence of moves" but the minimum was never
+computed, so runs could only be scored ok / fail. `plan(initial, goal)` searches the move graph
+(top block of one stack onto another stack) with A*:
+
+    h(state)    blocks that are not on their final support, i.e. outside the longest prefix that
+                their stack already shares with the same goal stack. Each of them has to move at
+                least once, so h is admissible, and a move changes it by at most one (consistent).
+                It is updated in O(1) per move from the per-stack prefix lengths.
+    states      blocks are renumbered 0..N-1 and every stack is a bytes object (a tuple of ints
+                above 255 blocks), so a state is a small hashable tuple; a transposition table
+                keeps the best g of every state seen.
+
+Ties on f prefer the deepest node, so instances where h is exact (e.g. generate_configurations,
+whose optimum is N moves) are solved expanding N nodes. weight > 1 gives weighted A*: plans at
+most `weight` times longer than the optimum, for start / goal pairs where plain A* is too slow.
+
+    plan(initial, goal)                 {"moves", "length", "optimal", "bound", "expansions"}
+    optimal_length(N)                   optimum of the generate_configurations(N) instance (cached)
+    annotate_csv(csv_path)              results CSV + optimal_moves column -> *_annotated.csv
+
+Example:
+    result = plan([["A", "B"], ["C"], []], [["A"], ["B"], ["C"]])
+    # {'moves': [['C', 1, 2], ['B', 0, 1]], 'length': 2, 'optimal': True, 'bound': 1.0, 'expansions': 2}
+"""
+import csv
+import heapq
+import math
+import os
+import re
+from functools import lru_cache
+
+from BlockState import block_names
+
+# Límite de nodos expandidos por búsqueda (memoria acotada en instancias difíciles)
+MAX_EXPANSIONS = 2_000_000
+
+
+#####INSTANCES#####
+def generate_configurations(N: int) -> tuple:
+    """
+    Genera las configuraciones inicial y objetivo según las reglas del problema.
+    Si N es impar, la primera pila tendrá un bloque más que la segunda.
+    """
+    if N < 1:
+        raise ValueError("N debe ser al menos 1")
+
+    # Bloques A..Z hasta 26 y B1..BN a partir de ahí (BlockState.block_names)
+    blocks = block_names(N)
+
+    # Configuración inicial: distribuir bloques entre las dos primeras pilas
+    # Si N es par: N/2 en cada pila
+    # Si N es impar: (N+1)/2 en la primera pila, (N-1)/2 en la segunda
+    first_stack_size = (N + 1) // 2  # Esto da el tamaño correcto para N par e impar
+    second_stack_size = N // 2
+
+    initial_state = [
+        blocks[:first_stack_size],
+        blocks[first_stack_size:first_stack_size + second_stack_size],
+        []
+    ]
+
+    # Configuración objetivo: patrón intercalado inverso en pila 2 (stack vacío inicial)
+    # Para N=4: ["A","B"], ["C","D"], [] -> [[], [], ["D","B","C","A"]]
+    # Para N=5: ["A","B","C"], ["D","E"], [] -> [[], [], ["E","C","D","B","A"]]
+    # Para N=6: ["A","B","C"], ["D","E","F"], [] -> [[], [], ["F","C","E","B","D","A"]]
+
+    goal_blocks = []
+    stack1_blocks = blocks[first_stack_size:first_stack_size + second_stack_size][::-1]  # Segunda pila invertida
+    stack0_blocks = blocks[:first_stack_size][::-1]  # Primera pila invertida
+
+    # Intercalar: empezar con el último de la segunda pila (si existe)
+    # Luego alternar entre las dos pilas
+    max_len = max(len(stack0_blocks), len(stack1_blocks))
+
+    for i in range(max_len):
+        # Primero de la segunda pila (si existe)
+        if i < len(stack1_blocks):
+            goal_blocks.append(stack1_blocks[i])
+        # Luego de la primera pila
+        if i < len(stack0_blocks):
+            goal_blocks.append(stack0_blocks[i])
+
+    goal_state = [[], [], goal_blocks]
+
+    return initial_state, goal_state
+
+
+#####STATES#####
+def _encode(state: list, ids: dict) -> tuple:
+    if len(ids) < 256:
+        return tuple(bytes(ids[block] for block in stack) for stack in state)
+    return tuple(tuple(ids[block] for block in stack) for stack in state)
+
+
+def _prefix(stack, goal_stack) -> int:
+    """Length of the common bottom part of a stack and its goal stack (blocks on their final support)."""
+    n = 0
+    for block, goal_block in zip(stack, goal_stack):
+        if block != goal_block:
+            break
+        n += 1
+    return n
+
+
+def _check_instance(initial: list, goal: list):
+    if len(initial) != len(goal):
+        raise ValueError(f"❌ El estado inicial tiene {len(initial)} stacks y el objetivo {len(goal)}.")
+    blocks = [block for stack in initial for block in stack]
+    if sorted(blocks) != sorted(block for stack in goal for block in stack) or len(set(blocks)) != len(blocks):
+        raise ValueError("❌ El estado inicial y el objetivo deben tener los mismos bloques, sin repetir.")
+    return blocks
+
+
+#####SEARCH#####
+def plan(initial: list, goal: list, weight: float = 1.0, max_expansions: int = MAX_EXPANSIONS) -> dict:
+    """
+    (Weighted) A* from `initial` to `goal` (lists of stacks, bottom first). With weight=1 the plan
+    is optimal; otherwise its length is at most `weight` times the optimum. Raises ValueError if
+    the search expands more than `max_expansions` nodes.
+    """
+    if weight < 1:
+        raise ValueError("❌ weight debe ser ≥ 1 (weight=1 es A* óptimo).")
+    names = _check_instance(initial, goal)
+    ids = {block: i for i, block in enumerate(names)}
+    start, target = _encode(initial, ids), _encode(goal, ids)
+    unit = (lambda block: bytes((block,))) if isinstance(start[0], bytes) else (lambda block: (block,))
+    stacks, n = len(start), len(names)
+
+    prefixes = tuple(_prefix(stack, goal_stack) for stack, goal_stack in zip(start, target))
+    h = n - sum(prefixes)
+    # Nodo: (f, -g, contador, estado, prefijos); a igual f se expande el más profundo
+    open_list = [(weight * h, 0, 0, start, prefixes)]
+    best_g = {start: 0}
+    parent = {start: None}
+    counter = expansions = 0
+
+    while open_list:
+        _, neg_g, _, state, prefixes = heapq.heappop(open_list)
+        g = -neg_g
+        if best_g[state] < g:
+            continue                                   # entrada obsoleta de la tabla
+        if state == target:
+            break
+        expansions += 1
+        if expansions > max_expansions:
+            raise ValueError(f"❌ Búsqueda abortada tras {max_expansions} expansiones; prueba con weight > 1.")
+        h = n - sum(prefixes)
+        for a in range(stacks):
+            source = state[a]
+            if not source:
+                continue
+            block = source[-1]
+            rest = source[:-1]
+            prefix_a = min(prefixes[a], len(rest))
+            for b in range(stacks):
+                if b == a:
+                    continue
+                dest = state[b]
+                prefix_b = prefixes[b]
+                # El bloque queda sobre su soporte final si la pila destino ya coincide con el objetivo
+                gained = prefix_b == len(dest) and len(target[b]) > prefix_b and target[b][prefix_b] == block
+                new_prefixes = list(prefixes)
+                new_prefixes[a] = prefix_a
+                new_prefixes[b] = prefix_b + 1 if gained else prefix_b
+                child = list(state)
+                child[a], child[b] = rest, dest + unit(block)
+                child = tuple(child)
+                if best_g.get(child, g + 2) <= g + 1:
+                    continue
+                best_g[child] = g + 1
+                parent[child] = (state, [names[block], a, b])
+                child_h = h + (prefixes[a] - prefix_a) - (1 if gained else 0)
+                counter += 1
+                heapq.heappush(open_list, (g + 1 + weight * child_h, -(g + 1), counter, child, tuple(new_prefixes)))
+    else:
+        raise ValueError("❌ No existe ningún plan entre los dos estados.")
+
+    moves, node = [], target
+    while parent[node] is not None:
+        node, move = parent[node]
+        moves.append(move)
+    moves.reverse()
+    return {"moves": moves, "length": len(moves), "optimal": weight == 1, "bound": float(weight),
+            "expansions": expansions}
+
+
+@lru_cache(maxsize=None)
+def optimal_length(N: int) -> int:
+    """Minimal number of moves of the generate_configurations(N) instance."""
+    return plan(*generate_configurations(N))["length"]
+
+
+#####ANNOTATION#####
+def annotate_csv(csv_path: str, out_path: str = None) -> str:
+    """
+    Copies a BlocksWorld results CSV adding `optimal_moves` (and, for stepwise rows, the
+    `min_iterations` needed at p moves per call and the `iterations` actually used). N and p are
+    read from the N column or from the 'N20_p25_...' run name; runs on an InstanceGenerator
+    instance ('..._8x3-17') take its stored exact length (blank if the planner had only a bound).
+    The original file is not changed.
+    """
+    out_path = out_path or csv_path[:-len(".csv")] + "_annotated.csv"
+    with open(csv_path, newline='') as file:
+        reader = csv.DictReader(file)
+        headers = list(reader.fieldnames)
+        rows = list(reader)
+
+    stepwise = any(header.startswith("tokens_total_iter") for header in headers)
+    extra = ['optimal_moves'] + (['min_iterations', 'iterations'] if stepwise else [])
+    with open(out_path, mode='w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=headers + extra)
+        writer.writeheader()
+        for row in rows:
+            match = re.match(r'N(\d+)(?:_p(\d+))?_', row["Name"])
+            instance = re.search(r'_(\d+x\d+-\d+)', row["Name"])
+            N = int(row.get("N") or (match.group(1) if match else 0))
+            if instance:
+                # Instancia aleatoria de InstanceGenerator: longitud ya calculada (vacía sin óptimo exacto)
+                from InstanceGenerator import load_instance
+                row["optimal_moves"] = load_instance(instance.group(1))["optimal_moves"]
+            elif N >= 1:
+                row["optimal_moves"] = optimal_length(N)
+            if stepwise and row.get("optimal_moves") and match and match.group(2):
+                row["min_iterations"] = math.ceil(row["optimal_moves"] / int(match.group(2)))
+            if stepwise:
+                row["iterations"] = sum(1 for header in headers
+                                        if header.startswith("tokens_total_iter") and row[header] not in ('', None))
+            writer.writerow(row)
+    return out_path
+
+
+if __name__ == "__main__":
+    # Comprobación frente a BFS (instancias aleatorias pequeñas), tiempos y anotación de los resultados
+    import random
+    import time
+    from collections import deque
+
+    def bfs_length(initial, goal):
+        start = tuple(tuple(stack) for stack in initial)
+        target = tuple(tuple(stack) for stack in goal)
+        depth, queue = {start: 0}, deque([start])
+        while queue:
+            state = queue.popleft()
+            if state == target:
+                return depth[state]
+            for a, source in enumerate(state):
+                for b in range(len(state)):
+                    if source and b != a:
+                        child = list(state)
+                        child[a], child[b] = source[:-1], state[b] + source[-1:]
+                        child = tuple(child)
+                        if child not in depth:
+                            depth[child] = depth[state] + 1
+                            queue.append(child)
+
+    def random_state(blocks, stacks, rng):
+        state = [[] for _ in range(stacks)]
+        for block in rng.sample(blocks, len(blocks)):
+            state[rng.randrange(stacks)].append(block)
+        return state
+
+    rng = random.Random(0)
+    for _ in range(300):
+        n, stacks = rng.randint(1, 6), rng.randint(2, 4)
+        blocks = [chr(ord('A') + i) for i in range(n)]
+        initial, goal = random_state(blocks, stacks, rng), random_state(blocks, stacks, rng)
+        if bfs_length(initial, goal) is None:
+            # Con 2 stacks no todas las permutaciones son alcanzables
+            try:
+                plan(initial, goal)
+            except ValueError:
+                continue
+            raise AssertionError((initial, goal))
+        result = plan(initial, goal)
+        state = [stack.copy() for stack in initial]
+        for block, a, b in result["moves"]:
+            assert state[a][-1] == block
+            state[b].append(state[a].pop())
+        assert state == goal and result["length"] == bfs_length(initial, goal), (initial, goal)
+        assert plan(initial, goal, weight=2)["length"] <= 2 * result["length"]
+    print("✅ A* = BFS en 300 instancias aleatorias (N ≤ 6, 2-4 stacks); weight=2 dentro de la cota")
+
+    for N in (4, 10, 20, 50, 80, 200):
+        t0 = time.perf_counter()
+        result = plan(*generate_configurations(N))
+        print(f"generate_configurations({N:3d}) | óptimo {result['length']:3d} movimientos | "
+              f"{result['expansions']:3d} expansiones | {1000 * (time.perf_counter() - t0):7.1f} ms")
+
+    # Instancias aleatorias con 3 stacks: h es débil y el A* óptimo deja de ser práctico hacia N = 12
+    for n in (8, 10, 12, 16):
+        blocks = [chr(ord('A') + i) for i in range(n)]
+        initial, goal = random_state(blocks, 3, rng), random_state(blocks, 3, rng)
+        for weight in (1, 1.5, 3):
+            t0 = time.perf_counter()
+            try:
+                result = plan(initial, goal, weight=weight, max_expansions=300_000)
+            except ValueError as e:
+                print(f"aleatoria N={n:2d} weight={weight:<3} | {e}")
+                continue
+            print(f"aleatoria N={n:2d} weight={weight:<3} | {result['length']:2d} movimientos | "
+                  f"{result['expansions']:7d} expansiones | {time.perf_counter() - t0:6.2f} s")
+
+    for name in ("blocks_world_baseline.csv", "blocks_world_steps.csv"):
+        path = os.path.join("results", name)
+        if os.path.exists(path):
+            t0 = time.perf_counter()
+            out_path = annotate_csv(path)
+            print(f"📄 {out_path} ({time.perf_counter() - t0:.2f} s)")
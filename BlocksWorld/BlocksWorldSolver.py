@@ -6,118 +6,32 @@ import re
 import ast
 import csv
 from datetime import datetime
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Harness"))
+from rateLimiter import get_limiter
+from clientPool import get_genai_client, timed
+from moveParser import parse_move_lists
+from BlocksWorldPlanner import generate_configurations, optimal_length
+from BlockState import BlockState
 
 # Configura la API
-client = genai.Client(api_key=os.getenv("GEMINI_API_KEY_HANOI"))
+client = get_genai_client("GEMINI_API_KEY_HANOI")
 
 # Parámetro configurable: Número de bloques
 N = 70  # Cambia este valor para probar con diferentes N (debe ser par)
 
-#####FUNCTION FOR GENERATING INITIAL AND GOAL CONFIGURATIONS#####
-def generate_configurations(N: int) -> tuple:
-    """
-    Genera las configuraciones inicial y objetivo según las reglas del problema.
-    Si N es impar, la primera pila tendrá un bloque más que la segunda.
-    """
-    if N < 1:
-        raise ValueError("N debe ser al menos 1")
-    
-    # Bloques alfabéticos
-    blocks = [chr(ord('A') + i) for i in range(N)]
-    
-    # Configuración inicial: distribuir bloques entre las dos primeras pilas
-    # Si N es par: N/2 en cada pila
-    # Si N es impar: (N+1)/2 en la primera pila, (N-1)/2 en la segunda
-    first_stack_size = (N + 1) // 2  # Esto da el tamaño correcto para N par e impar
-    second_stack_size = N // 2
-    
-    initial_state = [
-        blocks[:first_stack_size], 
-        blocks[first_stack_size:first_stack_size + second_stack_size], 
-        []
-    ]
-    
-    # Configuración objetivo: patrón intercalado inverso en pila 2 (stack vacío inicial)
-    # Para N=4: ["A","B"], ["C","D"], [] -> [[], [], ["D","B","C","A"]]
-    # Para N=5: ["A","B","C"], ["D","E"], [] -> [[], [], ["E","C","D","B","A"]]
-    # Para N=6: ["A","B","C"], ["D","E","F"], [] -> [[], [], ["F","C","E","B","D","A"]]
-    
-    goal_blocks = []
-    stack1_blocks = blocks[first_stack_size:first_stack_size + second_stack_size][::-1]  # Segunda pila invertida
-    stack0_blocks = blocks[:first_stack_size][::-1]  # Primera pila invertida
-    
-    # Intercalar: empezar con el último de la segunda pila (si existe)
-    # Luego alternar entre las dos pilas
-    max_len = max(len(stack0_blocks), len(stack1_blocks))
-    
-    for i in range(max_len):
-        # Primero de la segunda pila (si existe)
-        if i < len(stack1_blocks):
-            goal_blocks.append(stack1_blocks[i])
-        # Luego de la primera pila
-        if i < len(stack0_blocks):
-            goal_blocks.append(stack0_blocks[i])
-    
-    goal_state = [[], [], goal_blocks]
-    
-    return initial_state, goal_state
-
 #####FUNCTION FOR EXTRACTING MOVES VECTOR#####
 def extract_moves_vector(response_text: str) -> list[list]:
-    # Buscar la línea que contiene "moves = ["
-    match = re.search(r'moves\s*=\s*\[.*\]', response_text, re.DOTALL)
-    if not match:
-        raise ValueError("❌ No se encontró 'moves = [' en la respuesta.")
-    
-    raw_block = match.group(0).split('=')[1].strip()
-    
-    # Remover líneas que empiecen con # (comentarios)
-    lines = raw_block.split('\n')
-    cleaned_lines = [line for line in lines if not line.strip().startswith('#')]
-    cleaned_block = '\n'.join(cleaned_lines).strip()
-    
-    # Remover cualquier texto después del último ]
-    end = cleaned_block.rfind(']')
-    if end != -1:
-        cleaned_block = cleaned_block[:end+1]
-    
-    try:
-        moves = ast.literal_eval(cleaned_block)
-    except Exception as e:
-        raise ValueError(f"❌ Error al convertir el bloque a lista: {e}")
-    
-    if not (isinstance(moves, list) and all(isinstance(m, list) and len(m) == 3 for m in moves)):
-        raise ValueError("❌ El contenido extraído no es una lista válida de movimientos.")
-    
-    return moves
+    # Analizar en una sola pasada el bloque "moves = [...]" (moveParser.parse_move_lists)
+    return parse_move_lists(response_text, marker="moves")
 
 #####FUNCTION FOR SIMULATING MOVES#####
 def simulate_moves(initial_state: list, moves: list) -> list:
     """
     Simula la secuencia de movimientos en el BlocksWorld.
+    El estado se convierte una vez a arrays de IDs (BlockState) y cada movimiento es O(1).
     """
-    state = [stack.copy() for stack in initial_state]
-    
-    for move in moves:
-        block, from_stack, to_stack = move
-        
-        # Verificar que el stack origen no esté vacío
-        if not state[from_stack]:
-            raise ValueError(f"❌ Stack {from_stack} está vacío, no se puede mover {block}")
-        
-        # Verificar que el bloque en la cima coincida
-        if state[from_stack][-1] != block:
-            raise ValueError(f"❌ El bloque {block} no está en la cima del stack {from_stack}")
-        
-        # Verificar que los índices de stack sean válidos
-        if from_stack < 0 or from_stack >= len(state) or to_stack < 0 or to_stack >= len(state):
-            raise ValueError(f"❌ Índices de stack inválidos: {from_stack} -> {to_stack}")
-        
-        # Ejecutar movimiento
-        moved_block = state[from_stack].pop()
-        state[to_stack].append(moved_block)
-    
-    return state
+    return BlockState.from_lists(initial_state).apply_all(moves).to_lists()
 
 # Generar configuraciones
 initial_state, goal_state = generate_configurations(N)
@@ -160,7 +74,7 @@ Goal state:
 Find the minimum sequence of moves to transform the initial state into the goal state. Remember that only the topmost block of each stack can be moved.
 """
 
-response = client.models.generate_content(
+response = get_limiter("gemini").call(timed("gemini", client.models.generate_content),
     model="gemini-2.5-pro-preview-06-05",
     config=types.GenerateContentConfig(
         system_instruction=system_instruction,
@@ -199,6 +113,7 @@ try:
     if final_state == goal_state:
         success = True
         print("🎯 ¡Configuración objetivo alcanzada!")
+        print(f"📐 {len(moves)} movimientos (óptimo A*: {optimal_length(N)})")
     else:
         print("❌ El estado final no coincide con el objetivo.")
         
@@ -5,14 +5,26 @@ import json
 import re
 import ast
 import csv
+import threading
 from datetime import datetime
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Harness"))
+from rateLimiter import get_limiter
+from clientPool import get_genai_client, timed
+from checkpoint import CHECKPOINT_DIR, Checkpoint
+from moveParser import parse_move_lists, StreamingMoveValidator
+from streaming import add_stream_columns, stream_gemini
+from BlocksWorldPlanner import generate_configurations, optimal_length
+from BlockState import BlockState
+from InstanceGenerator import load_instance, sample_instances
 
 # Configura la API
-client = genai.Client(api_key=os.getenv("GEMINI_API_KEY_HANOI"))
+client = get_genai_client("GEMINI_API_KEY_HANOI")
 
 # Parámetros configurables
 N = 20  # Número de bloques (usar números pequeños para stepwise)
 p = 25  # Número de pasos por iteración
+MODEL_NAME = "gemini-2.5-pro-preview-06-05"
 
 #####FUNCTION FOR BUILDING THE PROMPT#####
 def build_blocks_prompt(current_state: list, goal_state: list, N: int, p: int) -> str:
@@ -48,62 +60,13 @@ Rules:
 Find the next {p} moves to transform the current state closer to the goal state.
 """
     return prompt
-#####FUNCTION FOR GENERATING INITIAL AND GOAL CONFIGURATIONS#####
-def generate_configurations(N: int) -> tuple:
-    """
-    Genera las configuraciones inicial y objetivo según las reglas del problema.
-    Si N es impar, la primera pila tendrá un bloque más que la segunda.
-    """
-    if N < 1:
-        raise ValueError("N debe ser al menos 1")
-    
-    # Bloques alfabéticos
-    blocks = [chr(ord('A') + i) for i in range(N)]
-    
-    # Configuración inicial: distribuir bloques entre las dos primeras pilas
-    # Si N es par: N/2 en cada pila
-    # Si N es impar: (N+1)/2 en la primera pila, (N-1)/2 en la segunda
-    first_stack_size = (N + 1) // 2  # Esto da el tamaño correcto para N par e impar
-    second_stack_size = N // 2
-    
-    initial_state = [
-        blocks[:first_stack_size], 
-        blocks[first_stack_size:first_stack_size + second_stack_size], 
-        []
-    ]
-    
-    # Configuración objetivo: patrón intercalado inverso en pila 2 (stack vacío inicial)
-    # Para N=4: ["A","B"], ["C","D"], [] -> [[], [], ["D","B","C","A"]]
-    # Para N=5: ["A","B","C"], ["D","E"], [] -> [[], [], ["E","C","D","B","A"]]
-    # Para N=6: ["A","B","C"], ["D","E","F"], [] -> [[], [], ["F","C","E","B","D","A"]]
-    
-    goal_blocks = []
-    stack1_blocks = blocks[first_stack_size:first_stack_size + second_stack_size][::-1]  # Segunda pila invertida
-    stack0_blocks = blocks[:first_stack_size][::-1]  # Primera pila invertida
-    
-    # Intercalar: empezar con el último de la segunda pila (si existe)
-    # Luego alternar entre las dos pilas
-    max_len = max(len(stack0_blocks), len(stack1_blocks))
-    
-    for i in range(max_len):
-        # Primero de la segunda pila (si existe)
-        if i < len(stack1_blocks):
-            goal_blocks.append(stack1_blocks[i])
-        # Luego de la primera pila
-        if i < len(stack0_blocks):
-            goal_blocks.append(stack0_blocks[i])
-    
-    goal_state = [[], [], goal_blocks]
-    
-    return initial_state, goal_state
-
 #####FUNCTION FOR ASKING THE AGENT#####
-def ask_blocks_agent(contents: str) -> tuple:
+def ask_blocks_agent(contents: str, model: str = MODEL_NAME) -> tuple:
     """
     Interactúa con Gemini para resolver BlocksWorld step by step.
     """
-    response = client.models.generate_content(
-        model="gemini-2.5-pro-preview-06-05",
+    response = get_limiter("gemini").call(timed("gemini", client.models.generate_content),
+        model=model,
         config=types.GenerateContentConfig(
             system_instruction=system_instruction,
             thinking_config=types.ThinkingConfig(include_thoughts=True)
@@ -126,108 +89,36 @@ def ask_blocks_agent(contents: str) -> tuple:
             final_answer += part.text
 
     return final_answer, response.usage_metadata
+
+def ask_blocks_agent_stream(contents: str, model: str = MODEL_NAME, on_chunk=None) -> tuple:
+    """
+    Variante en streaming: imprime pensamientos y respuesta según llegan y devuelve además
+    las métricas de latencia. `on_chunk` puede cortar la generación.
+    """
+    config = types.GenerateContentConfig(
+        system_instruction=system_instruction,
+        thinking_config=types.ThinkingConfig(include_thoughts=True)
+    )
+    result = stream_gemini(client, model, config, contents, on_chunk=on_chunk)
+    usage = result.usage or types.GenerateContentResponseUsageMetadata()
+    return result.answer, usage, result.metrics()
 #####FUNCTION FOR EXTRACTING MOVES VECTOR#####
 def extract_moves_vector(response_text: str) -> list[list]:
     """
     Extrae el vector de movimientos de la respuesta del LLM.
-    Busca múltiples formatos posibles: moves = [...], JSON, o simplemente [...].
+    Usa el bloque moves = [...] si existe y, si no, la lista entre el primer [ y el último ].
+    Se analiza en una sola pasada (moveParser.parse_move_lists), sin eval.
     """
-    import json
-    
-    # Primero intentar el formato "moves = ["
-    match = re.search(r'moves\s*=\s*\[.*\]', response_text, re.DOTALL)
-    if match:
-        raw_block = match.group(0).split('=')[1].strip()
-    else:
-        # Buscar formato JSON o simplemente un array
-        # Buscar cualquier lista que contenga sublistas de 3 elementos
-        start = response_text.find('[')
-        end = response_text.rfind(']')
-        
-        if start == -1 or end == -1 or end <= start:
-            raise ValueError("❌ No se encontró un bloque válido delimitado por [ y ].")
-        
-        raw_block = response_text[start:end+1]
-    
-    # Remover líneas que empiecen con # (comentarios)
-    lines = raw_block.split('\n')
-    cleaned_lines = [line for line in lines if not line.strip().startswith('#')]
-    cleaned_block = '\n'.join(cleaned_lines).strip()
-    
-    # Remover cualquier texto después del último ]
-    end = cleaned_block.rfind(']')
-    if end != -1:
-        cleaned_block = cleaned_block[:end+1]
-    
-    # Limpiar caracteres extra como comillas, etc.
-    cleaned_block = re.sub(r'["`]', '', cleaned_block)
-    
-    try:
-        # Primero intentar con ast.literal_eval
-        moves = ast.literal_eval(cleaned_block)
-    except:
-        try:
-            # Si falla, intentar con json
-            moves = json.loads(cleaned_block)
-        except:
-            # Si todo falla, intentar parsing manual
-            # Buscar patrones como ["D", 1, 2] o ['D', 1, 2]
-            pattern = r'\[[\'"]*([A-Za-z]+)[\'"]*,\s*(\d+),\s*(\d+)\]'
-            matches = re.findall(pattern, cleaned_block)
-            
-            if not matches:
-                raise ValueError(f"❌ No se pudieron extraer movimientos del bloque: {cleaned_block}")
-            
-            moves = []
-            for match in matches:
-                block = match[0]  # Ya está limpio
-                from_stack = int(match[1])
-                to_stack = int(match[2])
-                moves.append([block, from_stack, to_stack])
-    
-    if not (isinstance(moves, list) and all(isinstance(m, list) and len(m) == 3 for m in moves)):
-        raise ValueError("❌ El contenido extraído no es una lista válida de movimientos.")
-    
-    return moves
+    marker = "moves" if re.search(r'moves\s*=\s*\[', response_text) else None
+    return parse_move_lists(response_text, marker=marker)
 
 #####FUNCTION FOR SIMULATING MOVES#####
 def simulate_moves(initial_state: list, moves: list) -> list:
     """
     Simula la secuencia de movimientos en el BlocksWorld.
+    El estado se convierte una vez a arrays de IDs (BlockState) y cada movimiento es O(1).
     """
-    state = [stack.copy() for stack in initial_state]
-    
-    for move in moves:
-        block, from_stack, to_stack = move
-        
-        # Verificar que el stack origen no esté vacío
-        if not state[from_stack]:
-            raise ValueError(f"❌ Stack {from_stack} está vacío, no se puede mover {block}")
-        
-        # Verificar que el bloque en la cima coincida
-        if state[from_stack][-1] != block:
-            raise ValueError(f"❌ El bloque {block} no está en la cima del stack {from_stack}")
-        
-        # Verificar que los índices de stack sean válidos
-        if from_stack < 0 or from_stack >= len(state) or to_stack < 0 or to_stack >= len(state):
-            raise ValueError(f"❌ Índices de stack inválidos: {from_stack} -> {to_stack}")
-        
-        # Ejecutar movimiento
-        moved_block = state[from_stack].pop()
-        state[to_stack].append(moved_block)
-    
-    return state
-
-# Generar configuraciones
-initial_state, goal_state = generate_configurations(N)
-
-print(f"Configuración inicial (N={N}):")
-for i, stack in enumerate(initial_state):
-    print(f"Stack {i}: {stack}")
-
-print(f"\nConfiguración objetivo:")
-for i, stack in enumerate(goal_state):
-    print(f"Stack {i}: {stack}")
+    return BlockState.from_lists(initial_state).apply_all(moves).to_lists()
 
 # System prompt modificado para stepwise reasoning
 system_instruction = """
@@ -249,109 +140,226 @@ Your response should be just a vector of moves, without any additional text or e
 """
 
 ######MAIN EXPERIMENT######
-# Generar configuraciones
-initial_state, goal_state = generate_configurations(N)
-
-print(f"Configuración inicial (N={N}):")
-for i, stack in enumerate(initial_state):
-    print(f"Stack {i}: {stack}")
-
-print(f"\nConfiguración objetivo:")
-for i, stack in enumerate(goal_state):
-    print(f"Stack {i}: {stack}")
-
-# Inicializar variables para el bucle iterativo
-current_state = [stack.copy() for stack in initial_state]
-total_moves = []
-iteration = 0
-
-prompt_tokens = []
-output_tokens = []
-total_tokens = []
-success = False
-
-while True:
-    iteration += 1
-    print(f"\n🔄 Iteración {iteration} | Bloques = {N} | p = {p}")
-    try:
-        # Construir el prompt
-        prompt = build_blocks_prompt(current_state, goal_state, N, p)
-
-        # Preguntar al LLM
-        response_text, usage = ask_blocks_agent(prompt)
-        prompt_tokens.append(usage.prompt_token_count)
-        output_tokens.append(usage.candidates_token_count)
-        total_tokens.append(usage.total_token_count)
-
-        # Extraer vector de movimientos
-        moves = extract_moves_vector(response_text)
-        print(f"🔍 Movimientos extraídos: {moves}")
-        print(f"🔍 Primer movimiento: {moves[0] if moves else 'N/A'}")
-        if moves:
-            print(f"🔍 Tipo del primer elemento: {type(moves[0][0])}")
-            print(f"🔍 Representación del primer elemento: {repr(moves[0][0])}")
-
-        # Guardar movimientos acumulados
-        total_moves.extend(moves)
-
-        # Aplicar movimientos y obtener nueva configuración
-        new_state = simulate_moves(current_state, moves)
-
-        # Verificar si se alcanzó el objetivo
-        if new_state == goal_state:
-            success = True
-            print("🎯 ¡Configuración objetivo alcanzada!")
+# Varias pruebas pueden ejecutarse a la vez en el mismo proceso (asyncRunner)
+_csv_lock = threading.Lock()
+
+def _used_instances() -> set:
+    """
+    IDs of the InstanceGenerator instances already used by rows of the stepwise CSVs or by a
+    checkpoint (finished or still running in another process).
+    """
+    used = set()
+    for name in ("blocks_world_steps.csv", "blocks_world_steps_stream.csv"):
+        csv_path = os.path.join("results", name)
+        if os.path.exists(csv_path):
+            with open(csv_path, newline='') as file:
+                used.update(re.findall(r'_(\d+x\d+-\d+)', file.read()))
+    if os.path.isdir(CHECKPOINT_DIR):
+        for file_name in os.listdir(CHECKPOINT_DIR):
+            if not file_name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(CHECKPOINT_DIR, file_name), encoding="utf-8") as file:
+                    instance_id = json.load(file).get("params", {}).get("instance")
+            except (OSError, ValueError):
+                continue
+            if instance_id:
+                used.add(instance_id)
+    return used
+
+def _claim_instance(N: int, tier: str) -> dict:
+    """
+    Random unused instance of the tier, reserved with an exclusive create of
+    results/checkpoints/instances/<id>.claim: trials started at the same time never get the same one.
+    """
+    claims_dir = os.path.join(CHECKPOINT_DIR, "instances")
+    os.makedirs(claims_dir, exist_ok=True)
+    exclude = _used_instances() | {name[:-len(".claim")] for name in os.listdir(claims_dir)}
+    while True:
+        instance = sample_instances(N, tier, 1, exclude=exclude)[0]
+        try:
+            with open(os.path.join(claims_dir, f"{instance['id']}.claim"), "x"):
+                return instance
+        except FileExistsError:
+            # Otro proceso la reservó entre la lectura y el create
+            exclude.add(instance["id"])
+
+def run_steps_experiment(N: int = N, p: int = p, model: str = MODEL_NAME, stream: bool = False,
+                         resume: str = None, tier: str = None) -> dict:
+    """
+    Ejecuta un experimento stepwise completo y guarda el uso de tokens en results/blocks_world_steps.csv.
+    Con stream=True cada movimiento se valida según llega (la generación se corta en el primero
+    inválido) y la fila, con las métricas de latencia y el ahorro estimado, va a
+    results/blocks_world_steps_stream.csv.
+    Cada iteración completada se guarda en results/checkpoints/; resume="<nombre del experimento>"
+    continúa un experimento interrumpido desde su última iteración correcta.
+    Con tier="easy" / "medium" / "hard" se usa una instancia aleatoria de ese nivel, aún no usada
+    en los CSV ni en otro checkpoint, de results/blocks_instances.jsonl (InstanceGenerator) en lugar
+    de generate_configurations(N); se reserva al empezar (_claim_instance) y su ID va al final del
+    nombre del experimento.
+    """
+    # Checkpoint por iteración: nuevo experimento o reanudación de uno interrumpido
+    if resume:
+        checkpoint = Checkpoint.load(resume, "blocks_steps")
+        N, p, model, stream = (checkpoint.params[key] for key in ("N", "p", "model", "stream"))
+        instance = load_instance(checkpoint.params["instance"]) if checkpoint.params.get("instance") else None
+    else:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        instance = _claim_instance(N, tier) if tier else None
+        name = f"N{N}_p{p}_{tier}_{timestamp}_{instance['id']}" if instance else f"N{N}_p{p}_{timestamp}"
+        checkpoint = Checkpoint.start(name, "blocks_steps",
+                                      {"N": N, "p": p, "model": model, "stream": stream,
+                                       "instance": instance["id"] if instance else None})
+
+    # Generar configuraciones (o tomar la instancia aleatoria del nivel pedido)
+    if instance:
+        initial_state, goal_state = instance["initial"], instance["goal"]
+    else:
+        initial_state, goal_state = generate_configurations(N)
+
+    print(f"Configuración inicial (N={N}):")
+    for i, stack in enumerate(initial_state):
+        print(f"Stack {i}: {stack}")
+
+    print(f"\nConfiguración objetivo:")
+    for i, stack in enumerate(goal_state):
+        print(f"Stack {i}: {stack}")
+
+    # Longitud óptima (A*) para juzgar si las iteraciones avanzan o dan vueltas
+    if instance:
+        optimal_moves = instance["optimal_moves"]     # los niveles solo tienen instancias con óptimo exacto
+    else:
+        optimal_moves = optimal_length(N)
+    print(f"📐 Óptimo: {optimal_moves} movimientos (al menos {-(-optimal_moves // p)} iteraciones con p = {p})")
+
+    # Inicializar variables para el bucle iterativo
+    current_state = checkpoint.state or [stack.copy() for stack in initial_state]
+    total_moves = checkpoint.total_moves
+    iteration = checkpoint.iteration
+
+    prompt_tokens = checkpoint.get("prompt_tokens")
+    output_tokens = checkpoint.get("output_tokens")
+    total_tokens = checkpoint.get("total_tokens")
+    ttft = checkpoint.get("ttft")
+    ttfat = checkpoint.get("ttfat")
+    decode_rate = checkpoint.get("decode_rate")
+    tokens_saved = 0
+    seconds_saved = 0.0
+    success = False
+
+    while True:
+        iteration += 1
+        print(f"\n🔄 Iteración {iteration} | Bloques = {N} | p = {p}")
+        try:
+            # Construir el prompt
+            prompt = build_blocks_prompt(current_state, goal_state, N, p)
+
+            # Preguntar al LLM
+            if stream:
+                # Validar cada movimiento según llega y cortar la generación en el primero inválido
+                validator = StreamingMoveValidator(BlockState.from_lists(current_state), BlockState.apply_move,
+                                                   expected_moves=p, marker="moves")
+                response_text, usage, metrics = ask_blocks_agent_stream(prompt, model=model, on_chunk=validator)
+                ttft.append(metrics["ttft"])
+                ttfat.append(metrics["ttfat"])
+                decode_rate.append(metrics["decode_rate"])
+            else:
+                response_text, usage = ask_blocks_agent(prompt, model=model)
+            prompt_tokens.append(usage.prompt_token_count)
+            output_tokens.append(usage.candidates_token_count)
+            total_tokens.append(usage.total_token_count)
+
+            if stream and validator.error:
+                total_moves.extend(validator.moves)
+                tokens_saved, seconds_saved = validator.savings()
+                raise ValueError(f"{validator.error} (stream cortado, ~{tokens_saved} tokens y {seconds_saved} s ahorrados)")
+
+            # Extraer vector de movimientos
+            moves = extract_moves_vector(response_text)
+            print(f"🔍 Movimientos extraídos: {moves}")
+            print(f"🔍 Primer movimiento: {moves[0] if moves else 'N/A'}")
+            if moves:
+                print(f"🔍 Tipo del primer elemento: {type(moves[0][0])}")
+                print(f"🔍 Representación del primer elemento: {repr(moves[0][0])}")
+
+            # Guardar movimientos acumulados
+            total_moves.extend(moves)
+
+            # Aplicar movimientos y obtener nueva configuración
+            new_state = simulate_moves(current_state, moves)
+
+            # Guardar la iteración completada (permite reanudar tras un corte)
+            checkpoint.save(iteration, new_state, total_moves, prompt_tokens=prompt_tokens, output_tokens=output_tokens,
+                            total_tokens=total_tokens, ttft=ttft, ttfat=ttfat, decode_rate=decode_rate)
+
+            # Verificar si se alcanzó el objetivo
+            if new_state == goal_state:
+                success = True
+                print("🎯 ¡Configuración objetivo alcanzada!")
+                break
+
+            # Preparar para siguiente iteración
+            current_state = new_state
+
+        except ValueError as e:
+            print(f"❌ Se ha producido un error en la iteración {iteration}: {e}")
+            print("🛑 El experimento se detiene aquí debido a un movimiento inválido.")
             break
 
-        # Preparar para siguiente iteración
-        current_state = new_state
-
-    except ValueError as e:
-        print(f"❌ Se ha producido un error en la iteración {iteration}: {e}")
-        print("🛑 El experimento se detiene aquí debido a un movimiento inválido.")
-        break
-
-# === REPORTE FINAL ===
-print("\n✅ Secuencia de movimientos obtenida:" + str(total_moves))
-
-# Guardar resultados en CSV (estilo steps)
-results_value = 'ok' if success else 'fail'
-timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-experiment_name = f"N{N}_p{p}_{timestamp}"
-
-# Número máximo de iteraciones registrables
-max_iters = 10
-
-# Rellenar con valores vacíos si hay menos de 10 iteraciones
-prompt_tokens += [''] * (max_iters - len(prompt_tokens))
-output_tokens += [''] * (max_iters - len(output_tokens))
-total_tokens += [''] * (max_iters - len(total_tokens))
-
-# Sumas totales
-prompt_sum = sum([t for t in prompt_tokens if isinstance(t, int)])
-output_sum = sum([t for t in output_tokens if isinstance(t, int)])
-total_sum = sum([t for t in total_tokens if isinstance(t, int)])
-
-# Encabezado
-headers = ['Name'] + \
-          [f"tokens_prompt_iter{i+1}" for i in range(max_iters)] + \
-          [f"tokens_candidates_iter{i+1}" for i in range(max_iters)] + \
-          [f"tokens_total_iter{i+1}" for i in range(max_iters)] + \
-          ['tokens_prompt_sum', 'tokens_candidates_sum', 'tokens_total_sum','results']
-
-# Fila de datos
-row = [experiment_name] + prompt_tokens + output_tokens + total_tokens + [prompt_sum, output_sum, total_sum, results_value]
-
-# Guardar en CSV
-os.makedirs("results", exist_ok=True)
-csv_path = os.path.join("results", "blocks_world_steps.csv")
-
-file_exists = os.path.exists(csv_path)
-with open(csv_path, mode='a', newline='') as file:
-    writer = csv.writer(file)
-    if not file_exists:
-        writer.writerow(headers)
-    writer.writerow(row)
-
-print(f"\n📄 Resultados guardados en: {csv_path}")
-print(f"Resumen: {experiment_name} - Tokens totales: {total_sum} - Resultado: {results_value}")
+    # === REPORTE FINAL ===
+    print("\n✅ Secuencia de movimientos obtenida:" + str(total_moves))
+    print(f"📐 {len(total_moves)} movimientos en {iteration} iteraciones (óptimo: {optimal_moves})")
+
+    # Guardar resultados en CSV (estilo steps)
+    results_value = 'ok' if success else 'fail'
+    checkpoint.finish(results_value)
+    experiment_name = checkpoint.row_name()
+
+    # Número máximo de iteraciones registrables
+    max_iters = 10
+
+    # Rellenar con valores vacíos si hay menos de 10 iteraciones
+    prompt_tokens += [''] * (max_iters - len(prompt_tokens))
+    output_tokens += [''] * (max_iters - len(output_tokens))
+    total_tokens += [''] * (max_iters - len(total_tokens))
+
+    # Sumas totales
+    prompt_sum = sum([t for t in prompt_tokens if isinstance(t, int)])
+    output_sum = sum([t for t in output_tokens if isinstance(t, int)])
+    total_sum = sum([t for t in total_tokens if isinstance(t, int)])
+
+    # Encabezado
+    headers = ['Name'] + \
+              [f"tokens_prompt_iter{i+1}" for i in range(max_iters)] + \
+              [f"tokens_candidates_iter{i+1}" for i in range(max_iters)] + \
+              [f"tokens_total_iter{i+1}" for i in range(max_iters)] + \
+              ['tokens_prompt_sum', 'tokens_candidates_sum', 'tokens_total_sum','results']
+
+    # Fila de datos
+    row = [experiment_name] + prompt_tokens + output_tokens + total_tokens + [prompt_sum, output_sum, total_sum, results_value]
+
+    # Métricas de latencia y early abort (solo en modo streaming, en un CSV aparte)
+    if stream:
+        headers, row = add_stream_columns(headers, row, ttft, ttfat, decode_rate, tokens_saved, seconds_saved, max_iters)
+
+    # Guardar en CSV
+    os.makedirs("results", exist_ok=True)
+    csv_path = os.path.join("results", "blocks_world_steps_stream.csv" if stream else "blocks_world_steps.csv")
+
+    with _csv_lock:
+        file_exists = os.path.exists(csv_path)
+        with open(csv_path, mode='a', newline='') as file:
+            writer = csv.writer(file)
+            if not file_exists:
+                writer.writerow(headers)
+            writer.writerow(row)
+
+    print(f"\n📄 Resultados guardados en: {csv_path}")
+    print(f"Resumen: {experiment_name} - Tokens totales: {total_sum} - Resultado: {results_value}")
+    return {"name": experiment_name, "results": results_value, "moves": len(total_moves), "tokens_total": total_sum,
+            "optimal_moves": optimal_moves, "instance": instance["id"] if instance else None}
+
+
+if __name__ == "__main__":
+    resume = None  # Nombre de un experimento interrumpido para continuarlo (ver results/checkpoints)
+    run_steps_experiment(N=N, p=p, resume=resume)
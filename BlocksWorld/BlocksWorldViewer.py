@@ -2,6 +2,7 @@ import matplotlib.pyplot as plt
 import matplotlib.patches as patches
 from matplotlib.animation import FuncAnimation
 import numpy as np
+from BlockState import block_id
 
 class BlocksWorldViewer:
     def __init__(self, initial_state, target_state=None):
@@ -18,12 +19,15 @@ class BlocksWorldViewer:
         self.current_state = [stack.copy() for stack in initial_state]
         self.num_stacks = len(initial_state)
         
-        # Colores para los bloques (letras A-Z)
-        self.block_colors = {}
-        colors = plt.cm.tab20(np.linspace(0, 1, 20))
-        for i, char in enumerate('ABCDEFGHIJKLMNOPQRSTUVWXYZ'):
-            self.block_colors[char] = colors[i % 20]
+        # Colores para los bloques según su ID (A-Z o B1..BN, ver BlockState)
+        self.colors = plt.cm.tab20(np.linspace(0, 1, 20))
     
+    def block_color(self, block):
+        try:
+            return self.colors[block_id(block) % 20]
+        except ValueError:
+            return 'lightgray'
+
     def simulate_moves(self, moves, animate=True):
         """
         Simula una secuencia de movimientos y automáticamente los anima.
@@ -127,7 +131,7 @@ class BlocksWorldViewer:
             
             # Dibujar bloques
             for block_idx, block in enumerate(stack):
-                color = self.block_colors.get(block, 'lightgray')
+                color = self.block_color(block)
                 
                 # Bloque
                 rect = patches.Rectangle((stack_idx - 0.3, block_idx), 0.6, 0.8,
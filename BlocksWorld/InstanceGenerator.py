@@ -0,0 +1,189 @@
+"""
+Random Blocks World instances, scored with the A* planner and stored by difficulty tier.
+
+generate_configurations gives one deterministic instance per N, so difficulty only depends on N
+and every trial at a given N sees the same puzzle. Here random start / goal pairs (every block on
+a random stack, in random order) are generated from consecutive seeds over a process pool, and
+each one is scored with BlocksWorldPlanner:
+
+    lower_bound      blocks not on their final support (each one has to move at least once)
+    optimal_moves    exact A* length, if it finishes within `budget` expanded nodes
+    upper_bound      otherwise the length of a weighted A* plan (at most `weight` x the optimum)
+    detour           (optimal_moves - lower_bound) / N: extra moves per block that even a perfect
+                     solver needs; TIERS cut it into easy / medium / hard. Instances without an
+                     exact optimum get the tier 'unrated' (a detour from upper_bound could be up
+                     to twice too large) and are never sampled
+
+Instances are appended to results/blocks_instances.jsonl (one JSON per line) and
+results/blocks_instances.index.json keeps, per instance ID, the byte offset of its line, the IDs of
+every (N, stacks, tier) bucket and the next unused seed. Sampling reads only the chosen lines
+(seek), so sweeps draw fresh instances of controlled difficulty without regenerating or
+re-scoring anything. Instance IDs look like '10x3-42' (N = 10, 3 stacks, seed 42).
+
+The pool is not committed. Each instance only depends on its ID (the random generator is seeded
+with it), so `python InstanceGenerator.py` rebuilds the same pool anywhere: seeds 0..119 for
+N = 5..8 on 3 stacks, ~20 s.
+
+The tier cut-offs are the same for every N and random instances get harder as N grows, so the
+easy tier is almost empty from N = 8 on (1 of the 120 generated instances at N = 8): sweep the
+easy tier at N <= 7 only, or compare tiers within one N rather than across N.
+
+Example:
+    generate_instances(N=8, count=200, workers=4)        # extends the pool (new seeds only)
+    instance = sample_instances(8, "hard", 1)[0]         # {'id': '8x3-17', 'initial': [...], 'goal': [...], ...}
+    run_steps_experiment(N=8, p=5, tier="hard")          # BlocksWorldSolverSteps draws one itself
+"""
+import json
+import os
+import random
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from BlockState import block_names
+from BlocksWorldPlanner import _prefix, plan
+
+INSTANCES_PATH = os.path.join("results", "blocks_instances.jsonl")
+STACKS = 3          # con 3 stacks cualquier objetivo es alcanzable (con 2 no)
+BUDGET = 50_000     # expansiones del A* exacto antes de recurrir al A* ponderado
+WEIGHT = 2.0
+
+# Desvío (movimientos extra por bloque) máximo de cada nivel, calibrado con el planificador:
+# con 3 stacks la mediana ronda 0.7 para N = 6 y 0.9 para N = 8-10. Los cortes son los mismos para
+# todo N, así que el nivel 'easy' se vacía al crecer N: en el pool de 120 instancias por N hay
+# 39 / 15 / 8 / 1 fáciles para N = 5 / 6 / 7 / 8, y a partir de N = 8 no sirve para un barrido
+TIERS = (("easy", 0.5), ("medium", 0.9), ("hard", float("inf")))
+UNRATED = "unrated"     # sin óptimo exacto dentro del presupuesto: fuera de los niveles
+
+_lock = threading.Lock()
+
+
+#####GENERATION#####
+def random_state(blocks: list, stacks: int, rng: random.Random) -> list:
+    state = [[] for _ in range(stacks)]
+    for block in rng.sample(blocks, len(blocks)):
+        state[rng.randrange(stacks)].append(block)
+    return state
+
+
+def tier_of(detour: float) -> str:
+    return next(name for name, limit in TIERS if detour < limit)
+
+
+def make_instance(N: int, seed: int, stacks: int = STACKS, budget: int = BUDGET, weight: float = WEIGHT) -> dict:
+    """
+    Instance for (N, stacks, seed), scored with the planner. Deterministic: the same arguments
+    always give the same instance.
+    """
+    if stacks < 3:
+        raise ValueError("❌ Se necesitan al menos 3 stacks para que cualquier objetivo sea alcanzable.")
+    rng = random.Random(f"{N}x{stacks}-{seed}")
+    blocks = block_names(N)
+    initial, goal = random_state(blocks, stacks, rng), random_state(blocks, stacks, rng)
+    lower_bound = N - sum(_prefix(stack, goal_stack) for stack, goal_stack in zip(initial, goal))
+    try:
+        optimal, upper_bound = plan(initial, goal, max_expansions=budget)["length"], None
+    except ValueError:
+        optimal, upper_bound = None, plan(initial, goal, weight=weight)["length"]
+    detour = round((optimal - lower_bound) / N, 4) if optimal is not None else None
+    return {"id": f"{N}x{stacks}-{seed}", "N": N, "stacks": stacks, "seed": seed,
+            "initial": initial, "goal": goal, "lower_bound": lower_bound, "optimal_moves": optimal,
+            "upper_bound": upper_bound, "exact": optimal is not None, "detour": detour,
+            "tier": tier_of(detour) if optimal is not None else UNRATED}
+
+
+def _make(args: tuple) -> dict:
+    return make_instance(*args)
+
+
+#####INDEX#####
+def index_path(path: str = INSTANCES_PATH) -> str:
+    return path[:-len(".jsonl")] + ".index.json"
+
+
+def load_index(path: str = INSTANCES_PATH) -> dict:
+    if not os.path.exists(index_path(path)):
+        return {"offsets": {}, "buckets": {}, "next_seed": {}}
+    with open(index_path(path), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _bucket(N: int, stacks: int, tier: str) -> str:
+    return f"{N}x{stacks}:{tier}"
+
+
+def generate_instances(N: int, count: int, stacks: int = STACKS, workers: int = 4, budget: int = BUDGET,
+                       path: str = INSTANCES_PATH) -> dict:
+    """
+    Generates and scores `count` new instances (the next unused seeds for N and stacks) over a
+    process pool, appends them to the instance file and updates the index. Returns how many
+    instances of each tier were added.
+    """
+    with _lock:
+        index = load_index(path)
+        first = index["next_seed"].get(f"{N}x{stacks}", 0)
+        jobs = [(N, seed, stacks, budget) for seed in range(first, first + count)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            instances = list(pool.map(_make, jobs, chunksize=max(1, count // (4 * workers))))
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        added = {name: 0 for name, _ in TIERS + ((UNRATED, None),)}
+        with open(path, "ab") as f:
+            for instance in instances:
+                index["offsets"][instance["id"]] = f.tell()
+                index["buckets"].setdefault(_bucket(N, stacks, instance["tier"]), []).append(instance["id"])
+                f.write((json.dumps(instance) + "\n").encode("utf-8"))
+                added[instance["tier"]] += 1
+        index["next_seed"][f"{N}x{stacks}"] = first + count
+
+        # Índice escrito aparte y renombrado: nunca queda a medias
+        tmp_path = f"{index_path(path)}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, index_path(path))
+    return added
+
+
+#####SAMPLING#####
+def _read(path: str, offset: int) -> dict:
+    with open(path, "rb") as f:
+        f.seek(offset)
+        return json.loads(f.readline())
+
+
+def load_instance(instance_id: str, path: str = INSTANCES_PATH) -> dict:
+    offset = load_index(path)["offsets"].get(instance_id)
+    if offset is None:
+        raise ValueError(f"❌ La instancia {instance_id} no está en {path}")
+    return _read(path, offset)
+
+
+def sample_instances(N: int, tier: str, k: int = 1, stacks: int = STACKS, exclude=(), seed: int = None,
+                     path: str = INSTANCES_PATH) -> list:
+    """
+    k distinct instances of the (N, stacks, tier) bucket, skipping the IDs in `exclude` (e.g.
+    instances already used by earlier runs). Raises ValueError if the bucket is too small.
+    """
+    if tier not in dict(TIERS):
+        raise ValueError(f"❌ Nivel desconocido '{tier}'. Opciones: {[name for name, _ in TIERS]}")
+    index = load_index(path)
+    exclude = set(exclude)
+    candidates = [i for i in index["buckets"].get(_bucket(N, stacks, tier), []) if i not in exclude]
+    if len(candidates) < k:
+        raise ValueError(f"❌ Solo hay {len(candidates)} instancias nuevas de nivel '{tier}' para N={N}; "
+                         f"genera el pool con 'python InstanceGenerator.py' o más con generate_instances({N}, count).")
+    chosen = random.Random(seed).sample(candidates, k)
+    return [_read(path, index["offsets"][instance_id]) for instance_id in chosen]
+
+
+if __name__ == "__main__":
+    # Pool de instancias para los barridos stepwise por niveles (N = 5..8, 3 stacks, semillas 0..119;
+    # reproducible: en un pool ya generado solo añade semillas nuevas)
+    import time
+
+    for N in (5, 6, 7, 8):
+        t0 = time.perf_counter()
+        added = generate_instances(N, 120, workers=os.cpu_count() or 2)
+        print(f"N={N} | {added} | {time.perf_counter() - t0:.1f} s")
+    index = load_index()
+    for bucket, ids in sorted(index["buckets"].items()):
+        print(f"   {bucket:12s} {len(ids):4d} instancias")
@@ -1,14 +1,17 @@
-import subprocess
 import os
+import sys
 
-# Cambiar al directorio del script
+# Cambiar al directorio del script y hacer visible el runner compartido
 os.chdir(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Harness"))
 
-# Ejecutar BlocksWorldSolver.py 10 veces
-for i in range(10):
-    print(f"Ejecución {i+1}/10")
-    try:
-        subprocess.run(["python3", "BlocksWorldSolverSteps.py"], check=True)
-    except subprocess.CalledProcessError as e:
-        print(f"Error en ejecución {i+1}: {e}")
-    print()
+from asyncRunner import run_trials
+from clientPool import print_pool_stats
+from BlocksWorldSolverSteps import run_steps_experiment
+
+TRIALS = 10       # Número de pruebas
+CONCURRENCY = 4   # Pruebas simultáneas (limitado por la cuota del proveedor)
+
+# Ejecutar BlocksWorldSolverSteps 10 veces
+run_trials(run_steps_experiment, trials=TRIALS, concurrency=CONCURRENCY, N=20, p=25)
+print_pool_stats()
@@ -0,0 +1,285 @@
+"""
+Compact Checker Jumping engine: a bytearray board, O(1) full-rule moves, delta history and the
+closed-form optimal solution.
+
+CheckerJumpingSolver.simulate_moves and CheckerJumpingVisualizer.simulate_moves worked on lists of
+'R' / 'B' / '_' strings, accepted backward moves although the prompt forbids them ("Checkers cannot
+move backwards"), and the visualizer kept a full copy of the board after every move (O(N·M)
+memory for M moves). Here:
+
+    board          bytearray of b'R' / b'B' / b'_' (one byte per square; decode() prints it)
+    empty          index of the single empty square, kept up to date, so a move is checked
+                   without scanning: the destination must be `empty`, a red checker must move
+                   right and a blue one left, by 1 (slide) or by 2 over the opposite colour (jump)
+    history        array('i') with one (from, to) pair per applied move; `undo` reverts the last
+                   one and `frames` rebuilds the boards one at a time (for printing / animating)
+
+The optimal solution has N(N+2) moves (N² jumps and 2N slides) and exists in two mirror versions
+(red or blue moves first). Its moves come in groups of 1, 2, ..., N, N, N, ..., 2, 1 moves of
+alternating colours: in the first N groups the jumps come before the closing slide, the middle
+group is all jumps and in the last N groups the slide opens the group. Every move starts next to
+the empty square, so `optimal_moves` only follows that square: O(1) per move, no board needed.
+`first_divergence` compares an answer with both versions.
+
+Example:
+    board = CheckerBoard.initial(2)                  # R R _ B B
+    board.apply(['R', 1, 2])                         # O(1), in place; ValueError if illegal
+    board.apply(['R', 2, 1])                         # ValueError: red checkers only move right
+    list(optimal_moves(1))                           # [['R', 0, 1], ['B', 2, 0], ['R', 1, 2]]
+    first_divergence(2, [['B', 3, 2], ['B', 4, 3]])  # 1 (leaves the blue-first solution at move 1)
+"""
+from array import array
+
+RED, BLUE, EMPTY = ord('R'), ord('B'), ord('_')
+_DIRECTION = {'R': 1, 'B': -1}         # rojas hacia la derecha, azules hacia la izquierda
+_OPPOSITE = {'R': BLUE, 'B': RED}
+
+
+#####BOARD#####
+class CheckerBoard:
+    __slots__ = ("cells", "empty", "history")
+
+    def __init__(self, cells: bytearray, empty: int):
+        self.cells = cells
+        self.empty = empty
+        self.history = array('i')
+
+    @classmethod
+    def initial(cls, N: int) -> "CheckerBoard":
+        return cls(bytearray(b"R" * N + b"_" + b"B" * N), N)
+
+    @classmethod
+    def goal(cls, N: int) -> "CheckerBoard":
+        return cls(bytearray(b"B" * N + b"_" + b"R" * N), N)
+
+    @classmethod
+    def from_list(cls, board) -> "CheckerBoard":
+        """
+        ['R', '_', 'B'] (or 'R_B') -> CheckerBoard. Raises ValueError unless there is exactly one
+        empty square and every other square is 'R' or 'B'.
+        """
+        if isinstance(board, CheckerBoard):
+            return board.copy()
+        cells = bytearray("".join(board).encode("ascii", "replace"))
+        if len(cells) != len(board) or cells.count(EMPTY) != 1 \
+                or cells.count(RED) + cells.count(BLUE) != len(cells) - 1:
+            raise ValueError(f"❌ Tablero inválido: {board}")
+        return cls(cells, cells.index(EMPTY))
+
+    def copy(self) -> "CheckerBoard":
+        """Copy of the board (without the history)."""
+        return CheckerBoard(bytearray(self.cells), self.empty)
+
+    #####QUERIES#####
+    def to_list(self) -> list:
+        return list(self.cells.decode("ascii"))
+
+    def __len__(self):
+        return len(self.cells)
+
+    def __eq__(self, other):
+        if isinstance(other, CheckerBoard):
+            return self.cells == other.cells
+        if isinstance(other, (list, tuple, str)):
+            return self.cells.decode("ascii") == "".join(other)
+        return NotImplemented
+
+    def __repr__(self):
+        return " ".join(self.cells.decode("ascii"))
+
+    #####MOVES#####
+    def apply(self, move) -> "CheckerBoard":
+        """
+        Applies [color, from, to] in place, O(1), and returns the board. Raises ValueError with the
+        messages of simulate_moves, plus the backward-move rule.
+        """
+        if len(move) != 3:
+            raise ValueError(f"❌ Formato de movimiento inválido: {move}")
+        color, from_pos, to_pos = move
+        cells = self.cells
+        if not (isinstance(from_pos, int) and isinstance(to_pos, int)
+                and 0 <= from_pos < len(cells) and 0 <= to_pos < len(cells)):
+            raise ValueError(f"❌ Posición fuera del tablero: {move}")
+        direction = _DIRECTION.get(color)
+        if direction is None or cells[from_pos] != ord(color):
+            raise ValueError(f"❌ Movimiento inválido: {color} no está en posición {from_pos}")
+        if to_pos != self.empty:
+            raise ValueError(f"❌ Posición destino {to_pos} no está vacía")
+
+        step = to_pos - from_pos
+        if step == 2 * direction:
+            if cells[from_pos + direction] != _OPPOSITE[color]:
+                opposite = chr(_OPPOSITE[color])
+                raise ValueError(f"❌ Salto inválido: no hay {opposite} en posición {from_pos + direction}")
+        elif step != direction:
+            if step in (-direction, -2 * direction):
+                raise ValueError(f"❌ Movimiento hacia atrás: {color} solo puede moverse hacia la "
+                                 f"{'derecha' if direction == 1 else 'izquierda'} ({from_pos} -> {to_pos})")
+            raise ValueError(f"❌ Movimiento inválido: distancia {abs(step)} no permitida")
+
+        # Ejecutar: el hueco pasa a la casilla de origen
+        cells[to_pos] = cells[from_pos]
+        cells[from_pos] = EMPTY
+        self.empty = from_pos
+        self.history.append(from_pos)
+        self.history.append(to_pos)
+        return self
+
+    def play(self, moves) -> "CheckerBoard":
+        """Applies a whole move sequence; stops with ValueError at the first illegal move."""
+        for move in moves:
+            self.apply(move)
+        return self
+
+    def undo(self) -> "CheckerBoard":
+        """Reverts the last applied move (ValueError if there is none)."""
+        if not self.history:
+            raise ValueError("❌ No hay movimientos que deshacer")
+        to_pos = self.history.pop()
+        from_pos = self.history.pop()
+        self.cells[from_pos] = self.cells[to_pos]
+        self.cells[to_pos] = EMPTY
+        self.empty = to_pos
+        return self
+
+    def moves(self) -> list:
+        """Applied moves as [color, from, to] lists, rebuilt from the history."""
+        board = self._start()
+        history = self.history
+        moves = []
+        for i in range(0, len(history), 2):
+            from_pos, to_pos = history[i], history[i + 1]
+            moves.append([chr(board[from_pos]), from_pos, to_pos])
+            board[to_pos], board[from_pos] = board[from_pos], EMPTY
+        return moves
+
+    def frames(self):
+        """
+        Boards (as lists) from the first one to the current one, rebuilt one at a time from the
+        history: only one extra board is kept in memory.
+        """
+        board = self._start()
+        history = self.history
+        yield list(board.decode("ascii"))
+        for i in range(0, len(history), 2):
+            from_pos, to_pos = history[i], history[i + 1]
+            board[to_pos], board[from_pos] = board[from_pos], EMPTY
+            yield list(board.decode("ascii"))
+
+    def _start(self) -> bytearray:
+        """Board before the first move of the history (undoing every delta on a copy)."""
+        board = bytearray(self.cells)
+        history = self.history
+        for i in range(len(history) - 2, -1, -2):
+            from_pos, to_pos = history[i], history[i + 1]
+            board[from_pos], board[to_pos] = board[to_pos], EMPTY
+        return board
+
+    @staticmethod
+    def apply_move(board: "CheckerBoard", move) -> "CheckerBoard":
+        """apply_move(board, move) -> board, for StreamingMoveValidator (no copies)."""
+        return board.apply(move)
+
+
+#####OPTIMAL SOLUTION#####
+def optimal_length(N: int) -> int:
+    return N * (N + 2)
+
+
+def optimal_moves(N: int, first: str = 'R'):
+    """
+    Yields the N(N+2) moves of the optimal solution from the initial board (`first` = 'R' or 'B':
+    which colour moves first, i.e. which of the two mirror solutions).
+    """
+    if first not in _DIRECTION:
+        raise ValueError(f"❌ Color inicial inválido: {first!r} (se esperaba 'R' o 'B')")
+    colors = (first, 'B' if first == 'R' else 'R')
+    sizes = list(range(1, N + 1)) + [N] + list(range(N, 0, -1))
+    empty = N
+    for group, size in enumerate(sizes):
+        color = colors[group % 2]
+        direction = _DIRECTION[color]
+        # Grupos crecientes: saltos y un deslizamiento al final; central: solo saltos;
+        # decrecientes: un deslizamiento al principio y luego saltos
+        if group < N:
+            steps = [2] * (size - 1) + [1]
+        elif group == N:
+            steps = [2] * size
+        else:
+            steps = [1] + [2] * (size - 1)
+        for step in steps:
+            from_pos = empty - step * direction
+            yield [color, from_pos, empty]
+            empty = from_pos
+
+
+def first_divergence(N: int, moves) -> int:
+    """
+    Index of the first move of `moves` (played from the initial board) that leaves both optimal
+    solutions, or None if the moves are a prefix of one of them (a complete optimal answer, or
+    optimal so far). An answer longer than N(N+2) moves diverges at move N(N+2).
+    """
+    best = 0
+    for first in ('R', 'B'):
+        matched = 0
+        for expected, move in zip(optimal_moves(N, first), moves):
+            if not isinstance(move, (list, tuple)) or list(move) != expected:
+                break
+            matched += 1
+        else:
+            if len(moves) <= optimal_length(N):
+                return None
+        best = max(best, matched)
+    return best
+
+
+if __name__ == "__main__":
+    # Comprobación de la solución óptima (longitud, objetivo, BFS para N pequeño) y tiempos / memoria
+    # frente a la simulación anterior con listas y una copia del tablero por movimiento
+    import sys
+    import time
+    from collections import deque
+
+    for N in range(1, 61):
+        for first in ('R', 'B'):
+            moves = list(optimal_moves(N, first))
+            board = CheckerBoard.initial(N).play(moves)
+            assert len(moves) == optimal_length(N) and board == CheckerBoard.goal(N) and board.moves() == moves
+            assert first_divergence(N, moves) is None and first_divergence(N, moves + moves[:1]) == len(moves)
+    assert first_divergence(2, [['B', 3, 2], ['R', 1, 3]]) is None and first_divergence(2, [['B', 3, 2], ['B', 4, 3]]) == 1
+
+    for N in range(1, 7):
+        start, goal = CheckerBoard.initial(N), CheckerBoard.goal(N)
+        depth = {bytes(start.cells): 0}
+        queue = deque([start])
+        while queue:
+            board = queue.popleft()
+            for from_pos in (board.empty - 2, board.empty - 1, board.empty + 1, board.empty + 2):
+                if 0 <= from_pos < len(board):
+                    try:
+                        nxt = board.copy().apply([chr(board.cells[from_pos]), from_pos, board.empty])
+                    except ValueError:
+                        continue
+                    if bytes(nxt.cells) not in depth:
+                        depth[bytes(nxt.cells)] = depth[bytes(board.cells)] + 1
+                        queue.append(nxt)
+        assert depth[bytes(goal.cells)] == optimal_length(N)
+    print("✅ N(N+2) comprobado con BFS para N <= 6 y la solución generada para N <= 60")
+
+    for N in (10, 50, 100, 200):
+        moves = list(optimal_moves(N))
+        t0 = time.perf_counter()
+        board, states = ['R'] * N + ['_'] + ['B'] * N, []
+        for color, from_pos, to_pos in moves:
+            board[from_pos], board[to_pos] = '_', color
+            states.append(board.copy())
+        t_legacy = time.perf_counter() - t0
+        legacy_bytes = sum(sys.getsizeof(state) for state in states)
+        del states
+
+        t0 = time.perf_counter()
+        board = CheckerBoard.initial(N).play(moves)
+        t_engine = time.perf_counter() - t0
+        engine_bytes = sys.getsizeof(board.cells) + sys.getsizeof(board.history)
+        print(f"N={N:3d} | {len(moves):6d} movimientos | listas {1000 * t_legacy:7.1f} ms, "
+              f"{legacy_bytes / 1e6:7.1f} MB | CheckerBoard {1000 * t_engine:6.1f} ms, {engine_bytes / 1e6:5.2f} MB")
@@ -6,73 +6,32 @@ import re
 import ast
 import csv
 from datetime import datetime
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Harness"))
+from rateLimiter import get_limiter
+from clientPool import get_genai_client, timed
+from moveParser import parse_move_lists
+from CheckerEngine import CheckerBoard
+from CheckerSolutionCounter import score_answer
 
 # Configura la API
-client = genai.Client(api_key=os.getenv("GEMINI_API_KEY_HANOI"))
+client = get_genai_client("GEMINI_API_KEY_HANOI")
 
 # Parámetro configurable: Número de checkers por color
 N = 13  # Cambia este valor para probar con diferentes N (ej. 1, 3, etc.)
 
 #####FUNCTION FOR EXTRACTING MOVES VECTOR#####
 def extract_moves_vector(response_text: str) -> list[list]:
-    # Buscar la línea que contiene "moves = ["
-    match = re.search(r'moves\s*=\s*\[.*\]', response_text, re.DOTALL)
-    if not match:
-        raise ValueError("❌ No se encontró 'moves = [' en la respuesta.")
-    
-    raw_block = match.group(0).split('=')[1].strip()
-    print(f"DEBUG: raw_block = {raw_block}")  # Debug
-    
-    # Remover líneas que empiecen con # (comentarios)
-    lines = raw_block.split('\n')
-    cleaned_lines = [line for line in lines if not line.strip().startswith('#')]
-    cleaned_block = '\n'.join(cleaned_lines).strip()
-    
-    # Remover cualquier texto después del último ]
-    end = cleaned_block.rfind(']')
-    if end != -1:
-        cleaned_block = cleaned_block[:end+1]
-    
-    print(f"DEBUG: cleaned_block = {cleaned_block}")  # Debug
-    
-    try:
-        moves = ast.literal_eval(cleaned_block)
-    except Exception as e:
-        raise ValueError(f"❌ Error al convertir el bloque a lista: {e}")
-    
-    if not (isinstance(moves, list) and all(isinstance(m, list) and len(m) == 3 for m in moves)):
-        raise ValueError("❌ El contenido extraído no es una lista válida de movimientos.")
-    
-    return moves
+    # Analizar en una sola pasada el bloque "moves = [...]" (moveParser.parse_move_lists)
+    return parse_move_lists(response_text, marker="moves")
 
 #####FUNCTION FOR SIMULATING MOVES#####
 def simulate_moves(initial_board: list, moves: list) -> list:
-    board = initial_board.copy()
-    for move in moves:
-        color, from_pos, to_pos = move
-        if board[from_pos] != color:
-            raise ValueError(f"❌ Movimiento inválido: {color} no está en posición {from_pos}")
-        if board[to_pos] != '_':
-            raise ValueError(f"❌ Posición destino {to_pos} no está vacía")
-        
-        # Verificar si es slide o jump
-        if abs(from_pos - to_pos) == 1:
-            # Slide
-            pass
-        elif abs(from_pos - to_pos) == 2:
-            # Jump: verificar que hay una pieza opuesta en medio
-            mid_pos = (from_pos + to_pos) // 2
-            opposite = 'B' if color == 'R' else 'R'
-            if board[mid_pos] != opposite:
-                raise ValueError(f"❌ Salto inválido: no hay {opposite} en posición {mid_pos}")
-        else:
-            raise ValueError(f"❌ Movimiento inválido: distancia {abs(from_pos - to_pos)} no permitida")
-        
-        # Ejecutar movimiento
-        board[from_pos] = '_'
-        board[to_pos] = color
-    
-    return board
+    """
+    Simula la secuencia de movimientos con CheckerEngine: tablero de bytes, cada movimiento se
+    valida en O(1) con todas las reglas (incluido que las fichas no pueden retroceder).
+    """
+    return CheckerBoard.from_list(initial_board).play(moves).to_list()
 
 # System prompt
 system_instruction = """
@@ -86,7 +45,7 @@ contents = f"""
 I have a puzzle with 2${N}$+1 positions, where ${N}$ red checkers (’R’) on left, ${N}$ blue checkers (’B’) on right, and one empty space (’_’) in between are arranged in a line. Initial board: {' '.join(['R'] * N + ['_'] + ['B'] * N)} Goal board: {' '.join(['B'] * N + ['_'] + ['R'] * N)} Rules: • Achecker can slide into an adjacent empty space. • Achecker can jump over exactly one checker of the opposite color to land in an empty space. • Checkers cannot move backwards (towards their starting side). Find the minimum sequence of moves to transform the initial board into the goal board.
 """
 
-response = client.models.generate_content(
+response = get_limiter("gemini").call(timed("gemini", client.models.generate_content),
     model="gemini-2.5-pro-preview-06-05",
     config=types.GenerateContentConfig(
         system_instruction=system_instruction,
@@ -118,6 +77,12 @@ success = False
 try:
     moves = extract_moves_vector(final_answer)
     print("Movimientos extraídos:", moves)
+    # Optimalidad: diferencia con N(N+2) (también si llega al objetivo retrocediendo), número de
+    # soluciones óptimas y primer movimiento que se sale de ellas (None: la respuesta es óptima)
+    score = score_answer(N, moves)
+    print(f"📐 {score['moves']} movimientos (óptimo: {score['optimal_moves']}, {score['optimal_solutions']} "
+          f"soluciones óptimas) | óptima: {score['optimal']} | diferencia: {score['gap']} | "
+          f"primera divergencia: {score['first_divergence']}")
     
     final_board = simulate_moves(initial_board, moves)
     print("Tablero final:", final_board)
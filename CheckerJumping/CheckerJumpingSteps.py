@@ -3,13 +3,25 @@ from google.genai import types
 import os
 import json
 from CheckerJumpingViewer import CheckerJumpingVisualizer
+from CheckerEngine import CheckerBoard, first_divergence, optimal_length
 import re
 import ast
 import csv
+import threading
 from datetime import datetime
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Harness"))
+from rateLimiter import get_limiter
+from clientPool import get_genai_client, timed
+from checkpoint import Checkpoint
+from moveParser import parse_move_lists, StreamingMoveValidator
+from streaming import add_stream_columns, stream_gemini
 
 # Configura la API
-client = genai.Client(api_key=os.getenv("GEMINI_API_KEY_HANOI"))
+client = get_genai_client("GEMINI_API_KEY_HANOI")
+
+# Modelo por defecto (se puede sobrescribir por experimento)
+MODEL_NAME = "gemini-2.5-pro-preview-06-05"
 
 #####FUNCTION FOR BUILDING THE PROMPT#####
 """
@@ -39,17 +51,9 @@ def build_checker_prompt(N: int, current_board: list, p: int) -> str:
     """
     return prompt
 
-######FUNCTION FOR ASKING THE AGENT#####
-"""
-This function interacts with the Gemini AI model to solve the Checker Jumping puzzle.
-It sends a prompt with the current configuration and the number of moves to make, and processes the response.
-The response includes the thought process and the final answer, which is a list of moves to be made.
-"""
-def ask_checker_agent(contents: str) -> tuple:
-    response = client.models.generate_content(
-        model="gemini-2.5-pro-preview-06-05",
-        config=types.GenerateContentConfig(
-            system_instruction="""
+# Instrucción de sistema y configuración comunes a las llamadas normales y en streaming
+GENERATION_CONFIG = types.GenerateContentConfig(
+    system_instruction="""
             You are a helpful assistant. Solve this puzzle for me. On a one-dimensional board, there are red checkers ('R'), blue checkers ('B'), and one empty space ('_'). A checker can move by either: 1. Sliding forward into an adjacent empty space, or 2. Jumping over exactly one checker of the opposite color to land in an empty space. The goal is to swap the positions of all red and blue checkers, effectively mirroring the initial state.
 
             Your solution should be a list of moves where each move is represented as [checker_color, position_from, position_to]. For example: moves = [['R', 0, 1], ['B', 2, 0], ['R', 1, 2]]
@@ -63,8 +67,19 @@ def ask_checker_agent(contents: str) -> tuple:
 
             IMPORTANT: Your response must be ONLY the list in the exact format 'moves = [[...], [...], ...]' with no additional text, comments, explanations, or variations. Any output with comments, extra text, or different formats is invalid and will not be accepted.
             """,
-            thinking_config=types.ThinkingConfig(include_thoughts=True)
-        ),
+    thinking_config=types.ThinkingConfig(include_thoughts=True)
+)
+
+######FUNCTION FOR ASKING THE AGENT#####
+"""
+This function interacts with the Gemini AI model to solve the Checker Jumping puzzle.
+It sends a prompt with the current configuration and the number of moves to make, and processes the response.
+The response includes the thought process and the final answer, which is a list of moves to be made.
+"""
+def ask_checker_agent(contents: str, model: str = MODEL_NAME) -> tuple:
+    response = get_limiter("gemini").call(timed("gemini", client.models.generate_content),
+        model=model,
+        config=GENERATION_CONFIG,
         contents=contents
     )
 
@@ -84,147 +99,192 @@ def ask_checker_agent(contents: str) -> tuple:
 
     return final_answer, response.usage_metadata
 
+"""
+Streaming variant: thoughts and answer are printed as they arrive and the latency metrics are returned
+as a third value. `on_chunk` can abort the generation (e.g. at the first illegal move).
+"""
+def ask_checker_agent_stream(contents: str, model: str = MODEL_NAME, on_chunk=None) -> tuple:
+    result = stream_gemini(client, model, GENERATION_CONFIG, contents, on_chunk=on_chunk)
+    usage = result.usage or types.GenerateContentResponseUsageMetadata()
+    return result.answer, usage, result.metrics()
+
 #####FUNCTION FOR EXTRACTING MOVES VECTOR#####
 """This function extracts the moves vector from the response text of the LLM.
 It uses regular expressions to find the first occurrence of a list formatted as [[...]] and converts it to a Python list.
 """
 def extract_moves_vector(response_text: str) -> list[list]:
-    # Buscar la línea que contiene "moves = ["
-    match = re.search(r'moves\s*=\s*\[.*\]', response_text, re.DOTALL)
-    if not match:
-        raise ValueError("❌ No se encontró 'moves = [' en la respuesta.")
-    
-    raw_block = match.group(0).split('=')[1].strip()
-    
-    # Remover líneas que empiecen con # (comentarios)
-    lines = raw_block.split('\n')
-    cleaned_lines = [line for line in lines if not line.strip().startswith('#')]
-    cleaned_block = '\n'.join(cleaned_lines).strip()
-    
-    # Remover cualquier texto después del último ]
-    end = cleaned_block.rfind(']')
-    if end != -1:
-        cleaned_block = cleaned_block[:end+1]
-    
-    try:
-        moves = ast.literal_eval(cleaned_block)
-    except Exception as e:
-        raise ValueError(f"❌ Error al convertir el bloque a lista: {e}")
-    
-    if not (isinstance(moves, list) and all(isinstance(m, list) and len(m) == 3 for m in moves)):
-        raise ValueError("❌ El contenido extraído no es una lista válida de movimientos.")
-    
-    return moves
-
-######TESTING THE FUNCTION######
-N = 6  # Number of checkers per color
-p = 30  # Number of moves to make in each iteration
-
-initial_board = ['R'] * N + ['_'] + ['B'] * N
-goal_board = ['B'] * N + ['_'] + ['R'] * N
-
-current_board = initial_board.copy()
-total_moves = []
-iteration = 0
-
-prompt_tokens = []
-output_tokens = []
-total_tokens = []
-success = False
-
-while True:
-    iteration += 1
-    print(f"\n🔄 Iteración {iteration} | Checkers = {N} | p = {p}")
-    try:
-        # Construir el prompt
-        prompt = build_checker_prompt(N=N, current_board=current_board, p=p)
-
-        # Preguntar al LLM
-        response_text, usage = ask_checker_agent(prompt)
-        prompt_tokens.append(usage.prompt_token_count)
-        output_tokens.append(usage.candidates_token_count)
-        total_tokens.append(usage.total_token_count)
-
-        # Extraer vector de movimientos
-        moves = extract_moves_vector(response_text)
-
-        # Guardar movimientos acumulados
-        total_moves.extend(moves)
-
-        # Aplicar movimientos y obtener nueva configuración
-        states = CheckerJumpingVisualizer.simulate_moves(current_board, moves)
-        if len(states) > len(moves):  # Si se pudieron aplicar todos los movimientos
-            new_board = states[-1]
-        else:
-            print(f"❌ No se pudieron aplicar todos los movimientos. Estados: {len(states)}, Movimientos: {len(moves)}")
-            break
+    # Analizar en una sola pasada el bloque "moves = [...]" (moveParser.parse_move_lists)
+    return parse_move_lists(response_text, marker="moves")
+
+######STEPWISE EXPERIMENT######
+# Varias pruebas pueden ejecutarse a la vez en el mismo proceso (asyncRunner)
+_csv_lock = threading.Lock()
+
+def run_steps_experiment(N: int = 6, p: int = 30, model: str = MODEL_NAME, stream: bool = False,
+                         resume: str = None) -> dict:
+    """
+    Ejecuta un experimento stepwise completo y guarda el uso de tokens en results/checker_jumping_steps.csv.
+    Con stream=True cada movimiento se valida según llega (la generación se corta en el primero
+    inválido) y la fila, con las métricas de latencia y el ahorro estimado, va a
+    results/checker_jumping_steps_stream.csv.
+    Cada iteración completada se guarda en results/checkpoints/; resume="<nombre del experimento>"
+    continúa un experimento interrumpido desde su última iteración correcta.
+    """
+    # Checkpoint por iteración: nuevo experimento o reanudación de uno interrumpido
+    if resume:
+        checkpoint = Checkpoint.load(resume, "checker_steps")
+        N, p, model, stream = (checkpoint.params[key] for key in ("N", "p", "model", "stream"))
+    else:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        checkpoint = Checkpoint.start(f"N{N}_p{p}_{timestamp}", "checker_steps",
+                                      {"N": N, "p": p, "model": model, "stream": stream})
+
+    initial_board = ['R'] * N + ['_'] + ['B'] * N
+    goal_board = ['B'] * N + ['_'] + ['R'] * N
 
-        # Verificar si se alcanzó el objetivo
-        if new_board == goal_board:
-            success = True
-            print("🎯 ¡Configuración objetivo alcanzada!")
+    current_board = checkpoint.state or initial_board.copy()
+    total_moves = checkpoint.total_moves
+    iteration = checkpoint.iteration
+
+    prompt_tokens = checkpoint.get("prompt_tokens")
+    output_tokens = checkpoint.get("output_tokens")
+    total_tokens = checkpoint.get("total_tokens")
+    ttft = checkpoint.get("ttft")
+    ttfat = checkpoint.get("ttfat")
+    decode_rate = checkpoint.get("decode_rate")
+    tokens_saved = 0
+    seconds_saved = 0.0
+    success = False
+
+    while True:
+        iteration += 1
+        print(f"\n🔄 Iteración {iteration} | Checkers = {N} | p = {p}")
+        try:
+            # Construir el prompt
+            prompt = build_checker_prompt(N=N, current_board=current_board, p=p)
+
+            # Preguntar al LLM
+            if stream:
+                # Validar cada movimiento según llega y cortar la generación en el primero inválido
+                validator = StreamingMoveValidator(CheckerBoard.from_list(current_board), CheckerBoard.apply_move,
+                                                   expected_moves=p, marker="moves")
+                response_text, usage, metrics = ask_checker_agent_stream(prompt, model=model, on_chunk=validator)
+                ttft.append(metrics["ttft"])
+                ttfat.append(metrics["ttfat"])
+                decode_rate.append(metrics["decode_rate"])
+            else:
+                response_text, usage = ask_checker_agent(prompt, model=model)
+            prompt_tokens.append(usage.prompt_token_count)
+            output_tokens.append(usage.candidates_token_count)
+            total_tokens.append(usage.total_token_count)
+
+            if stream and validator.error:
+                total_moves.extend(validator.moves)
+                tokens_saved, seconds_saved = validator.savings()
+                raise ValueError(f"{validator.error} (stream cortado, ~{tokens_saved} tokens y {seconds_saved} s ahorrados)")
+
+            # Extraer vector de movimientos
+            moves = extract_moves_vector(response_text)
+
+            # Guardar movimientos acumulados
+            total_moves.extend(moves)
+
+            # Aplicar movimientos y obtener nueva configuración
+            board = CheckerJumpingVisualizer.simulate_moves(current_board, moves)
+            if len(board.history) // 2 == len(moves):  # Si se pudieron aplicar todos los movimientos
+                new_board = board.to_list()
+            else:
+                print(f"❌ No se pudieron aplicar todos los movimientos. Aplicados: {len(board.history) // 2}, Movimientos: {len(moves)}")
+                break
+
+            # Guardar la iteración completada (permite reanudar tras un corte)
+            checkpoint.save(iteration, new_board, total_moves, prompt_tokens=prompt_tokens, output_tokens=output_tokens,
+                            total_tokens=total_tokens, ttft=ttft, ttfat=ttfat, decode_rate=decode_rate)
+
+            # Verificar si se alcanzó el objetivo
+            if new_board == goal_board:
+                success = True
+                print("🎯 ¡Configuración objetivo alcanzada!")
+                break
+
+            # Preparar para siguiente iteración
+            current_board = new_board
+            print(f"Tablero actual: {' '.join(current_board)}")
+
+        except ValueError as e:
+            print(f"❌ Se ha producido un error en la iteración {iteration}: {e}")
+            print("🛑 El experimento se detiene aquí debido a un movimiento inválido.")
             break
 
-        # Preparar para siguiente iteración
-        current_board = new_board
-        print(f"Tablero actual: {' '.join(current_board)}")
-
-    except ValueError as e:
-        print(f"❌ Se ha producido un error en la iteración {iteration}: {e}")
-        print("🛑 El experimento se detiene aquí debido a un movimiento inválido.")
-        break
-
-# === VISUALIZACIÓN FINAL ===
-print(f"\n✅ Secuencia de movimientos obtenida ({len(total_moves)} movimientos):", total_moves)
-print("\n🎥 Visualizando secuencia completa de movimientos...")
-viz_states = CheckerJumpingVisualizer.simulate_moves(initial_board, total_moves)
-print(f"Estados simulados: {len(viz_states)}")
-for i, state in enumerate(viz_states):
-    print(f"Paso {i}: {' '.join(state)}")
-
-# Opcional: animar si hay movimientos válidos
-if len(total_moves) > 0:
-    # CheckerJumpingVisualizer.animate(initial_board, total_moves)  # Comentado para no mostrar visualizador
-    pass
-
-results_value = 'ok' if success else 'fail'
-
-# Nombre del experimento
-timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-experiment_name = f"N{N}_p{p}_{timestamp}"
-
-# Número máximo de iteraciones registrables
-max_iters = 10
-
-# Rellenar con valores vacíos si hay menos de 10 iteraciones
-prompt_tokens += [''] * (max_iters - len(prompt_tokens))
-output_tokens += [''] * (max_iters - len(output_tokens))
-total_tokens += [''] * (max_iters - len(total_tokens))
-
-# Sumas totales
-prompt_sum = sum([t for t in prompt_tokens if isinstance(t, int)])
-output_sum = sum([t for t in output_tokens if isinstance(t, int)])
-total_sum = sum([t for t in total_tokens if isinstance(t, int)])
-
-# Encabezado
-headers = ['Name'] + \
-          [f"tokens_prompt_iter{i+1}" for i in range(max_iters)] + \
-          [f"tokens_candidates_iter{i+1}" for i in range(max_iters)] + \
-          [f"tokens_total_iter{i+1}" for i in range(max_iters)] + \
-          ['tokens_prompt_sum', 'tokens_candidates_sum', 'tokens_total_sum', 'results']
-
-# Fila de datos
-row = [experiment_name] + prompt_tokens + output_tokens + total_tokens + [prompt_sum, output_sum, total_sum, results_value]
-
-# Guardar en CSV
-os.makedirs("results", exist_ok=True)
-csv_path = os.path.join("results", "checker_jumping_steps.csv")
-
-file_exists = os.path.exists(csv_path)
-with open(csv_path, mode='a', newline='') as file:
-    writer = csv.writer(file)
-    if not file_exists:
-        writer.writerow(headers)
-    writer.writerow(row)
-
-print(f"\n📄 Resultados guardados en: {csv_path}")
+    # === VISUALIZACIÓN FINAL ===
+    print(f"\n✅ Secuencia de movimientos obtenida ({len(total_moves)} movimientos):", total_moves)
+    print("\n🎥 Visualizando secuencia completa de movimientos...")
+    viz_board = CheckerJumpingVisualizer.simulate_moves(initial_board, total_moves)
+    print(f"Estados simulados: {len(viz_board.history) // 2 + 1}")
+    for i, state in enumerate(viz_board.frames()):
+        print(f"Paso {i}: {' '.join(state)}")
+
+    # Primer movimiento fuera de las dos soluciones óptimas de N(N+2) movimientos
+    divergence = first_divergence(N, total_moves)
+    print(f"📐 {len(total_moves)} movimientos (óptimo: {optimal_length(N)}) | primera divergencia: {divergence}")
+
+    # Opcional: animar si hay movimientos válidos
+    if len(total_moves) > 0:
+        # CheckerJumpingVisualizer.animate(initial_board, total_moves)  # Comentado para no mostrar visualizador
+        pass
+
+    results_value = 'ok' if success else 'fail'
+    checkpoint.finish(results_value)
+
+    # Nombre del experimento (marcado si se ha reanudado)
+    experiment_name = checkpoint.row_name()
+
+    # Número máximo de iteraciones registrables
+    max_iters = 10
+
+    # Rellenar con valores vacíos si hay menos de 10 iteraciones
+    prompt_tokens += [''] * (max_iters - len(prompt_tokens))
+    output_tokens += [''] * (max_iters - len(output_tokens))
+    total_tokens += [''] * (max_iters - len(total_tokens))
+
+    # Sumas totales
+    prompt_sum = sum([t for t in prompt_tokens if isinstance(t, int)])
+    output_sum = sum([t for t in output_tokens if isinstance(t, int)])
+    total_sum = sum([t for t in total_tokens if isinstance(t, int)])
+
+    # Encabezado
+    headers = ['Name'] + \
+              [f"tokens_prompt_iter{i+1}" for i in range(max_iters)] + \
+              [f"tokens_candidates_iter{i+1}" for i in range(max_iters)] + \
+              [f"tokens_total_iter{i+1}" for i in range(max_iters)] + \
+              ['tokens_prompt_sum', 'tokens_candidates_sum', 'tokens_total_sum', 'results']
+
+    # Fila de datos
+    row = [experiment_name] + prompt_tokens + output_tokens + total_tokens + [prompt_sum, output_sum, total_sum, results_value]
+
+    # Métricas de latencia y early abort (solo en modo streaming, en un CSV aparte)
+    if stream:
+        headers, row = add_stream_columns(headers, row, ttft, ttfat, decode_rate, tokens_saved, seconds_saved, max_iters)
+
+    # Guardar en CSV
+    os.makedirs("results", exist_ok=True)
+    csv_path = os.path.join("results", "checker_jumping_steps_stream.csv" if stream else "checker_jumping_steps.csv")
+
+    with _csv_lock:
+        file_exists = os.path.exists(csv_path)
+        with open(csv_path, mode='a', newline='') as file:
+            writer = csv.writer(file)
+            if not file_exists:
+                writer.writerow(headers)
+            writer.writerow(row)
+
+    print(f"\n📄 Resultados guardados en: {csv_path}")
+    return {"name": experiment_name, "results": results_value, "moves": len(total_moves), "tokens_total": total_sum,
+            "optimal_moves": optimal_length(N), "first_divergence": divergence}
+
+
+if __name__ == "__main__":
+    N = 6  # Number of checkers per color
+    p = 30  # Number of moves to make in each iteration
+    resume = None  # Nombre de un experimento interrumpido para continuarlo (ver results/checkpoints)
+    run_steps_experiment(N=N, p=p, resume=resume)
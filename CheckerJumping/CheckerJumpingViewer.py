@@ -1,58 +1,35 @@
 import matplotlib.pyplot as plt
 import matplotlib.animation as animation
 import numpy as np
+from CheckerEngine import CheckerBoard
 
 class CheckerJumpingVisualizer:
     @staticmethod
-    def simulate_moves(initial_board: list, moves: list) -> list:
+    def simulate_moves(initial_board: list, moves: list) -> CheckerBoard:
         """
-        Simula la secuencia de movimientos en el tablero unidimensional.
-        Retorna la lista de estados del tablero después de cada movimiento.
-        Si hay un error, retorna los estados hasta el movimiento válido anterior.
+        Simula la secuencia de movimientos en el tablero unidimensional (CheckerEngine: reglas
+        completas, incluido que las fichas no pueden retroceder).
+        Retorna el tablero tras el último movimiento válido; su historial (board.history, un par
+        de posiciones por movimiento) permite reconstruir los estados con board.frames().
+        Si hay un error, se detiene en el movimiento válido anterior.
         """
-        board = initial_board.copy()
-        states = [board.copy()]
-        
+        board = CheckerBoard.from_list(initial_board)
         for i, move in enumerate(moves):
             try:
-                color, from_pos, to_pos = move
-                if board[from_pos] != color:
-                    print(f"❌ Movimiento {i+1} inválido: {color} no está en posición {from_pos}")
-                    print(f"   Estado actual: {' '.join(board)}")
-                    break
-                if board[to_pos] != '_':
-                    print(f"❌ Movimiento {i+1} inválido: posición destino {to_pos} no está vacía")
-                    print(f"   Estado actual: {' '.join(board)}")
-                    break
-                
-                # Verificar movimiento
-                if abs(from_pos - to_pos) == 1:
-                    # Slide
-                    pass
-                elif abs(from_pos - to_pos) == 2:
-                    # Jump
-                    mid_pos = (from_pos + to_pos) // 2
-                    opposite = 'B' if color == 'R' else 'R'
-                    if board[mid_pos] != opposite:
-                        print(f"❌ Movimiento {i+1} inválido: salto inválido, no hay {opposite} en posición {mid_pos}")
-                        print(f"   Estado actual: {' '.join(board)}")
-                        break
-                else:
-                    print(f"❌ Movimiento {i+1} inválido: distancia {abs(from_pos - to_pos)} no permitida")
-                    print(f"   Estado actual: {' '.join(board)}")
-                    break
-                
-                # Ejecutar
-                board[from_pos] = '_'
-                board[to_pos] = color
-                states.append(board.copy())
-                
-            except Exception as e:
-                print(f"❌ Error en movimiento {i+1}: {e}")
-                print(f"   Estado actual: {' '.join(board)}")
+                board.apply(move)
+            except (ValueError, TypeError) as e:
+                print(f"❌ Movimiento {i+1} inválido: {e}")
+                print(f"   Estado actual: {board}")
                 break
-        
-        return states
+        return board
+
+    @staticmethod
+    def apply_move(board: list, move: list) -> list:
+        """
+        Aplica un único movimiento [color, from, to] y devuelve el nuevo tablero.
+        Lanza ValueError si el movimiento no es legal (usado para validar respuestas en streaming).
+        """
+        return CheckerBoard.from_list(board).apply(move).to_list()
 
     @staticmethod
     def animate(initial_board: list, moves: list):
@@ -60,11 +37,22 @@ class CheckerJumpingVisualizer:
         Crea una animación del tablero evolucionando con los movimientos.
         Muestra todos los estados válidos hasta donde se pueda simular.
         """
-        states = CheckerJumpingVisualizer.simulate_moves(initial_board, moves)
-        
-        if len(states) <= 1:
+        board = CheckerJumpingVisualizer.simulate_moves(initial_board, moves)
+        valid_moves = len(board.history) // 2
+        if valid_moves == 0:
             print("⚠️ No hay movimientos válidos para animar.")
             return
+        # Los estados se reconstruyen uno a uno desde el historial (sin una copia por movimiento);
+        # si la animación vuelve atrás (p. ej. el dibujo inicial) se rehace desde el principio
+        replay = {"frames": board.frames(), "frame": -1, "state": None}
+
+        def state_at(frame):
+            if frame <= replay["frame"]:
+                replay.update(frames=board.frames(), frame=-1)
+            while replay["frame"] < frame:
+                replay["state"] = next(replay["frames"])
+                replay["frame"] += 1
+            return replay["state"]
         
         fig, ax = plt.subplots(figsize=(10, 2))
         ax.set_xlim(-0.5, len(initial_board) - 0.5)
@@ -82,19 +70,20 @@ class CheckerJumpingVisualizer:
             ax.set_aspect('equal')
             ax.axis('off')
             
-            board = states[frame]
-            for i, piece in enumerate(board):
+            state = state_at(frame)
+            for i, piece in enumerate(state):
                 color = color_map.get(piece, 'black')
                 ax.add_patch(plt.Rectangle((i-0.4, -0.4), 0.8, 0.8, color=color, ec='black'))
                 if piece != '_':
                     ax.text(i, 0, piece, ha='center', va='center', fontsize=20, color='white')
             
-            title = f"Paso {frame}: {' '.join(board)}"
-            if frame == len(states) - 1 and len(states) - 1 < len(moves):
+            title = f"Paso {frame}: {' '.join(state)}"
+            if frame == valid_moves and valid_moves < len(moves):
                 title += " (ERROR DETECTADO)"
             ax.set_title(title)
         
-        ani = animation.FuncAnimation(fig, update, frames=len(states), interval=1000, repeat=False)
+        ani = animation.FuncAnimation(fig, update, frames=valid_moves + 1, interval=1000, repeat=False,
+                                      cache_frame_data=False)
         plt.show()
 
     @staticmethod
@@ -115,9 +104,9 @@ if __name__ == "__main__":
     CheckerJumpingVisualizer.print_board(initial_board)
     
     # Simular movimientos y mostrar estados hasta donde sea posible
-    states = CheckerJumpingVisualizer.simulate_moves(initial_board, moves)
-    print(f"\nEstados simulados ({len(states)} de {len(moves) + 1} posibles):")
-    for i, state in enumerate(states):
+    board = CheckerJumpingVisualizer.simulate_moves(initial_board, moves)
+    print(f"\nEstados simulados ({len(board.history) // 2 + 1} de {len(moves) + 1} posibles):")
+    for i, state in enumerate(board.frames()):
         print(f"Paso {i}: {' '.join(state)}")
     
     # Animar siempre, incluso si hay errores
@@ -0,0 +1,186 @@
+"""
+Layered BFS that verifies the Checker Jumping optimum and counts its optimal solutions.
+
+The baseline prompt asks for the "minimum sequence of moves", but checker_jumping_baseline.csv
+only says ok / fail. CheckerEngine gives the N(N+2) closed form; this module checks it by search
+and counts how many different optimal answers exist, so an answer can be reported as optimal or
+not, with its gap to the optimum and the number of equivalent optimal answers.
+
+A board is one integer: the mask of red squares shifted past the index of the empty square
+(blue squares are the rest). Only the four squares next to the empty one can move, so the
+successors of a board are found with a few bit operations, and the key fits in 64 bits up to
+N = MAX_N. The BFS goes layer by layer (one layer per number of moves):
+
+    frontier       two array('Q'): the keys of the boards first reached at this depth and, for
+                   each one, the number of shortest move sequences that reach it
+    visited        hashed set of every key seen so far (a board is counted only at its first depth)
+
+The counts of a layer are the sums of the counts of its parents, so when the goal board appears
+its count is the number of optimal solutions. Results are cached per N in
+results/checker_optimal_counts.json.
+
+With backward moves forbidden every move adds 1 (slide) or 2 (jump) squares of progress towards
+a fixed total, and the search shows that every solution is optimal and that there are exactly 2
+of them (the mirror pair of CheckerEngine). A solved answer can only be longer than the optimum
+if it uses backward moves, which the old simulate_moves accepted, so `score_answer` also replays
+answers with those rules to report their gap.
+
+Example:
+    optimal_counts(3)        # {'N': 3, 'optimal_moves': 15, 'optimal_solutions': 2, 'states': 72}
+    score_answer(3, moves)   # {'valid': True, 'solved': True, 'moves': 15, 'gap': 0, 'optimal': True, ...}
+"""
+import json
+import os
+from array import array
+
+from CheckerEngine import CheckerBoard, first_divergence, optimal_length
+
+COUNTS_PATH = os.path.join("results", "checker_optimal_counts.json")
+MAX_N = 28          # máscara de rojas (2N+1 bits) + índice del hueco (_shift(N) bits) <= 64 bits
+MAX_BFS_N = 16      # más allá, solo la forma cerrada (~2x tableros y tiempo por cada N más)
+
+
+#####ENCODING#####
+def _shift(N: int) -> int:
+    return (2 * N + 1).bit_length()
+
+
+def _key(board: CheckerBoard, shift: int) -> int:
+    reds = sum(1 << i for i, cell in enumerate(board.cells) if cell == ord('R'))
+    return (reds << shift) | board.empty
+
+
+def _successors(key: int, size: int, shift: int):
+    reds, empty = key >> shift, key & ((1 << shift) - 1)
+    # Roja a la izquierda del hueco: desliza, o salta si en medio hay una azul
+    if empty >= 1 and reds >> (empty - 1) & 1:
+        yield ((reds ^ (1 << (empty - 1)) | (1 << empty)) << shift) | (empty - 1)
+    if empty >= 2 and reds >> (empty - 2) & 1 and not reds >> (empty - 1) & 1:
+        yield ((reds ^ (1 << (empty - 2)) | (1 << empty)) << shift) | (empty - 2)
+    # Azul a la derecha del hueco: las rojas no cambian, solo el hueco
+    if empty + 1 < size and not reds >> (empty + 1) & 1:
+        yield (reds << shift) | (empty + 1)
+    if empty + 2 < size and not reds >> (empty + 2) & 1 and reds >> (empty + 1) & 1:
+        yield (reds << shift) | (empty + 2)
+
+
+#####BFS#####
+def count_optimal(N: int) -> dict:
+    """
+    Optimal number of moves, number of optimal solutions and number of boards explored, by
+    layered BFS from the initial board until the goal board is reached.
+    """
+    if not 1 <= N <= MAX_N:
+        raise ValueError(f"❌ N={N} fuera de rango para la BFS (1..{MAX_N})")
+    size, shift = 2 * N + 1, _shift(N)
+    start, goal = _key(CheckerBoard.initial(N), shift), _key(CheckerBoard.goal(N), shift)
+    keys, counts = array('Q', [start]), array('Q', [1])
+    visited = {start}
+    depth = 0
+    while keys:
+        layer = {}
+        for key, count in zip(keys, counts):
+            for successor in _successors(key, size, shift):
+                if successor not in visited:
+                    layer[successor] = layer.get(successor, 0) + count
+        depth += 1
+        if goal in layer:
+            return {"N": N, "optimal_moves": depth, "optimal_solutions": layer[goal], "states": len(visited) + len(layer)}
+        visited.update(layer)
+        keys, counts = array('Q', layer.keys()), array('Q', layer.values())
+    raise ValueError(f"❌ La BFS no alcanza el tablero objetivo para N={N}")
+
+
+#####CACHE#####
+def load_counts(path: str = COUNTS_PATH) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def optimal_counts(N: int, path: str = COUNTS_PATH) -> dict:
+    """count_optimal(N), computed once and cached in results/checker_optimal_counts.json."""
+    counts = load_counts(path)
+    if str(N) not in counts:
+        counts[str(N)] = count_optimal(N)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(dict(sorted(counts.items(), key=lambda item: int(item[0]))), f, indent=1)
+        os.replace(tmp_path, path)
+    return counts[str(N)]
+
+
+#####SCORING#####
+def _play_without_direction(N: int, moves):
+    """
+    Final board under the rules of the old simulate_moves (slides and jumps in either direction),
+    or None at the first move those rules reject.
+    """
+    board = CheckerBoard.initial(N).to_list()
+    for move in moves:
+        try:
+            color, from_pos, to_pos = move
+            distance = abs(to_pos - from_pos)
+            if min(from_pos, to_pos) < 0 or distance not in (1, 2) or board[from_pos] != color or \
+                    board[to_pos] != '_' or (distance == 2 and board[(from_pos + to_pos) // 2] in (color, '_')):
+                return None
+        except (ValueError, TypeError, IndexError):
+            return None
+        board[from_pos], board[to_pos] = '_', color
+    return board
+
+
+def score_answer(N: int, moves) -> dict:
+    """
+    Scores a complete answer: `valid` (every rule, including no backward moves), `solved` (reaches
+    the goal, also counting the backward moves the old simulation accepted), `gap` to the optimum,
+    `optimal`, the number of optimal answers and the first move that leaves them. For N above
+    MAX_BFS_N the optimum is the closed form and the number of optimal answers is not known (None).
+    """
+    board = CheckerBoard.initial(N)
+    try:
+        board.play(moves)
+        valid = True
+    except (ValueError, TypeError):
+        valid = False
+    goal = CheckerBoard.goal(N)
+    solved = board == goal if valid else _play_without_direction(N, moves) == goal.to_list()
+    reference = optimal_counts(N) if N <= MAX_BFS_N else {"optimal_moves": optimal_length(N), "optimal_solutions": None}
+    gap = len(moves) - reference["optimal_moves"] if solved else None
+    return {"valid": valid, "solved": solved, "moves": len(moves), "optimal_moves": reference["optimal_moves"],
+            "gap": gap, "optimal": valid and gap == 0, "optimal_solutions": reference["optimal_solutions"],
+            "first_divergence": first_divergence(N, moves)}
+
+
+if __name__ == "__main__":
+    # Verificación de N(N+2) y recuento de soluciones óptimas para N = 1..15 (se guarda en la caché)
+    import time
+    from functools import lru_cache
+
+    # La clave de MAX_N cabe en array('Q'); la de MAX_N + 1 ya no
+    assert 2 * MAX_N + 1 + _shift(MAX_N) <= 64 < 2 * MAX_N + 3 + _shift(MAX_N + 1)
+    array('Q', [_key(CheckerBoard.goal(MAX_N), _shift(MAX_N))])
+
+    for N in range(1, 16):
+        t0 = time.perf_counter()
+        result = optimal_counts(N)
+        assert result["optimal_moves"] == optimal_length(N)
+        print(f"N={N:2d} | óptimo {result['optimal_moves']:3d} movimientos | "
+              f"{result['optimal_solutions']} soluciones óptimas | {result['states']:7d} tableros | "
+              f"{time.perf_counter() - t0:.2f} s")
+
+    # Sin movimientos hacia atrás, todas las soluciones (no solo las más cortas) tienen N(N+2) movimientos
+    for N in range(1, 9):
+        size, shift = 2 * N + 1, _shift(N)
+        goal = _key(CheckerBoard.goal(N), shift)
+
+        @lru_cache(maxsize=None)
+        def lengths(key):
+            if key == goal:
+                return frozenset([0])
+            return frozenset(length + 1 for successor in _successors(key, size, shift) for length in lengths(successor))
+
+        assert lengths(_key(CheckerBoard.initial(N), shift)) == {optimal_length(N)}
+    print("✅ Para N <= 8 toda solución sin retrocesos es óptima")
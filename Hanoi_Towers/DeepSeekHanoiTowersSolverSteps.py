@@ -5,8 +5,21 @@ import re
 import ast
 from datetime import datetime
 import csv
+import threading
+import time
 
 from HanoiTowersViewers import HanoiVisualizer  # se mantiene igual
+from HanoiState import HanoiState
+from HanoiOracle import save_optimality, score_moves
+from FrameStewart import multipeg_instruction
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Harness"))
+from rateLimiter import get_limiter
+from clientPool import get_http_session, timed
+from responseCache import cached_call
+from checkpoint import Checkpoint
+from moveParser import MoveArray, parse_int_moves, StreamingMoveValidator
+from streaming import add_stream_columns, collect_stream, openai_sse_chunks
 
 # =========================
 # Ollama (OpenAI-compatible) config
@@ -57,17 +70,16 @@ def build_hanoi_prompt(N: int, k: list[list[int]], p: int) -> str:
 
     peg_descriptions = "\n".join(format_peg(i, peg) for i, peg in enumerate(k))
     goal_list = list(range(N, 0, -1))
-    goal_str = (
-        "    • Peg 0: (empty)\n"
-        "    • Peg 1: (empty)\n"
-        "    • Peg 2: $" + f"{goal_list[0]}$ (bottom), ..." + f" {goal_list[-1]} (top)"
-    )
+    # Objetivo: todos los discos en la última varilla (k puede tener más de 3 varillas)
+    goal_peg = len(k) - 1
+    goal_str = "".join(f"    • Peg {i}: (empty)\n" for i in range(goal_peg)) + \
+               f"    • Peg {goal_peg}: $" + f"{goal_list[0]}$ (bottom), ..." + f" {goal_list[-1]} (top)"
 
     prompt = f"""
     I have a puzzle with ${N}$ disks of different sizes with configuration k={k} and I want to make ${p}$ moves to bring us closer to the solution:
 {peg_descriptions}
 
-    Goal configuration k=[[],[],{goal_list}]:
+    Goal configuration k=[{'[],' * goal_peg}{goal_list}]:
 {goal_str}
 
     Rules:
@@ -104,25 +116,39 @@ The current configuration of the problem k, since it may be in the initial state
 Your response should be just a vector of moves, without any additional text or explanations.
 """
 
-def ask_hanoi_agent(contents: str):
+def _post_chat(payload: dict) -> dict:
+    """
+    POST to the Ollama chat endpoint under the shared rate limiter.
+    Served from the on-disk response cache when LLM_CACHE_MODE is enabled.
+    """
+    def post():
+        with get_limiter("ollama").request() as slot:
+            resp = timed("ollama", get_http_session("ollama").post)(LM_STUDIO_URL, json=payload, timeout=600)
+            resp.raise_for_status()
+            data = resp.json()
+            slot.record(data.get("usage"))
+        return data
+    return cached_call(payload, post)
+
+def ask_hanoi_agent(contents: str, model: str = LM_MODEL, pegs: int = 3):
     """
     Calls Ollama OpenAI-compatible chat completions with the same prompt structure.
     Prints a 'Thought summary' if a <think> block is present, then prints 'Answer'.
-    Returns (final_answer_text, usage_like_object).
+    Returns (final_answer_text, usage_like_object). With pegs > 3 the system instruction
+    describes the multi-peg variant.
     """
+    system_instruction = multipeg_instruction(SYSTEM_INSTRUCTION, pegs)
     payload = {
-        "model": LM_MODEL,
+        "model": model,
         "messages": [
-            {"role": "system", "content": SYSTEM_INSTRUCTION},
+            {"role": "system", "content": system_instruction},
             {"role": "user", "content": contents},
         ],
         "temperature": 0.0,
         "max_tokens": 8192,  # ajusta según tu Ollama
     }
 
-    resp = requests.post(LM_STUDIO_URL, json=payload, timeout=600)
-    resp.raise_for_status()
-    data = resp.json()
+    data = _post_chat(payload)
 
     # Content (single choice)
     choice = data["choices"][0]
@@ -150,9 +176,9 @@ def ask_hanoi_agent(contents: str):
     # Si se cortó por longitud, intenta continuar automáticamente una vez.
     if finish_reason == "length":
         cont_payload = {
-            "model": LM_MODEL,
+            "model": model,
             "messages": [
-                {"role": "system", "content": SYSTEM_INSTRUCTION},
+                {"role": "system", "content": system_instruction},
                 {"role": "user", "content": contents},
                 {"role": "assistant", "content": content},
                 {"role": "user", "content": "Continue. Do not repeat any previous text. Just continue."},
@@ -160,9 +186,7 @@ def ask_hanoi_agent(contents: str):
             "temperature": 0.0,
             "max_tokens": 16184,  # ajusta según tu Ollama
         }
-        cont = requests.post(LM_STUDIO_URL, json=cont_payload, timeout=600)
-        cont.raise_for_status()
-        cdata = cont.json()
+        cdata = _post_chat(cont_payload)
         cchoice = cdata["choices"][0]
         ctext = cchoice.get("message", {}).get("content", "") or ""
         _, canswer = parse_think_and_answer(ctext)
@@ -177,48 +201,137 @@ def ask_hanoi_agent(contents: str):
 
     return answer, usage
 
-# =========================
-# EXTRACT MOVES (igual)
-# =========================
-def extract_moves_vector(response_text: str) -> list[list[int]]:
+def _stream_chat(payload: dict, on_chunk=None):
     """
-    Extracts the first [[...]] list of integer triplets from a noisy LLM output.
+    Streams a chat completion (SSE) under the shared rate limiter and returns a StreamResult.
+    Streaming requests are not served from the response cache: they are run to measure latency.
+    `on_chunk` can abort the generation (the HTTP response is closed).
     """
-    start = response_text.find('[')
-    end = response_text.rfind(']')
+    payload = dict(payload, stream=True, stream_options={"include_usage": True})
 
-    if start == -1 or end == -1 or end <= start:
-        raise ValueError("❌ No valid block delimited by [ and ] was found.")
+    def post():
+        start = time.perf_counter()
+        resp = get_http_session("ollama").post(LM_STUDIO_URL, json=payload, timeout=600, stream=True)
+        resp.raise_for_status()
+        with resp:
+            return collect_stream(openai_sse_chunks(resp), start=start, on_chunk=on_chunk)
 
-    raw_block = response_text[start:end+1]
-    cleaned_block = re.sub(r"[^\d\[\],-]", "", raw_block)  # permite posibles negativos si el modelo se equivoca
+    with get_limiter("ollama").request() as slot:
+        result = timed("ollama", post)()
+        slot.record(result.usage)
+    return result
 
-    try:
-        moves = ast.literal_eval(cleaned_block)
-    except Exception as e:
-        raise ValueError(f"❌ Failed to convert cleaned block to list: {e}")
-    
-    if not (isinstance(moves, list) and all(isinstance(m, list) and len(m) == 3 for m in moves)):
-        raise ValueError("❌ Extracted content is not a valid list of [disk, from, to] moves.")
-    return moves
+def ask_hanoi_agent_stream(contents: str, model: str = LM_MODEL, on_chunk=None, pegs: int = 3):
+    """
+    Streaming variant of ask_hanoi_agent: thoughts and answer are printed as they arrive.
+    Returns (final_answer_text, usage_like_object, metrics) where metrics holds the time to first
+    token, time to first answer token and decode rate of the (first) request. `on_chunk` sees the
+    chunks of the request and of its continuation, and can abort them.
+    """
+    messages = [
+        {"role": "system", "content": multipeg_instruction(SYSTEM_INSTRUCTION, pegs)},
+        {"role": "user", "content": contents},
+    ]
+    result = _stream_chat({"model": model, "messages": messages, "temperature": 0.0, "max_tokens": 8192}, on_chunk=on_chunk)
+    answer = result.answer
+    u = result.usage or {}
+    usage = SimpleUsage(
+        prompt_tokens=u.get("prompt_tokens", 0),
+        completion_tokens=u.get("completion_tokens", 0),
+        total_tokens=u.get("total_tokens", 0),
+    )
+
+    # Si se cortó por longitud, intenta continuar automáticamente una vez.
+    if result.finish_reason == "length" and not result.aborted:
+        cont = _stream_chat({
+            "model": model,
+            "messages": messages + [
+                {"role": "assistant", "content": f"<think>{result.thought}</think>{result.answer}" if result.thought else result.answer},
+                {"role": "user", "content": "Continue. Do not repeat any previous text. Just continue."},
+            ],
+            "temperature": 0.0,
+            "max_tokens": 16184,
+        }, on_chunk=on_chunk)
+        if cont.answer:
+            answer += ("" if answer.endswith("\n") else "\n") + cont.answer
+        cu = cont.usage or {}
+        usage = SimpleUsage(
+            prompt_tokens=usage.prompt_token_count + cu.get("prompt_tokens", 0),
+            completion_tokens=usage.candidates_token_count + cu.get("completion_tokens", 0),
+            total_tokens=usage.total_token_count + cu.get("total_tokens", 0),
+        )
+
+    return answer, usage, result.metrics()
 
 # =========================
-# MAIN EXPERIMENT (idéntico)
+# EXTRACT MOVES (igual)
 # =========================
-if __name__ == "__main__":
-    N = 9  # Number of disks
-    p = 150 # Number of moves per iteration
-
-    k_init = [list(range(N, 0, -1)), [], []]
-    goal_config = [[], [], list(range(N, 0, -1))]
+def extract_moves_vector(response_text: str) -> MoveArray:
+    """
+    Extracts the [[disk, from, to], ...] moves vector from a noisy LLM output in a single pass
+    (moveParser.parse_int_moves). Negative values are kept so that they fail as invalid pegs.
+    """
+    return parse_int_moves(response_text)
 
-    k_current = [peg[:] for peg in k_init]
-    total_moves = []
-    iteration = 0
+# =========================
+# MAIN EXPERIMENT (idéntico)
+# =========================
+# Varias pruebas pueden ejecutarse a la vez en el mismo proceso (asyncRunner)
+_csv_lock = threading.Lock()
 
-    prompt_tokens = []
-    output_tokens = []
-    total_tokens = []
+def run_steps_experiment(N: int = 9, p: int = 150, model: str = LM_MODEL, stream: bool = False,
+                         resume: str = None, pegs: int = 3, stop_on_repeat: bool = False) -> dict:
+    """
+    Runs one stepwise experiment against the local model and appends its token usage
+    to results/Deep_Seek_Steps_hanoi_token_usage.csv. With stream=True the responses are streamed,
+    each move is validated as it arrives (the generation is cut at the first illegal one) and the
+    row, extended with TTFT / time to first answer token / decode rate per iteration and the
+    estimated tokens/seconds saved by the early abort, goes to
+    results/Deep_Seek_Steps_hanoi_token_usage_stream.csv.
+    Every completed iteration is checkpointed in results/checkpoints/; resume="<experiment name>"
+    continues an interrupted run from its last good iteration.
+    An iteration that ends on a configuration already reached is logged and kept in the checkpoint
+    ('repeats'); the run goes on unless stop_on_repeat=True, which stops it with the result 'loop'.
+    """
+    # Checkpoint por iteración: nuevo experimento o reanudación de uno interrumpido
+    if resume:
+        checkpoint = Checkpoint.load(resume, "hanoi_steps_deepseek")
+        N, p, model, stream = (checkpoint.params[key] for key in ("N", "p", "model", "stream"))
+        pegs = checkpoint.params.get("pegs", 3)
+        stop_on_repeat = checkpoint.params.get("stop_on_repeat", False)
+    else:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        pegs_tag = "" if pegs == 3 else f"pegs{pegs}_"
+        checkpoint = Checkpoint.start(f"N{N}_p{p}_{pegs_tag}{timestamp}", "hanoi_steps_deepseek",
+                                      {"N": N, "p": p, "model": model, "stream": stream, "pegs": pegs,
+                                       "stop_on_repeat": stop_on_repeat})
+
+    k_init = HanoiState.initial(N, pegs=pegs)
+    goal_config = HanoiState.goal(N, pegs=pegs)
+
+    k_current = HanoiState.from_lists(checkpoint.state) if checkpoint.state else k_init
+    total_moves = checkpoint.total_moves
+    iteration = checkpoint.iteration
+    # Configuración al final de cada iteración (la 0 es la inicial; None si el checkpoint es anterior)
+    # y primera iteración en la que se alcanzó cada una. Volver a una se registra en `repeats`; solo
+    # con stop_on_repeat=True corta el experimento, con el resultado 'loop'
+    configs = checkpoint.get("configs") or [None] * iteration + [k_current.to_lists()]
+    visited = {}
+    for i, config in enumerate(configs):
+        if config is not None:
+            visited.setdefault(HanoiState.from_lists(config), i)
+    repeats = checkpoint.get("repeats")
+    looped = False
+
+    prompt_tokens = checkpoint.get("prompt_tokens")
+    output_tokens = checkpoint.get("output_tokens")
+    total_tokens = checkpoint.get("total_tokens")
+    ttft = checkpoint.get("ttft")
+    ttfat = checkpoint.get("ttfat")
+    decode_rate = checkpoint.get("decode_rate")
+    optimality = checkpoint.get("optimality")   # distancia óptima antes/después de cada iteración
+    tokens_saved = 0
+    seconds_saved = 0.0
     success = False
 
     while True:
@@ -229,13 +342,30 @@ if __name__ == "__main__":
             prompt = build_hanoi_prompt(N=N, k=k_current, p=p)
 
             # Ask local LLM (Ollama)
-            response_text, usage = ask_hanoi_agent(prompt)
+            if stream:
+                # Validar cada movimiento según llega y cortar la generación en el primero inválido
+                validator = StreamingMoveValidator(k_current, HanoiVisualizer.apply_move, expected_moves=p)
+                response_text, usage, metrics = ask_hanoi_agent_stream(prompt, model=model, on_chunk=validator, pegs=pegs)
+                ttft.append(metrics["ttft"])
+                ttfat.append(metrics["ttfat"])
+                decode_rate.append(metrics["decode_rate"])
+            else:
+                response_text, usage = ask_hanoi_agent(prompt, model=model, pegs=pegs)
             prompt_tokens.append(usage.prompt_token_count)
             output_tokens.append(usage.candidates_token_count)
             total_tokens.append(usage.total_token_count)
 
+            if stream and validator.error:
+                total_moves.extend(validator.moves)
+                if pegs == 3:
+                    optimality.append(score_moves(k_current, validator.moves + [validator.failed_move]))
+                tokens_saved, seconds_saved = validator.savings()
+                raise ValueError(f"{validator.error} (stream cortado, ~{tokens_saved} tokens y {seconds_saved} s ahorrados)")
+
             # Extract moves
             moves = extract_moves_vector(response_text)
+            if pegs == 3:  # oráculo de forma cerrada: solo 3 varillas
+                optimality.append(score_moves(k_current, moves))
 
             # Accumulate
             total_moves.extend(moves)
@@ -243,12 +373,30 @@ if __name__ == "__main__":
             # Apply moves
             new_config = HanoiVisualizer.simulate_moves(k_current, moves)
 
+            # ¿Configuración ya alcanzada en una iteración anterior?
+            first_seen = visited.setdefault(new_config, iteration)
+            if first_seen != iteration:
+                repeats.append(iteration)
+                print(f"🔁 La configuración {new_config} ya se alcanzó en la iteración {first_seen}")
+            configs.append(new_config.to_lists())
+
+            # Checkpoint of the completed iteration (allows resuming after a crash)
+            checkpoint.save(iteration, new_config.to_lists(), total_moves, prompt_tokens=prompt_tokens, output_tokens=output_tokens,
+                            total_tokens=total_tokens, ttft=ttft, ttfat=ttfat, decode_rate=decode_rate,
+                            optimality=optimality, configs=configs, repeats=repeats)
+
             # Check goal
             if new_config == goal_config:
                 success = True
                 print("🎯 ¡Configuración objetivo alcanzada!")
                 break
 
+            # Bucle entre iteraciones: se registra y el modelo puede salir de él en la siguiente
+            if first_seen != iteration and stop_on_repeat:
+                looped = True
+                print("🛑 stop_on_repeat: el experimento se detiene aquí ('loop').")
+                break
+
             # Next iteration
             k_current = new_config
 
@@ -263,11 +411,13 @@ if __name__ == "__main__":
     viz = HanoiVisualizer(k_init, total_moves)
     # viz.animate()
 
-    results_value = 'ok' if success else 'fail'
+    if repeats:
+        print(f"🔁 Iteraciones que volvieron a una configuración ya vista: {repeats}")
+    results_value = 'ok' if success else 'loop' if looped else 'fail'
+    checkpoint.finish(results_value)
 
-    # Save CSV (idéntico)
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    experiment_name = f"N{N}_p{p}_{timestamp}"
+    # Save CSV (idéntico; el nombre se marca si el experimento se ha reanudado)
+    experiment_name = checkpoint.row_name()
 
     max_iters = 10
     prompt_tokens += [''] * (max_iters - len(prompt_tokens))
@@ -286,14 +436,29 @@ if __name__ == "__main__":
 
     row = [experiment_name] + prompt_tokens + output_tokens + total_tokens + [prompt_sum, output_sum, total_sum, results_value]
 
-    os.makedirs("results", exist_ok=True)
-    csv_path = os.path.join("results", "Deep_Seek_Steps_hanoi_token_usage.csv")
+    if stream:
+        headers, row = add_stream_columns(headers, row, ttft, ttfat, decode_rate, tokens_saved, seconds_saved, max_iters)
 
-    file_exists = os.path.exists(csv_path)
-    with open(csv_path, mode='a', newline='') as file:
-        writer = csv.writer(file)
-        if not file_exists:
-            writer.writerow(headers)
-        writer.writerow(row)
+    os.makedirs("results", exist_ok=True)
+    csv_name = "Deep_Seek_Steps_hanoi_token_usage" + ("" if pegs == 3 else "_pegs") + ("_stream" if stream else "") + ".csv"
+    csv_path = os.path.join("results", csv_name)
+
+    with _csv_lock:
+        file_exists = os.path.exists(csv_path)
+        with open(csv_path, mode='a', newline='') as file:
+            writer = csv.writer(file)
+            if not file_exists:
+                writer.writerow(headers)
+            writer.writerow(row)
+        save_optimality(experiment_name, "steps_deepseek", N, p, optimality)
 
     print(f"\n📄 Resultados guardados en: {csv_path}")
+    return {"name": experiment_name, "results": results_value, "moves": len(total_moves), "tokens_total": total_sum}
+
+
+if __name__ == "__main__":
+    N = 9  # Number of disks
+    p = 150 # Number of moves per iteration
+    resume = None # Name of an interrupted experiment to continue (see results/checkpoints)
+    run_steps_experiment(N=N, p=p, resume=resume)
+
@@ -0,0 +1,166 @@
+"""
+Multi-peg Tower of Hanoi: memoized Frame-Stewart solver.
+
+With k >= 4 pegs the optimal strategy is no longer the binary one. Frame-Stewart moves the t
+smallest disks to an intermediate peg with all k pegs, the n - t largest ones to the target with
+the remaining k - 1 pegs and the t smallest ones on top of them again, choosing the best t:
+
+    FS(n, 3) = 2^n - 1
+    FS(n, k) = min over 0 <= t < n of  2 * FS(t, k) + FS(n - t, k - 1)
+
+The table of FS values and best splits is memoized, so the distance tables and the reference
+sequences for N up to 30 are built on the fly (FS(30, 4) = 1025 moves). The recursion is
+optimal for 4 pegs (proved by Bousch, 2014) and conjectured optimal for more.
+
+`multipeg_instruction` adapts the 3-peg system instruction of the Hanoi scripts to k pegs
+(number of pegs, goal peg and worked example); with k = 3 it returns the text unchanged.
+
+Example:
+    min_moves(20, 4)                    # 289
+    moves = solve(10, 4)                # [[1, 0, 1], [2, 0, 2], ...], ends on peg 3
+    distance_table(30, max_pegs=5)[4]   # [0, 1, 3, 5, 9, 13, 17, 25, ...]
+"""
+import re
+from functools import lru_cache
+
+MIN_PEGS = 3
+
+
+@lru_cache(maxsize=None)
+def _frame_stewart(n: int, pegs: int) -> tuple[int, int]:
+    """
+    (minimum number of moves, best split t) for n disks and `pegs` pegs.
+    """
+    if pegs < MIN_PEGS:
+        raise ValueError(f"❌ Se necesitan al menos {MIN_PEGS} varillas (pegs={pegs}).")
+    if n == 0:
+        return 0, 0
+    if pegs == MIN_PEGS:
+        return (1 << n) - 1, n - 1
+    best, split = None, 0
+    for t in range(n):
+        moves = 2 * _frame_stewart(t, pegs)[0] + _frame_stewart(n - t, pegs - 1)[0]
+        if best is None or moves < best:
+            best, split = moves, t
+    return best, split
+
+
+def min_moves(n: int, pegs: int = 4) -> int:
+    """Frame-Stewart number of moves for a full tower of n disks."""
+    # Rellenar la tabla de abajo arriba para no agotar la pila de recursión con N grandes
+    for m in range(n + 1):
+        _frame_stewart(m, pegs)
+    return _frame_stewart(n, pegs)[0]
+
+
+def best_split(n: int, pegs: int = 4) -> int:
+    """Number of small disks parked on an intermediate peg in the optimal strategy."""
+    min_moves(n, pegs)
+    return _frame_stewart(n, pegs)[1]
+
+
+def distance_table(max_n: int, max_pegs: int = 5) -> dict:
+    """
+    {pegs: [FS(0, pegs), ..., FS(max_n, pegs)]} for 3 <= pegs <= max_pegs.
+    """
+    return {pegs: [min_moves(n, pegs) for n in range(max_n + 1)] for pegs in range(MIN_PEGS, max_pegs + 1)}
+
+
+#####SOLUTIONS#####
+def iter_solution(n: int, pegs: int = 4, source: int = 0, target: int = None):
+    """
+    Yields the moves [disk, from_peg, to_peg] of a Frame-Stewart solution moving disks 1..n
+    from `source` to `target` (default: the last peg).
+    """
+    target = pegs - 1 if target is None else target
+    min_moves(n, pegs)
+    yield from _solve(1, n, source, target, tuple(range(pegs)))
+
+
+def solve(n: int, pegs: int = 4, source: int = 0, target: int = None) -> list:
+    return list(iter_solution(n, pegs, source, target))
+
+
+def _solve(smallest: int, largest: int, source: int, target: int, free: tuple):
+    """Moves disks smallest..largest (a tower) from source to target using the pegs in `free`."""
+    n = largest - smallest + 1
+    if n <= 0:
+        return
+    if n == 1:
+        yield [smallest, source, target]
+        return
+    if len(free) == MIN_PEGS:
+        spare = next(peg for peg in free if peg not in (source, target))
+        yield from _solve(smallest, largest - 1, source, spare, free)
+        yield [largest, source, target]
+        yield from _solve(smallest, largest - 1, spare, target, free)
+        return
+    t = _frame_stewart(n, len(free))[1]
+    parking = next(peg for peg in free if peg not in (source, target))
+    rest = tuple(peg for peg in free if peg != parking)
+    yield from _solve(smallest, smallest + t - 1, source, parking, free)
+    yield from _solve(smallest + t, largest, source, target, rest)
+    yield from _solve(smallest, smallest + t - 1, parking, target, free)
+
+
+#####PROMPTS#####
+def multipeg_instruction(instruction: str, pegs: int) -> str:
+    """
+    Rewrites the standard 3-peg Hanoi system instruction for `pegs` pegs: peg count, goal peg
+    (the last one) and a worked 3-disk example solved with Frame-Stewart.
+    """
+    if pegs == MIN_PEGS:
+        return instruction
+    example = solve(3, pegs)
+    initial = [[3, 2, 1]] + [[] for _ in range(pegs - 1)]
+    replacements = [
+        (r"There are three pegs", f"There are {pegs} pegs"),
+        (r"to the third peg\.", f"to the last peg (peg {pegs - 1})."),
+        (r"the initial state is \[\[3, 2, 1\], \[\], \[\]\], and a solution might be: moves = \[\[.*?\]\]",
+         f"the initial state is {initial}, and a solution might be: moves = {example}"),
+        (r"Move disk 1 from peg 0 to peg 2, then move disk 2 from peg 0 to peg 1",
+         f"Move disk {example[0][0]} from peg {example[0][1]} to peg {example[0][2]}, "
+         f"then move disk {example[1][0]} from peg {example[1][1]} to peg {example[1][2]}"),
+    ]
+    for pattern, replacement in replacements:
+        instruction, count = re.subn(pattern, lambda _: replacement, instruction)
+        if count != 1:
+            raise ValueError(f"❌ La instrucción de sistema no tiene el texto esperado para adaptarla a {pegs} varillas: {pattern}")
+    return instruction
+
+
+if __name__ == "__main__":
+    # Comprobación: FS frente a BFS en instancias pequeñas y tiempos para N hasta 30
+    import time
+    from collections import deque
+    from HanoiState import HanoiState
+
+    for pegs, max_n in ((3, 6), (4, 6), (5, 5)):
+        for n in range(1, max_n + 1):
+            start, goal = HanoiState.initial(n, pegs=pegs), HanoiState.goal(n, pegs=pegs)
+            depth, queue = {start: 0}, deque([start])
+            while goal not in depth:
+                state = queue.popleft()
+                for f in range(pegs):
+                    disk = state.top(f)
+                    for t in range(pegs):
+                        if disk is None or t == f or (state.top(t) is not None and state.top(t) < disk):
+                            continue
+                        nxt = state.apply([disk, f, t])
+                        if nxt not in depth:
+                            depth[nxt] = depth[state] + 1
+                            queue.append(nxt)
+            moves = solve(n, pegs)
+            assert len(moves) == min_moves(n, pegs) == depth[goal], (n, pegs)
+            assert start.play(moves) == goal
+
+    t0 = time.perf_counter()
+    table = distance_table(30, max_pegs=5)
+    references = {pegs: solve(30, pegs) for pegs in (4, 5)}
+    seconds = time.perf_counter() - t0
+    for pegs, moves in references.items():
+        assert HanoiState.initial(30, pegs=pegs).play(moves) == HanoiState.goal(30, pegs=pegs)
+    print("✅ Frame-Stewart = BFS en todas las instancias pequeñas (3, 4 y 5 varillas)")
+    for pegs, row in table.items():
+        print(f"{pegs} varillas | N=10: {row[10]:>10} | N=20: {row[20]:>10} | N=30: {row[30]:>10}")
+    print(f"⏱️  Tablas N<=30 y soluciones de referencia N=30 (4 y 5 varillas) en {seconds:.3f} s")
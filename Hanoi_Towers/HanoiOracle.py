@@ -0,0 +1,221 @@
+"""
+Closed-form optimal Tower of Hanoi oracle.
+
+'ok' / 'fail' and the token counts do not say whether a run that failed at iteration 5 had been
+making optimal progress. This module answers that without any search, using the binary structure
+of the optimal solution:
+
+    optimal_move(n, i)               i-th move (0-based) of the optimal 2^n - 1 move solution:
+                                     disk = 1 + trailing zeros of i+1, pegs from the bits of i+1
+    distance_to_goal(state)          optimal number of moves from any legal state to the goal tower,
+                                     O(N): disks from largest to smallest, each misplaced disk d adds 2^(d-1)
+    next_optimal_move(state)         the move that starts the (unique) shortest path to the goal, O(N)
+    first_divergence(state, moves)   index of the first move that leaves the optimal path (None if none)
+
+`score_moves` gathers the distance before / after a batch of moves and the divergence index, and
+`save_optimality` appends one row per stepwise iteration to results/hanoi_optimality.csv (linked to
+hanoi_token_usage.csv by the experiment name). The closed forms only hold for 3 pegs; the k-peg
+variants use FrameStewart instead.
+
+Example:
+    score = score_moves([[3, 2, 1], [], []], [[1, 0, 2], [2, 0, 1], [1, 0, 1]])
+    # {'moves': 3, 'distance_before': 7, 'distance_after': 5, 'first_divergence': 2}
+"""
+import csv
+import os
+
+from HanoiState import HanoiState
+
+NUM_PEGS = 3
+OPTIMALITY_CSV = os.path.join("results", "hanoi_optimality.csv")
+OPTIMALITY_HEADERS = ['Name', 'source', 'N', 'p', 'iteration', 'moves',
+                      'distance_before', 'distance_after', 'first_divergence']
+
+
+#####CLOSED FORM#####
+def optimal_move(n: int, i: int, source: int = 0, target: int = 2) -> list:
+    """
+    Move i (0-based) of the optimal solution moving n disks from `source` to `target`.
+    """
+    if not 0 <= i < (1 << n) - 1:
+        raise ValueError(f"❌ El índice {i} no está en la solución óptima de {n} discos (0..{(1 << n) - 2}).")
+    m = i + 1
+    disk = (m & -m).bit_length()
+    # Solución canónica con varillas cíclicas 0 -> 1 -> 2: la torre acaba en 2 si n es impar y en 1 si es par
+    canonical_from = (m & (m - 1)) % NUM_PEGS
+    canonical_to = ((m | (m - 1)) + 1) % NUM_PEGS
+    spare = NUM_PEGS - source - target
+    labels = (source, spare, target) if n % 2 else (source, target, spare)
+    return [disk, labels[canonical_from], labels[canonical_to]]
+
+
+def _three_pegs(state) -> HanoiState:
+    state = HanoiState.from_lists(state)
+    if state.pegs != NUM_PEGS:
+        raise ValueError(f"❌ El oráculo cerrado es solo para {NUM_PEGS} varillas (estado con {state.pegs}); "
+                         f"para más varillas usa FrameStewart.")
+    return state
+
+
+def _positions(state: HanoiState) -> list:
+    """Peg of every disk (index 0 unused)."""
+    positions = [None] * (state.n + 1)
+    for peg, mask in enumerate(state.masks):
+        while mask:
+            low = mask & -mask
+            positions[low.bit_length() - 1] = peg
+            mask ^= low
+    return positions
+
+
+def distance_to_goal(state, goal_peg: int = 2) -> int:
+    """
+    Optimal number of moves from a legal state to the tower of all disks on `goal_peg`.
+    """
+    state = _three_pegs(state)
+    positions = _positions(state)
+    target, distance = goal_peg, 0
+    for disk in range(state.n, 0, -1):
+        if positions[disk] != target:
+            # El disco debe llegar a target: los menores pasan antes por la tercera varilla
+            distance += 1 << (disk - 1)
+            target = NUM_PEGS - positions[disk] - target
+    return distance
+
+
+def next_optimal_move(state, goal_peg: int = 2):
+    """
+    First move of the shortest path from `state` to the goal tower (None if already there).
+    The smallest misplaced disk in the largest-to-smallest scan is the one to move.
+    """
+    state = _three_pegs(state)
+    positions = _positions(state)
+    target, move = goal_peg, None
+    for disk in range(state.n, 0, -1):
+        if positions[disk] != target:
+            move = [disk, positions[disk], target]
+            target = NUM_PEGS - positions[disk] - target
+    return move
+
+
+#####SCORING#####
+def first_divergence(initial_state, moves, goal_peg: int = 2):
+    """
+    Index of the first move that is not on an optimal path to the goal (an illegal move also
+    diverges), or None if every move is optimal.
+    """
+    state = _three_pegs(initial_state)
+    source = _perfect_tower_peg(state)
+    if source is not None and source != goal_peg:
+        # Desde una torre completa la solución óptima es la de forma cerrada: O(1) por movimiento
+        length = (1 << state.n) - 1
+        for i, move in enumerate(moves):
+            if i >= length or list(move) != optimal_move(state.n, i, source, goal_peg):
+                return i
+        return None
+
+    for i, move in enumerate(moves):
+        if list(move) != next_optimal_move(state, goal_peg):
+            return i
+        state = state.apply(move)
+    return None
+
+
+def _perfect_tower_peg(state: HanoiState):
+    full = ((1 << state.n) - 1) << 1
+    for peg, mask in enumerate(state.masks):
+        if mask == full:
+            return peg
+    return None
+
+
+def score_moves(initial_state, moves, goal_peg: int = 2) -> dict:
+    """
+    Distance to the goal before and after a batch of moves (after the last legal one if the
+    batch contains an illegal move) and the first divergence from the optimal path.
+    """
+    state = _three_pegs(initial_state)
+    after = state
+    for move in moves:
+        try:
+            after = after.apply(move)
+        except (ValueError, TypeError, IndexError):
+            break
+    return {
+        "moves": len(moves),
+        "distance_before": distance_to_goal(state, goal_peg),
+        "distance_after": distance_to_goal(after, goal_peg),
+        "first_divergence": first_divergence(state, moves, goal_peg),
+    }
+
+
+def save_optimality(name: str, source: str, N: int, p, scores: list, csv_path: str = OPTIMALITY_CSV):
+    """
+    Appends one row per iteration score to the optimality CSV.
+    """
+    if not scores:
+        return
+    os.makedirs(os.path.dirname(csv_path) or ".", exist_ok=True)
+    file_exists = os.path.exists(csv_path)
+    with open(csv_path, mode='a', newline='') as file:
+        writer = csv.writer(file)
+        if not file_exists:
+            writer.writerow(OPTIMALITY_HEADERS)
+        for iteration, score in enumerate(scores, 1):
+            divergence = score["first_divergence"]
+            writer.writerow([name, source, N, p, iteration, score["moves"], score["distance_before"],
+                             score["distance_after"], '' if divergence is None else divergence])
+
+
+if __name__ == "__main__":
+    # Comprobación frente a la solución recursiva y frente a BFS en estados aleatorios
+    import random
+    from collections import deque
+
+    def hanoi(n, source=0, target=2, spare=1):
+        if n:
+            yield from hanoi(n - 1, source, spare, target)
+            yield [n, source, target]
+            yield from hanoi(n - 1, spare, target, source)
+
+    for n in range(1, 11):
+        for source, target in ((0, 2), (0, 1), (2, 0), (1, 2)):
+            assert all(optimal_move(n, i, source, target) == move
+                       for i, move in enumerate(hanoi(n, source, target, NUM_PEGS - source - target)))
+
+    n = 6
+    goal = HanoiState.goal(n)
+    depth = {goal: 0}
+    queue = deque([goal])
+    while queue:
+        state = queue.popleft()
+        for f in range(NUM_PEGS):
+            for t in range(NUM_PEGS):
+                try:
+                    nxt = state.apply([state.top(f), f, t]) if f != t and state.top(f) else None
+                except ValueError:
+                    nxt = None
+                if nxt is not None and nxt not in depth:
+                    depth[nxt] = depth[state] + 1
+                    queue.append(nxt)
+    assert len(depth) == NUM_PEGS ** n
+    for state, d in depth.items():
+        assert distance_to_goal(state) == d
+        if d:
+            assert depth[state.apply(next_optimal_move(state))] == d - 1
+
+    rng = random.Random(0)
+    states = list(depth)
+    for _ in range(200):
+        start = rng.choice(states)
+        path, state = [], start
+        while state != goal:
+            move = next_optimal_move(state)
+            path.append(move)
+            state = state.apply(move)
+        assert first_divergence(start, path) is None and len(path) == depth[start]
+        if path:
+            cut = rng.randrange(len(path))
+            wrong = [path[cut][0], path[cut][1], NUM_PEGS - path[cut][1] - path[cut][2]]
+            assert first_divergence(start, path[:cut] + [wrong]) == cut
+    print(f"✅ Oráculo verificado: forma cerrada N<=10 y distancias de los {len(depth)} estados con N={n}")
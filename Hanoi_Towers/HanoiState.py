@@ -0,0 +1,200 @@
+"""
+Compact Tower of Hanoi state: one bitmask per peg and an incremental 64-bit Zobrist hash.
+
+The scripts used to pass the state around as `[[N, ..., 1], [], []]`, copying every peg on each
+simulate_moves / apply_move call and comparing whole nested lists for the goal check. Here peg p
+is an int whose bit d is set when disk d is on it, so:
+
+    top(peg)       lowest set bit of the mask (the smallest disk is always the top one)
+    apply(move)    clears bit d in the source mask and sets it in the destination one
+    hash           XOR of one random 64-bit key per (disk, peg), updated with two XORs per move
+
+States are immutable (apply returns a new one), compare by their masks and can be used as dict
+keys, e.g. to detect a stepwise run coming back to a configuration it already asked about.
+Iterating a state yields the pegs as lists (bottom to top) and repr() prints the usual
+[[3, 2, 1], [], []] text, so prompts and CSVs are unchanged. The number of pegs is the number of
+masks (3 by default, up to MAX_PEGS for the multi-peg variants).
+
+Example:
+    state = HanoiState.initial(4)
+    state = state.apply([1, 0, 2])
+    print(state.top(2), state == HanoiState.goal(4), state)   # 1 False [[4, 3, 2], [], [1]]
+"""
+import random
+
+NUM_PEGS = 3
+MAX_PEGS = 8
+ZOBRIST_SEED = 0x5EED
+
+# Claves Zobrist por (disco, varilla); se generan siempre en el mismo orden, así el hash de un
+# estado es el mismo en todos los procesos aunque la tabla crezca a trozos
+_ZOBRIST = [[0] * MAX_PEGS]
+_RNG = random.Random(ZOBRIST_SEED)
+
+
+def _zobrist_keys(n: int) -> list:
+    while len(_ZOBRIST) <= n:
+        _ZOBRIST.append([_RNG.getrandbits(64) for _ in range(MAX_PEGS)])
+    return _ZOBRIST
+
+
+class HanoiState:
+    __slots__ = ("masks", "n", "hash")
+
+    def __init__(self, masks: tuple, n: int, hash_value: int = None):
+        self.masks = masks
+        self.n = n
+        if hash_value is None:
+            keys = _zobrist_keys(n)
+            hash_value = 0
+            for peg, mask in enumerate(masks):
+                while mask:
+                    low = mask & -mask
+                    hash_value ^= keys[low.bit_length() - 1][peg]
+                    mask ^= low
+        self.hash = hash_value
+
+    #####CONSTRUCTORS#####
+    @classmethod
+    def from_lists(cls, pegs) -> "HanoiState":
+        """
+        [[3, 2, 1], [], []] -> HanoiState. Raises ValueError on repeated disks, disks outside
+        1..N or a larger disk above a smaller one.
+        """
+        if isinstance(pegs, HanoiState):
+            return pegs
+        if not NUM_PEGS <= len(pegs) <= MAX_PEGS:
+            raise ValueError(f"❌ Se esperaban entre {NUM_PEGS} y {MAX_PEGS} varillas, no {len(pegs)}: {pegs}")
+        n = sum(len(peg) for peg in pegs)
+        masks, seen = [], 0
+        for peg in pegs:
+            mask = 0
+            for j, disk in enumerate(peg):
+                if not isinstance(disk, int) or not 1 <= disk <= n or seen >> disk & 1:
+                    raise ValueError(f"❌ Estado inválido: disco {disk} repetido o fuera de 1..{n}: {pegs}")
+                if j and peg[j - 1] < disk:
+                    raise ValueError(f"❌ Estado inválido: disco {disk} sobre el disco menor {peg[j - 1]}: {pegs}")
+                seen |= 1 << disk
+                mask |= 1 << disk
+            masks.append(mask)
+        return cls(tuple(masks), n)
+
+    @classmethod
+    def initial(cls, n: int, peg: int = 0, pegs: int = NUM_PEGS) -> "HanoiState":
+        return cls.tower(n, peg, pegs)
+
+    @classmethod
+    def goal(cls, n: int, peg: int = None, pegs: int = NUM_PEGS) -> "HanoiState":
+        """All the disks on `peg` (default: the last one)."""
+        return cls.tower(n, pegs - 1 if peg is None else peg, pegs)
+
+    @classmethod
+    def tower(cls, n: int, peg: int, pegs: int = NUM_PEGS) -> "HanoiState":
+        if not NUM_PEGS <= pegs <= MAX_PEGS:
+            raise ValueError(f"❌ Se esperaban entre {NUM_PEGS} y {MAX_PEGS} varillas, no {pegs}.")
+        masks = [0] * pegs
+        masks[peg] = ((1 << n) - 1) << 1
+        return cls(tuple(masks), n)
+
+    #####QUERIES#####
+    @property
+    def pegs(self) -> int:
+        return len(self.masks)
+
+    def top(self, peg: int):
+        """Smallest disk on `peg`, or None if it is empty."""
+        mask = self.masks[peg]
+        return (mask & -mask).bit_length() - 1 if mask else None
+
+    def peg_of(self, disk: int):
+        for peg, mask in enumerate(self.masks):
+            if mask >> disk & 1:
+                return peg
+        return None
+
+    def to_lists(self) -> list:
+        return [self[peg] for peg in range(len(self.masks))]
+
+    def __getitem__(self, peg: int) -> list:
+        mask = self.masks[peg]
+        return [d for d in range(self.n, 0, -1) if mask >> d & 1]
+
+    def __iter__(self):
+        return (self[peg] for peg in range(len(self.masks)))
+
+    def __len__(self):
+        return len(self.masks)
+
+    def __eq__(self, other):
+        if isinstance(other, HanoiState):
+            return self.hash == other.hash and self.masks == other.masks
+        if isinstance(other, (list, tuple)):
+            return self.to_lists() == [list(peg) for peg in other]
+        return NotImplemented
+
+    def __hash__(self):
+        return self.hash
+
+    def __repr__(self):
+        return repr(self.to_lists())
+
+    #####MOVES#####
+    def apply(self, move, step: int = None) -> "HanoiState":
+        """
+        New state after move [disk, from_peg, to_peg]. Raises ValueError with the wording of
+        HanoiVisualizer.apply_move (or simulate_moves, with "at step i", when `step` is given).
+        """
+        if len(move) != 3:
+            raise ValueError(f"Invalid move format: {move}")
+        masks = list(self.masks)
+        _apply_moves(masks, self.n, (move,), step)
+        disk, from_peg, to_peg = move
+        keys = _ZOBRIST[disk]
+        return HanoiState(tuple(masks), self.n, self.hash ^ keys[from_peg] ^ keys[to_peg])
+
+    def play(self, moves) -> "HanoiState":
+        """
+        State after a whole move sequence (simulate_moves); stops with ValueError at the first
+        illegal move. The masks are updated in place and the hash is computed once at the end.
+        """
+        masks = list(self.masks)
+        _apply_moves(masks, self.n, moves, 1)
+        return HanoiState(tuple(masks), self.n)
+
+
+def _apply_moves(masks: list, n: int, moves, first_step):
+    """
+    Applies the moves to the peg masks in place. Steps are numbered from `first_step` in the
+    error messages (None: no step, as in apply_move).
+    """
+    get_bit = _disk_bits(n).get
+    num_pegs = len(masks)
+    for step, (disk, from_peg, to_peg) in enumerate(moves, first_step or 0):
+        if not (0 <= from_peg < num_pegs and 0 <= to_peg < num_pegs):
+            move = [disk, from_peg, to_peg]
+            raise ValueError(f"Invalid peg index in move {step}: {move}" if first_step is not None
+                             else f"Invalid peg index in move: {move}")
+        source = masks[from_peg]
+        bit = get_bit(disk)
+        # El disco movido debe ser el bit más bajo de su varilla
+        if bit is None or source & -source != bit:
+            raise ValueError(_where("disk {} is not on top of peg {}", step, first_step).format(disk, from_peg))
+        target = masks[to_peg]
+        if target and target & -target < bit:
+            raise ValueError(_where("cannot place disk {} on smaller disk {}", step, first_step)
+                             .format(disk, (target & -target).bit_length() - 1))
+        masks[from_peg] = source ^ bit
+        masks[to_peg] |= bit
+
+_DISK_BITS = {}
+
+
+def _disk_bits(n: int) -> dict:
+    bits = _DISK_BITS.get(n)
+    if bits is None:
+        bits = _DISK_BITS[n] = {disk: 1 << disk for disk in range(1, n + 1)}
+    return bits
+
+
+def _where(message: str, step: int, first_step) -> str:
+    return f"Invalid move at step {step}: {message}" if first_step is not None else f"Invalid move: {message}"
@@ -7,9 +7,16 @@ import re
 import ast
 import csv
 from datetime import datetime
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Harness"))
+from rateLimiter import get_limiter
+from clientPool import get_genai_client, timed
+from moveParser import MoveArray, parse_int_moves
+from vectorValidator import validate_moves_array
+from HanoiOracle import save_optimality, score_moves
 
 # Configura la API
-client = genai.Client(api_key=os.getenv("GEMINI_API_KEY_HANOI")) # Asegúrate de que la variable de entorno esté configurada
+client = get_genai_client("GEMINI_API_KEY_HANOI") # Asegúrate de que la variable de entorno esté configurada
 
 # Parámetro configurable: Número de discos
 N = 10 # Cambia este valor para probar con diferentes N (ej. 3, 5, etc.)
@@ -19,37 +26,21 @@ N = 10 # Cambia este valor para probar con diferentes N (ej. 3, 5, etc.)
 It uses regular expressions to find the first occurrence of a list formatted as [[...]] and converts it to a Python list.
 """
 
-def extract_moves_vector(response_text: str) -> list[list[int]]:
+def extract_moves_vector(response_text: str) -> MoveArray:
     """
     Extrae el bloque de movimientos tipo [[1, 0, 2], ...] desde una salida ruidosa del LLM.
-    Solo mantiene dígitos, comas y corchetes dentro del primer [ y el último ].
+    Analiza en una sola pasada las listas internas entre el primer [ y el último ]
+    (moveParser.parse_int_moves), ignorando el ruido dentro de cada movimiento.
 
     Args:
         response_text (str): Texto completo devuelto por el modelo.
 
     Returns:
-        list[list[int]]: Lista limpia de movimientos como objetos Python.
+        MoveArray: Movimientos en un array compacto de enteros, usable como lista de listas.
     """
-    start = response_text.find('[')
-    end = response_text.rfind(']')
+    return parse_int_moves(response_text)
 
-    if start == -1 or end == -1 or end <= start:
-        raise ValueError("❌ No se encontró un bloque válido delimitado por [ y ].")
-
-    raw_block = response_text[start:end+1]
-    cleaned_block = re.sub(r"[^\d\[\],]", "", raw_block)
-
-    try:
-        moves = ast.literal_eval(cleaned_block)
-    except Exception as e:
-        raise ValueError(f"❌ Error al convertir el bloque limpio a lista: {e}")
-    
-    if not (isinstance(moves, list) and all(isinstance(m, list) and len(m) == 3 and all(isinstance(x, int) for x in m) for m in moves)):
-        raise ValueError("❌ El contenido extraído no es una lista válida de movimientos (listas de enteros).")
-
-    return moves
-
-response = client.models.generate_content(
+response = get_limiter("gemini").call(timed("gemini", client.models.generate_content),
     model="gemini-2.5-pro-preview-06-05", # O "gemini-2.5-flash-preview-06-05" para el modelo Flash
     config=types.GenerateContentConfig(
         system_instruction=f"""
@@ -113,13 +104,18 @@ for part in response.candidates[0].content.parts:
 k_init = [list(range(N, 0, -1)), [], []]
 goal_config = [[], [], list(range(N, 0, -1))]
 success = False
+optimality = []
 
 try:
     moves = extract_moves_vector(final_answer)
+    # Distancia óptima al objetivo tras la respuesta y primer movimiento fuera del camino óptimo
+    optimality.append(score_moves(k_init, moves))
     print("Movimientos extraídos:", moves)
     
-    # Simular movimientos usando la misma lógica que HanoiTowersSolverSteps.py
-    final_config = HanoiVisualizer.simulate_moves(k_init, moves)
+    # Validar toda la secuencia de una vez (mismas reglas y mensajes que HanoiVisualizer.simulate_moves)
+    first_invalid, reason, final_config = validate_moves_array(k_init, moves)
+    if first_invalid is not None:
+        raise ValueError(reason)
     print("Configuración final simulada:", final_config)
     
     # Verificar si se alcanzó el objetivo (igual que en HanoiTowersSolverSteps.py)
@@ -156,6 +152,7 @@ with open(csv_path, mode='a', newline='') as file:
     if not file_exists:
         writer.writerow(headers)
     writer.writerow(row)
+save_optimality(experiment_name, "baseline", N, '', optimality)
 
 print(f"\n📄 Resultados guardados en: {csv_path}")
 print(f"Resumen: {experiment_name} - Tokens totales: {total_tokens} - Resultado: {results_value}")
\ No newline at end of file
@@ -3,15 +3,20 @@ import google.generativeai as genai, types
 import time
 import re, json
 from HanoiTowersViewers import HanoiVisualizer
-from HanoiTowersViewers import HanoiVisualizer
+from HanoiState import HanoiState
 import ast
 from datetime import datetime
 import csv
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Harness"))
+from rateLimiter import get_limiter
+from clientPool import generativeai_options, get_genai_client, timed
+from moveParser import MoveArray, parse_int_moves
 
 
 
 # Configura la API con tu clave
-genai.configure(api_key=os.getenv("GEMINI_API_KEY_RIVER"))
+genai.configure(api_key=os.getenv("GEMINI_API_KEY_RIVER"), **generativeai_options())
 
 # Inicializa los modelos generativos con instrucciones de sistema
 model_a = genai.GenerativeModel(
@@ -118,11 +123,11 @@ The response includes the thought process and the final answer, which is a list
 """
 
 def ask_hanoi_agent(contents: str) -> str:
-    # Configura el cliente
-    client = genai.Client(api_key=os.getenv("GEMINI_API_KEY_HANOI"))
+    # Cliente compartido del pool (no se reconstruye en cada iteración)
+    client = get_genai_client("GEMINI_API_KEY_HANOI")
 
     # Solicita respuesta del modelo
-    response = client.models.generate_content(
+    response = get_limiter("gemini").call(timed("gemini", client.models.generate_content),
         model="gemini-2.5-pro-preview-06-05",
         config=types.GenerateContentConfig(
             system_instruction="""
@@ -175,43 +180,28 @@ def ask_hanoi_agent(contents: str) -> str:
 It uses regular expressions to find the first occurrence of a list formatted as [[...]] and converts it to a Python list.
 """
 
-def extract_moves_vector(response_text: str) -> list[list[int]]:
+def extract_moves_vector(response_text: str) -> MoveArray:
     """
     Extrae el bloque de movimientos tipo [[1, 0, 2], ...] desde una salida ruidosa del LLM.
-    Solo mantiene dígitos, comas y corchetes dentro del primer [ y el último ].
+    Analiza en una sola pasada las listas internas entre el primer [ y el último ]
+    (moveParser.parse_int_moves), ignorando el ruido dentro de cada movimiento.
 
     Args:
         response_text (str): Texto completo devuelto por el modelo.
 
     Returns:
-        list[list[int]]: Lista limpia de movimientos como objetos Python.
+        MoveArray: Movimientos en un array compacto de enteros, usable como lista de listas.
     """
-    start = response_text.find('[')
-    end = response_text.rfind(']')
-
-    if start == -1 or end == -1 or end <= start:
-        raise ValueError("❌ No se encontró un bloque válido delimitado por [ y ].")
-
-    raw_block = response_text[start:end+1]
-    cleaned_block = re.sub(r"[^\d\[\],]", "", raw_block)
-
-    try:
-        moves = ast.literal_eval(cleaned_block)
-    except Exception as e:
-        raise ValueError(f"❌ Error al convertir el bloque limpio a lista: {e}")
-    
-    if not (isinstance(moves, list) and all(isinstance(m, list) and len(m) == 3 and all(isinstance(x, int) for x in m) for m in moves)):
-        raise ValueError("❌ El contenido extraído no es una lista válida de movimientos (listas de enteros).")
-
-    return moves
+    return parse_int_moves(response_text)
 
 ########################################### Example usage ###################################################
 def run_hanoi_experiment(N=4, p=10):
     # Parámetros iniciales
     # N = 4
     # p = 10
-    k_actual = [list(range(N, 0, -1)), [], []]
-    k_objetivo = [[], [], list(range(N, 0, -1))]
+    k_actual = HanoiState.initial(N)
+    k_objetivo = HanoiState.goal(N)
+    visited = {k_actual: 0}   # configuración -> turno en que se alcanzó
     total_moves = []
     turn = 0  # 0: chat_a, 1: chat_b
 
@@ -222,7 +212,7 @@ def run_hanoi_experiment(N=4, p=10):
 
     # ─── 3. Primer mensaje SOLO al agente A (no hay colega previo) ───
     prompt_inicial = build_hanoi_prompt(N, k_actual, p)   # tu helper
-    chat_a.send_message(prompt_inicial)
+    get_limiter("gemini").call(timed("gemini", chat_a.send_message), prompt_inicial)
 
     prompt_tokens = []
     output_tokens = []
@@ -252,7 +242,7 @@ def run_hanoi_experiment(N=4, p=10):
 
         # 4.2 Enviar y mostrar respuesta
         try:
-            response = current_chat.send_message(prompt)
+            response = get_limiter("gemini").call(timed("gemini", current_chat.send_message), prompt)
             print(f"\n🧠 Respuesta del modelo {agent_label}:\n{response.text}\n")
 
             # Extraer tokens
@@ -289,6 +279,10 @@ def run_hanoi_experiment(N=4, p=10):
             print("🎯 ¡Objetivo alcanzado!")
             break
 
+        if k_actual in visited:
+            print(f"🔁 Configuración repetida: ya se alcanzó en el turno {visited[k_actual]}")
+        visited.setdefault(k_actual, len(prompt_tokens))
+
         # 4.5 Cambiar de turno
         turn = 1 - turn
 
@@ -331,29 +325,14 @@ def run_hanoi_experiment(N=4, p=10):
         writer.writerow(row)
 
     print(f"\n📄 Resultados guardados en: {csv_path}")
+    return {"name": experiment_name, "results": results_value, "moves": len(total_moves), "tokens_total": total_sum}
 
 
-# print("🚀 Iniciando experimento de la Torre de Hanoi con N=5 p=30...")
-# for i in range(10):
-#     print(f"\n🚀 Lanzando experimento {i+1}/10")
-#     run_hanoi_experiment(N=5, p=30)
-
-# print("🚀 Iniciando experimento de la Torre de Hanoi con N=7 p=60...")
-# for i in range(5):
-#     print(f"\n🚀 Lanzando experimento {i+1}/10")
-#     run_hanoi_experiment(N=7, p=60)
-
-print("🚀 Iniciando experimento de la Torre de Hanoi con N=8 p=100...")
-for i in range(3):
-    print(f"\n🚀 Lanzando experimento {i+1}/10")
-    run_hanoi_experiment(N=8, p=100)
-
-# print("🚀 Iniciando experimento de la Torre de Hanoi con N=9 p=150...")
-# for i in range(5):
-#     print(f"\n🚀 Lanzando experimento {i+1}/10")
-#     run_hanoi_experiment(N=9, p=150)
-
-# print("🚀 Iniciando experimento de la Torre de Hanoi con N=10 p=200...")
-# for i in range(5):
-#     print(f"\n🚀 Lanzando experimento {i+1}/10")
-#     run_hanoi_experiment(N=10, p=200)
\ No newline at end of file
+# Los barridos completos (N=5 p=30, N=7 p=60, N=8 p=100, N=9 p=150, N=10 p=200) se
+# describen en Harness/sweeps/hanoi_conver.json y se lanzan con Harness/sweepEngine.py,
+# que guarda un manifiesto y al reanudar solo ejecuta las pruebas que faltan.
+if __name__ == "__main__":
+    print("🚀 Iniciando experimento de la Torre de Hanoi con N=8 p=100...")
+    for i in range(3):
+        print(f"\n🚀 Lanzando experimento {i+1}/3")
+        run_hanoi_experiment(N=8, p=100)
@@ -3,11 +3,27 @@ from google.genai import types
 import os
 import json # Sigue siendo útil para inspeccionar la respuesta completa si es necesario
 from HanoiTowersViewers import HanoiVisualizer
+from HanoiState import HanoiState
+from HanoiOracle import save_optimality, score_moves
+from FrameStewart import multipeg_instruction
 import re
 import ast
+import csv
+import threading
+from datetime import datetime
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Harness"))
+from rateLimiter import get_limiter
+from clientPool import get_genai_client, timed
+from checkpoint import Checkpoint
+from moveParser import MoveArray, parse_int_moves, StreamingMoveValidator
+from streaming import add_stream_columns, stream_gemini
 
 # Configura la API
-client = genai.Client(api_key=os.getenv("GEMINI_API_KEY_HANOI")) # Asegúrate de que la variable de entorno esté configurada
+client = get_genai_client("GEMINI_API_KEY_HANOI") # Asegúrate de que la variable de entorno esté configurada
+
+# Modelo por defecto (se puede sobrescribir por experimento)
+MODEL_NAME = "gemini-2.5-pro-preview-06-05"
 
 #####FUNCTION FOR BUILDING THE PROMPT#####
 """
@@ -27,13 +43,16 @@ def build_hanoi_prompt(N: int, k: list[list[int]], p: int) -> str:
 
     peg_descriptions = "\n".join(format_peg(i, peg) for i, peg in enumerate(k))
     goal_list = list(range(N, 0, -1))
-    goal_str = f"    • Peg 0: (empty)\n    • Peg 1: (empty)\n    • Peg 2: $" + f"{goal_list[0]}$ (bottom), ..." + f" {goal_list[-1]} (top)"
+    # Objetivo: todos los discos en la última varilla (k puede tener más de 3 varillas)
+    goal_peg = len(k) - 1
+    goal_str = "".join(f"    • Peg {i}: (empty)\n" for i in range(goal_peg)) + \
+               f"    • Peg {goal_peg}: $" + f"{goal_list[0]}$ (bottom), ..." + f" {goal_list[-1]} (top)"
 
     prompt = f"""
     I have a puzzle with ${N}$ disks of different sizes with configuration k={k} and I want to make ${p}$ moves to bring us closer to the solution:
 {peg_descriptions}
 
-    Goal configuration k=[[],[],{goal_list}]:
+    Goal configuration k=[{'[],' * goal_peg}{goal_list}]:
 {goal_str}
 
     Rules:
@@ -51,15 +70,7 @@ It sends a prompt with the current configuration and the number of moves to make
 The response includes the thought process and the final answer, which is a list of moves to be made.
 """
 
-def ask_hanoi_agent(contents: str) -> str:
-    # Configura el cliente
-    client = genai.Client(api_key=os.getenv("GEMINI_API_KEY_HANOI"))
-
-    # Solicita respuesta del modelo
-    response = client.models.generate_content(
-        model="gemini-2.5-pro-preview-06-05",
-        config=types.GenerateContentConfig(
-            system_instruction="""
+SYSTEM_INSTRUCTION = """
         You are a helpful assistant. Solve this puzzle for me.
         There are three pegs and n disks of different sizes stacked on the first peg. The disks are numbered from 1 (smallest) to n (largest). Disk moves in this puzzle should follow:
         1. Only one disk can be moved at a time.
@@ -81,9 +92,28 @@ def ask_hanoi_agent(contents: str) -> str:
         • The desired number of moves p. This parameter indicates how many moves I want you to make to bring us closer to the solution. This is because when the number of disks N is very large, solving the entire problem becomes very complex. Therefore, I don't want you to provide the complete solution, but rather the next p moves that move us toward the goal.
 
         Your response should be just a vector of moves, without any additional text or explanations.
-        """,
+        """
+
+GENERATION_CONFIG = types.GenerateContentConfig(
+    system_instruction=SYSTEM_INSTRUCTION,
+    thinking_config=types.ThinkingConfig(include_thoughts=True)
+)
+_GENERATION_CONFIGS = {3: GENERATION_CONFIG}
+
+def generation_config(pegs: int = 3):
+    # Variantes con 4 o más varillas: misma instrucción adaptada (número de varillas, objetivo y ejemplo)
+    if pegs not in _GENERATION_CONFIGS:
+        _GENERATION_CONFIGS[pegs] = types.GenerateContentConfig(
+            system_instruction=multipeg_instruction(SYSTEM_INSTRUCTION, pegs),
             thinking_config=types.ThinkingConfig(include_thoughts=True)
-        ),
+        )
+    return _GENERATION_CONFIGS[pegs]
+
+def ask_hanoi_agent(contents: str, model: str = MODEL_NAME, pegs: int = 3) -> str:
+    # Solicita respuesta del modelo
+    response = get_limiter("gemini").call(timed("gemini", client.models.generate_content),
+        model=model,
+        config=generation_config(pegs),
         contents=contents
     )
 
@@ -103,147 +133,232 @@ def ask_hanoi_agent(contents: str) -> str:
 
     return final_answer, response.usage_metadata
 
+"""
+Streaming variant: thoughts and answer are printed as they arrive and the latency metrics
+(time to first token, time to first answer token, decode rate) are returned as a third value.
+`on_chunk` can abort the generation (e.g. a StreamingMoveValidator at the first illegal move).
+"""
+
+def ask_hanoi_agent_stream(contents: str, model: str = MODEL_NAME, on_chunk=None, pegs: int = 3):
+    result = stream_gemini(client, model, generation_config(pegs), contents, on_chunk=on_chunk)
+    usage = result.usage or types.GenerateContentResponseUsageMetadata()
+    return result.answer, usage, result.metrics()
+
 #####FUNCTION FOR EXTRACTING MOVES VECTOR#####
 """This function extracts the moves vector from the response text of the LLM.
 It uses regular expressions to find the first occurrence of a list formatted as [[...]] and converts it to a Python list.
 """
 
-def extract_moves_vector(response_text: str) -> list[list[int]]:
+def extract_moves_vector(response_text: str) -> MoveArray:
     """
-    Extrae el bloque de movimientos tipo [[1, 2, 3], ...] desde una salida ruidosa del LLM.
-    Solo mantiene números, comas y corchetes dentro del primer [ y el último ].
-    
+    Extrae el bloque de movimientos tipo [[1, 0, 2], ...] desde una salida ruidosa del LLM.
+    Analiza en una sola pasada las listas internas entre el primer [ y el último ]
+    (moveParser.parse_int_moves), ignorando el ruido dentro de cada movimiento.
+
     Args:
         response_text (str): Texto completo devuelto por el modelo.
 
     Returns:
-        list[list[int]]: Lista limpia de movimientos como objetos Python.
+        MoveArray: Movimientos en un array compacto de enteros, usable como lista de listas.
     """
-    start = response_text.find('[')
-    end = response_text.rfind(']')
-
-    if start == -1 or end == -1 or end <= start:
-        raise ValueError("❌ No se encontró un bloque válido delimitado por [ y ].")
-
-    # Extraer contenido bruto
-    raw_block = response_text[start:end+1]
-
-    # Limpiar: solo permitir dígitos, comas, corchetes y espacios mínimos
-    cleaned_block = re.sub(r"[^\d\[\],]", "", raw_block)
-
-    try:
-        moves = ast.literal_eval(cleaned_block)
-    except Exception as e:
-        raise ValueError(f"❌ Error al convertir el bloque limpio a lista: {e}")
-    
-    # Validar estructura
-    if not (isinstance(moves, list) and all(isinstance(m, list) and len(m) == 3 for m in moves)):
-        raise ValueError("❌ El contenido extraído no es una lista válida de movimientos.")
-
-    return moves
-
-
-######TESTING THE FUNCTION######
-N = 4 # Number of disks
-p = 10 # Number of moves to make in each iteration
-
-k_init = [list(range(N, 0, -1)), [], []]
-goal_config = [[], [], list(range(N, 0, -1))]
-
-k_current = k_init.copy()
-total_moves = []
-iteration = 0
-
-prompt_tokens = []
-output_tokens = []
-total_tokens = []
-success = False
+    return parse_int_moves(response_text)
 
 
-while True:
-    iteration += 1
-    print(f"\n🔄 Iteración {iteration} | Discos = {N} | p = {p}")
-    try:
-        # Construir el prompt
-        prompt = build_hanoi_prompt(N=N, k=k_current, p=p)
-
-        # Preguntar al LLM
-        response_text, usage = ask_hanoi_agent(prompt)
-        prompt_tokens.append(usage.prompt_token_count)
-        output_tokens.append(usage.candidates_token_count)
-        total_tokens.append(usage.total_token_count)
-
-        # Extraer vector de movimientos
-        moves = extract_moves_vector(response_text)
-
-        # Guardar movimientos acumulados
-        total_moves.extend(moves)
-
-        # Aplicar movimientos y obtener nueva configuración
-        new_config = HanoiVisualizer.simulate_moves(k_current, moves)
+######STEPWISE EXPERIMENT######
+"""
+This function runs one complete stepwise experiment: it asks the LLM for p moves at a time,
+applies them to the current configuration and stops when the goal is reached or a move is invalid.
+The token usage of every iteration is appended to results/hanoi_token_usage.csv.
+With stream=True the responses are streamed and every move is validated as it arrives, cancelling
+the generation at the first illegal one. The row, extended with the time to first token, time to
+first answer token and decode rate of every iteration plus the estimated tokens/seconds saved by
+the early abort, goes to results/hanoi_token_usage_stream.csv.
+Every completed iteration is checkpointed in results/checkpoints/; resume="<experiment name>"
+continues an interrupted run from its last good iteration.
+pegs=4 or 5 runs the multi-peg variant (goal: the last peg); those rows are named
+N{N}_p{p}_pegs{pegs}_... and go to results/hanoi_token_usage_pegs.csv.
+An iteration that ends on a configuration already reached is logged and kept in the checkpoint
+('repeats'); the run goes on unless stop_on_repeat=True, which stops it with the result 'loop'.
+"""
 
-        # Verificar si se alcanzó el objetivo
-        if new_config == goal_config:
-            success = True
-            print("🎯 ¡Configuración objetivo alcanzada!")
+# Varias pruebas pueden ejecutarse a la vez en el mismo proceso (asyncRunner)
+_csv_lock = threading.Lock()
+
+def run_steps_experiment(N: int = 4, p: int = 10, model: str = MODEL_NAME, stream: bool = False,
+                         resume: str = None, pegs: int = 3, stop_on_repeat: bool = False) -> dict:
+    # Checkpoint por iteración: nuevo experimento o reanudación de uno interrumpido
+    if resume:
+        checkpoint = Checkpoint.load(resume, "hanoi_steps")
+        N, p, model, stream = (checkpoint.params[key] for key in ("N", "p", "model", "stream"))
+        pegs = checkpoint.params.get("pegs", 3)
+        stop_on_repeat = checkpoint.params.get("stop_on_repeat", False)
+    else:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        pegs_tag = "" if pegs == 3 else f"pegs{pegs}_"
+        checkpoint = Checkpoint.start(f"N{N}_p{p}_{pegs_tag}{timestamp}", "hanoi_steps",
+                                      {"N": N, "p": p, "model": model, "stream": stream, "pegs": pegs,
+                                       "stop_on_repeat": stop_on_repeat})
+
+    k_init = HanoiState.initial(N, pegs=pegs)
+    goal_config = HanoiState.goal(N, pegs=pegs)
+
+    k_current = HanoiState.from_lists(checkpoint.state) if checkpoint.state else k_init
+    total_moves = checkpoint.total_moves
+    iteration = checkpoint.iteration
+    # Configuración al final de cada iteración (la 0 es la inicial; None si el checkpoint es anterior)
+    # y primera iteración en la que se alcanzó cada una. Volver a una se registra en `repeats`; solo
+    # con stop_on_repeat=True corta el experimento, con el resultado 'loop'
+    configs = checkpoint.get("configs") or [None] * iteration + [k_current.to_lists()]
+    visited = {}
+    for i, config in enumerate(configs):
+        if config is not None:
+            visited.setdefault(HanoiState.from_lists(config), i)
+    repeats = checkpoint.get("repeats")
+    looped = False
+
+    prompt_tokens = checkpoint.get("prompt_tokens")
+    output_tokens = checkpoint.get("output_tokens")
+    total_tokens = checkpoint.get("total_tokens")
+    ttft = checkpoint.get("ttft")
+    ttfat = checkpoint.get("ttfat")
+    decode_rate = checkpoint.get("decode_rate")
+    optimality = checkpoint.get("optimality")   # distancia óptima antes/después de cada iteración
+    tokens_saved = 0
+    seconds_saved = 0.0
+    success = False
+
+    while True:
+        iteration += 1
+        print(f"\n🔄 Iteración {iteration} | Discos = {N} | p = {p}")
+        try:
+            # Construir el prompt
+            prompt = build_hanoi_prompt(N=N, k=k_current, p=p)
+
+            # Preguntar al LLM
+            if stream:
+                # Validar cada movimiento según llega y cortar la generación en el primero inválido
+                validator = StreamingMoveValidator(k_current, HanoiVisualizer.apply_move, expected_moves=p)
+                response_text, usage, metrics = ask_hanoi_agent_stream(prompt, model=model, on_chunk=validator, pegs=pegs)
+                ttft.append(metrics["ttft"])
+                ttfat.append(metrics["ttfat"])
+                decode_rate.append(metrics["decode_rate"])
+            else:
+                response_text, usage = ask_hanoi_agent(prompt, model=model, pegs=pegs)
+            prompt_tokens.append(usage.prompt_token_count)
+            output_tokens.append(usage.candidates_token_count)
+            total_tokens.append(usage.total_token_count)
+
+            if stream and validator.error:
+                total_moves.extend(validator.moves)
+                if pegs == 3:
+                    optimality.append(score_moves(k_current, validator.moves + [validator.failed_move]))
+                tokens_saved, seconds_saved = validator.savings()
+                raise ValueError(f"{validator.error} (stream cortado, ~{tokens_saved} tokens y {seconds_saved} s ahorrados)")
+
+            # Extraer vector de movimientos
+            moves = extract_moves_vector(response_text)
+            if pegs == 3:  # oráculo de forma cerrada: solo 3 varillas
+                optimality.append(score_moves(k_current, moves))
+
+            # Guardar movimientos acumulados
+            total_moves.extend(moves)
+
+            # Aplicar movimientos y obtener nueva configuración
+            new_config = HanoiVisualizer.simulate_moves(k_current, moves)
+
+            # ¿Configuración ya alcanzada en una iteración anterior?
+            first_seen = visited.setdefault(new_config, iteration)
+            if first_seen != iteration:
+                repeats.append(iteration)
+                print(f"🔁 La configuración {new_config} ya se alcanzó en la iteración {first_seen}")
+            configs.append(new_config.to_lists())
+
+            # Guardar la iteración completada (permite reanudar tras un corte)
+            checkpoint.save(iteration, new_config.to_lists(), total_moves, prompt_tokens=prompt_tokens, output_tokens=output_tokens,
+                            total_tokens=total_tokens, ttft=ttft, ttfat=ttfat, decode_rate=decode_rate,
+                            optimality=optimality, configs=configs, repeats=repeats)
+
+            # Verificar si se alcanzó el objetivo
+            if new_config == goal_config:
+                success = True
+                print("🎯 ¡Configuración objetivo alcanzada!")
+                break
+
+            # Bucle entre iteraciones: se registra y el modelo puede salir de él en la siguiente
+            if first_seen != iteration and stop_on_repeat:
+                looped = True
+                print("🛑 stop_on_repeat: el experimento se detiene aquí ('loop').")
+                break
+
+            # Preparar para siguiente iteración
+            k_current = new_config
+
+        except ValueError as e:
+            print(f"❌ Se ha producido un error en la iteración {iteration}: {e}")
+            print("🛑 El experimento se detiene aquí debido a un movimiento inválido.")
             break
 
-        # Preparar para siguiente iteración
-        k_current = new_config
-
-    except ValueError as e:
-        print(f"❌ Se ha producido un error en la iteración {iteration}: {e}")
-        print("🛑 El experimento se detiene aquí debido a un movimiento inválido.")
-        break
-
-# === VISUALIZACIÓN FINAL ===
-print("\n✅ Secuencia de movimientos obtenida:" + str(total_moves))
-print("\n🎥 Visualizando secuencia completa de movimientos...")
-viz = HanoiVisualizer(k_init, total_moves)
-# viz.animate()
-
-results_value = 'ok' if success else 'fail'
-
-import csv
-
-# Nombre del experimento
-from datetime import datetime
-timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-experiment_name = f"N{N}_p{p}_{timestamp}"
-
-# Número máximo de iteraciones registrables
-max_iters = 10
-
-# Rellenar con valores vacíos si hay menos de 10 iteraciones
-prompt_tokens += [''] * (max_iters - len(prompt_tokens))
-output_tokens += [''] * (max_iters - len(output_tokens))
-total_tokens += [''] * (max_iters - len(total_tokens))
-
-# Sumas totales
-prompt_sum = sum([t for t in prompt_tokens if isinstance(t, int)])
-output_sum = sum([t for t in output_tokens if isinstance(t, int)])
-total_sum = sum([t for t in total_tokens if isinstance(t, int)])
-
-# Encabezado
-headers = ['Name'] + \
-          [f"tokens_prompt_iter{i+1}" for i in range(max_iters)] + \
-          [f"tokens_candidates_iter{i+1}" for i in range(max_iters)] + \
-          [f"tokens_total_iter{i+1}" for i in range(max_iters)] + \
-          ['tokens_prompt_sum', 'tokens_candidates_sum', 'tokens_total_sum','results']
-
-# Fila de datos
-row = [experiment_name] + prompt_tokens + output_tokens + total_tokens + [prompt_sum, output_sum, total_sum, results_value]
-
-# Guardar en CSV
-os.makedirs("results", exist_ok=True)
-csv_path = os.path.join("results", "hanoi_token_usage.csv")
-
-file_exists = os.path.exists(csv_path)
-with open(csv_path, mode='a', newline='') as file:
-    writer = csv.writer(file)
-    if not file_exists:
-        writer.writerow(headers)
-    writer.writerow(row)
-
-
-print(f"\n📄 Resultados guardados en: {csv_path}")
+    # === VISUALIZACIÓN FINAL ===
+    print("\n✅ Secuencia de movimientos obtenida:" + str(total_moves))
+    print("\n🎥 Visualizando secuencia completa de movimientos...")
+    viz = HanoiVisualizer(k_init, total_moves)
+    # viz.animate()
+
+    if repeats:
+        print(f"🔁 Iteraciones que volvieron a una configuración ya vista: {repeats}")
+    results_value = 'ok' if success else 'loop' if looped else 'fail'
+    checkpoint.finish(results_value)
+
+    # Nombre del experimento (marcado si se ha reanudado)
+    experiment_name = checkpoint.row_name()
+
+    # Número máximo de iteraciones registrables
+    max_iters = 10
+
+    # Rellenar con valores vacíos si hay menos de 10 iteraciones
+    prompt_tokens += [''] * (max_iters - len(prompt_tokens))
+    output_tokens += [''] * (max_iters - len(output_tokens))
+    total_tokens += [''] * (max_iters - len(total_tokens))
+
+    # Sumas totales
+    prompt_sum = sum([t for t in prompt_tokens if isinstance(t, int)])
+    output_sum = sum([t for t in output_tokens if isinstance(t, int)])
+    total_sum = sum([t for t in total_tokens if isinstance(t, int)])
+
+    # Encabezado
+    headers = ['Name'] + \
+              [f"tokens_prompt_iter{i+1}" for i in range(max_iters)] + \
+              [f"tokens_candidates_iter{i+1}" for i in range(max_iters)] + \
+              [f"tokens_total_iter{i+1}" for i in range(max_iters)] + \
+              ['tokens_prompt_sum', 'tokens_candidates_sum', 'tokens_total_sum','results']
+
+    # Fila de datos
+    row = [experiment_name] + prompt_tokens + output_tokens + total_tokens + [prompt_sum, output_sum, total_sum, results_value]
+
+    # Métricas de latencia y early abort (solo en modo streaming, en un CSV aparte)
+    if stream:
+        headers, row = add_stream_columns(headers, row, ttft, ttfat, decode_rate, tokens_saved, seconds_saved, max_iters)
+
+    # Guardar en CSV
+    os.makedirs("results", exist_ok=True)
+    csv_name = "hanoi_token_usage" + ("" if pegs == 3 else "_pegs") + ("_stream" if stream else "")
+    csv_path = os.path.join("results", csv_name + ".csv")
+
+    with _csv_lock:
+        file_exists = os.path.exists(csv_path)
+        with open(csv_path, mode='a', newline='') as file:
+            writer = csv.writer(file)
+            if not file_exists:
+                writer.writerow(headers)
+            writer.writerow(row)
+        save_optimality(experiment_name, "steps", N, p, optimality)
+
+    print(f"\n📄 Resultados guardados en: {csv_path}")
+    return {"name": experiment_name, "results": results_value, "moves": len(total_moves), "tokens_total": total_sum}
+
+
+if __name__ == "__main__":
+    N = 4 # Number of disks
+    p = 10 # Number of moves to make in each iteration
+    resume = None # Nombre de un experimento interrumpido para continuarlo (ver results/checkpoints)
+    run_steps_experiment(N=N, p=p, resume=resume)
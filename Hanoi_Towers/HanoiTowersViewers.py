@@ -3,20 +3,20 @@ import matplotlib.patches as patches
 import matplotlib.colors as mcolors
 import numpy as np
 import time
+from HanoiState import HanoiState
 
 class HanoiVisualizer:
     def __init__(self, initial_state, moves):
-        self.state = [peg.copy() for peg in initial_state]  # copia profunda
+        self.state = HanoiState.from_lists(initial_state)  # valida el estado inicial
         self.moves = moves
-        self.num_pegs = 3
+        self.num_pegs = len(self.state)  # 3 o más (variantes multi-varilla)
         self.colors = self._generate_pastel_colors()
-        self.max_disk = max(disk for peg in initial_state for disk in peg)
+        self.max_disk = self.state.n
         self.failed_move = None
         self.failed_disk = None
 
         if len(self.colors) < self.max_disk + 1:
             raise ValueError(f"Not enough colors for {self.max_disk} disks.")
-        self._validate_initial_state()
 
     def _generate_pastel_colors(self):
         pastel_colors = [c for name, c in mcolors.CSS4_COLORS.items()
@@ -27,40 +27,14 @@ class HanoiVisualizer:
         np.random.shuffle(pastel_colors)
         return pastel_colors
 
-    def _validate_initial_state(self):
-        seen_disks = set()
-        for peg in self.state:
-            for j in range(len(peg) - 1):
-                if peg[j] < peg[j + 1]:
-                    raise ValueError("Invalid initial stack: larger disk on top of smaller")
-            for disk in peg:
-                if disk in seen_disks:
-                    raise ValueError(f"Repeated disk in initial state: {disk}")
-                seen_disks.add(disk)
-
     def _validate_and_apply_move(self, move, step):
-        disk, from_peg, to_peg = move
-
-        if not (0 <= from_peg < self.num_pegs) or not (0 <= to_peg < self.num_pegs):
-            print(f"⛔ Invalid peg index at step {step}: {move}")
-            self.failed_move = step
-            self.failed_disk = disk
-            return False
-
-        if not self.state[from_peg] or self.state[from_peg][-1] != disk:
-            print(f"⛔ Invalid move at step {step}: disk {disk} is not on top of peg {from_peg}")
+        try:
+            self.state = self.state.apply(move, step=step)
+        except ValueError as e:
+            print(f"⛔ {e}")
             self.failed_move = step
-            self.failed_disk = disk
+            self.failed_disk = move[0] if len(move) else None
             return False
-
-        if self.state[to_peg] and self.state[to_peg][-1] < disk:
-            print(f"⛔ Invalid move at step {step}: cannot place disk {disk} on smaller disk {self.state[to_peg][-1]}")
-            self.failed_move = step
-            self.failed_disk = disk
-            return False
-
-        self.state[from_peg].pop()
-        self.state[to_peg].append(disk)
         return True
 
 
@@ -203,27 +177,21 @@ class HanoiVisualizer:
         Retorna:
         - La configuración final de las torres.
         """
-        num_pegs = 3
-        state = [peg.copy() for peg in initial_state]
-
-        for i, move in enumerate(moves):
-            disk, from_peg, to_peg = move
-
-            if not (0 <= from_peg < num_pegs) or not (0 <= to_peg < num_pegs):
-                raise ValueError(f"Invalid peg index in move {i + 1}: {move}")
-
-            if not state[from_peg] or state[from_peg][-1] != disk:
-                raise ValueError(f"Invalid move at step {i + 1}: disk {disk} is not on top of peg {from_peg}")
-
-            if state[to_peg] and state[to_peg][-1] < disk:
-                raise ValueError(f"Invalid move at step {i + 1}: cannot place disk {disk} on smaller disk {state[to_peg][-1]}")
-
-            state[from_peg].pop()
-            state[to_peg].append(disk)
+        state = HanoiState.from_lists(initial_state).play(moves)
 
         print("Final state after simulation:")
         print(state)
-        return state
+        # Se devuelve el mismo tipo recibido (listas o HanoiState)
+        return state if isinstance(initial_state, HanoiState) else state.to_lists()
+
+    @staticmethod
+    def apply_move(state, move):
+        """
+        Aplica un único movimiento [disk, from_peg, to_peg] y devuelve la nueva configuración.
+        Lanza ValueError si el movimiento no es legal (usado para validar respuestas en streaming).
+        """
+        new_state = HanoiState.from_lists(state).apply(move)
+        return new_state if isinstance(state, HanoiState) else new_state.to_lists()
 
 
 
@@ -1,8 +1,16 @@
-import subprocess
-
-for i in range(10):
-    print(f"🔁 Ejecutando prueba {i + 1}/10")
-    result = subprocess.run(["python3", "DeepSeekHanoiTowersSolverSteps.py"], capture_output=True, text=True)
-    print(result.stdout)  # Muestra la salida por consola (opcional)
-    if result.stderr:
-        print("⚠️ Error:", result.stderr)
+import os
+import sys
+
+# Cambiar al directorio del script y hacer visible el runner compartido
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Harness"))
+
+from asyncRunner import run_trials
+from clientPool import print_pool_stats
+from DeepSeekHanoiTowersSolverSteps import run_steps_experiment
+
+TRIALS = 10       # Número de pruebas
+CONCURRENCY = 4   # Pruebas simultáneas (limitado por la cuota del proveedor)
+
+run_trials(run_steps_experiment, trials=TRIALS, concurrency=CONCURRENCY, N=9, p=150)
+print_pool_stats()
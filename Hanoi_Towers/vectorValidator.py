@@ -0,0 +1,152 @@
+"""
+Vectorized validator for long Tower of Hanoi move sequences.
+
+HanoiVisualizer.simulate_moves walks the moves one by one on lists of lists, which dominates the
+baseline runs at N>=15 (32k to 1M moves) and the bulk re-scoring of archived answers. Here every
+peg is a bitmask of the disks it holds (bit d = disk d) and a block of moves is checked at once:
+
+    1. a move of disk d between pegs f and t toggles bit d in masks f and t, so the masks of
+       every peg before every move are a cumulative XOR of those toggles;
+    2. the move is legal iff bit d is set in mask f, and no bit below d is set in mask f
+       (d is on top) or in mask t (no larger disk on a smaller one).
+
+The first illegal index is the first row that fails; the rows after it are irrelevant. Blocks of
+CHUNK_MOVES moves are processed with the masks carried over, so the extra memory stays bounded.
+The number of pegs is taken from the initial state (3, or more for the multi-peg variants).
+
+Example:
+    first_invalid, reason, final_state = validate_moves_array([[3, 2, 1], [], []], moves)
+    if first_invalid is not None:
+        print(f"❌ Movimiento {first_invalid + 1}: {reason}")
+"""
+import time
+from array import array
+
+import numpy as np
+
+MAX_DISKS = 62
+CHUNK_MOVES = 1 << 18
+
+
+def as_moves_array(moves) -> np.ndarray:
+    """
+    (M, 3) int array from a list of [disk, from, to] moves, a MoveArray or an array.
+    """
+    data = getattr(moves, "data", None)
+    if isinstance(data, array) and getattr(moves, "width", 3) == 3:
+        # MoveArray: se reutiliza el buffer de enteros sin copiarlo
+        return np.frombuffer(data, dtype=np.intc).reshape(-1, 3)
+    matrix = np.asarray(moves, dtype=np.int64)
+    if matrix.size == 0:
+        return matrix.reshape(0, 3)
+    if matrix.ndim != 2 or matrix.shape[1] != 3:
+        raise ValueError(f"❌ Se esperaba una matriz (M, 3) de movimientos, no {matrix.shape}.")
+    return matrix
+
+
+def state_to_masks(state: list) -> np.ndarray:
+    n = sum(len(peg) for peg in state)
+    if n > MAX_DISKS:
+        raise ValueError(f"❌ El validador vectorizado admite hasta {MAX_DISKS} discos (N={n}).")
+    masks = np.zeros(len(state), dtype=np.int64)
+    seen = 0
+    for peg_index, peg in enumerate(state):
+        for disk in peg:
+            if not 1 <= disk <= n or seen >> disk & 1:
+                raise ValueError(f"❌ Estado inicial inválido: disco {disk} repetido o fuera de 1..{n}.")
+            seen |= 1 << disk
+            masks[peg_index] |= 1 << disk
+    return masks
+
+
+def masks_to_state(masks: np.ndarray, n: int) -> list:
+    return [[d for d in range(n, 0, -1) if int(mask) >> d & 1] for mask in masks]
+
+
+def validate_moves_array(initial_state: list, moves, chunk_size: int = CHUNK_MOVES) -> tuple:
+    """
+    Validates a whole move sequence.
+
+    Returns (first_invalid, reason, final_state): the 0-based index of the first illegal move
+    (None if all are legal), a message in the same words as simulate_moves, and the state after
+    the last legal move.
+    """
+    moves = as_moves_array(moves)
+    masks = state_to_masks(initial_state)
+    n = sum(len(peg) for peg in initial_state)
+    num_pegs = len(initial_state)
+
+    for offset in range(0, len(moves), chunk_size):
+        block = moves[offset:offset + chunk_size]
+        rows = np.arange(len(block))
+        disk, src, dst = (block[:, column].astype(np.int64) for column in range(3))
+
+        bad_peg = (src < 0) | (src >= num_pegs) | (dst < 0) | (dst >= num_pegs)
+        bad_disk = (disk < 1) | (disk > n)
+        bit = np.where(bad_disk | bad_peg, 0, np.left_shift(1, np.clip(disk, 0, MAX_DISKS)))
+        below = np.left_shift(1, np.clip(disk, 0, MAX_DISKS)) - 1
+
+        # Máscaras de cada varilla antes de cada movimiento: XOR acumulado de los cambios
+        before = np.empty((num_pegs, len(block)), dtype=np.int64)
+        for peg in range(num_pegs):
+            toggles = np.where((src == peg) ^ (dst == peg), bit, 0)
+            after = np.bitwise_xor.accumulate(toggles) ^ masks[peg]
+            before[peg, 0] = masks[peg]
+            before[peg, 1:] = after[:-1]
+            masks[peg] = after[-1]
+
+        src_mask = before[np.clip(src, 0, num_pegs - 1), rows]
+        dst_mask = before[np.clip(dst, 0, num_pegs - 1), rows]
+        not_on_top = bad_disk | ((src_mask & bit) == 0) | ((src_mask & below) != 0)
+        onto_smaller = (dst_mask & below) != 0
+
+        failed = bad_peg | not_on_top | onto_smaller
+        if failed.any():
+            i = int(np.argmax(failed))
+            move = block[i].tolist()
+            if bad_peg[i]:
+                reason = f"Invalid peg index in move {offset + i + 1}: {move}"
+            elif not_on_top[i]:
+                reason = f"Invalid move at step {offset + i + 1}: disk {move[0]} is not on top of peg {move[1]}"
+            else:
+                blocking = int(dst_mask[i] & below[i])
+                top = (blocking & -blocking).bit_length() - 1
+                reason = f"Invalid move at step {offset + i + 1}: cannot place disk {move[0]} on smaller disk {top}"
+            return offset + i, reason, masks_to_state(before[:, i], n)
+
+    return None, None, masks_to_state(masks, n)
+
+
+if __name__ == "__main__":
+    # Benchmark frente a HanoiVisualizer.simulate_moves (soluciones óptimas y una con error al final)
+    import contextlib
+    import io
+    from HanoiTowersViewers import HanoiVisualizer
+
+    def hanoi(n, source=0, target=2, spare=1):
+        if n:
+            yield from hanoi(n - 1, source, spare, target)
+            yield [n, source, target]
+            yield from hanoi(n - 1, spare, target, source)
+
+    for n in (10, 15, 18, 20):
+        initial = [list(range(n, 0, -1)), [], []]
+        moves = np.array(list(hanoi(n)), dtype=np.int64)
+
+        t0 = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            expected = HanoiVisualizer.simulate_moves(initial, moves.tolist())
+        t_list = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        first_invalid, reason, final_state = validate_moves_array(initial, moves)
+        t_vector = time.perf_counter() - t0
+        assert first_invalid is None and final_state == expected
+
+        broken = moves.copy()
+        broken[-2] = [n, 0, 1]
+        first_invalid, reason, _ = validate_moves_array(initial, broken)
+        assert first_invalid == len(moves) - 2, reason
+
+        print(f"N={n:2d} | {len(moves):8d} movimientos | simulate_moves {t_list:7.3f} s"
+              f" | validate_moves_array {t_vector:6.3f} s | x{t_list / t_vector:.1f}")
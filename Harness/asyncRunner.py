@@ -0,0 +1,78 @@
+"""
+In-process trial runner.
+
+The multiple*.py scripts used to launch one `python3 <script>.py` subprocess per trial and wait
+for it to finish before starting the next one, so a batch of 10 trials took 10x the latency of a
+single LLM call and paid the interpreter/import cost every time.
+
+This module runs the experiment functions (run_steps_experiment, run_baseline_experiment, ...)
+as concurrent asyncio tasks inside the same process. The provider SDKs are blocking, so each
+trial is executed on a worker thread owned by the runner; plain coroutine functions are awaited
+directly. A semaphore caps how many trials are in flight at the same time.
+
+Example:
+    from asyncRunner import run_trials
+    from HanoiTowersSolverSteps import run_steps_experiment
+
+    results = run_trials(run_steps_experiment, trials=10, concurrency=4, N=5, p=30)
+"""
+import asyncio
+import functools
+import inspect
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+async def _run_trial(index: int, trials: int, trial_fn, semaphore: asyncio.Semaphore,
+                     executor: ThreadPoolExecutor, kwargs: dict) -> dict:
+    async with semaphore:
+        print(f"🔁 Ejecutando prueba {index + 1}/{trials}")
+        start = time.perf_counter()
+        try:
+            if inspect.iscoroutinefunction(trial_fn):
+                result = await trial_fn(**kwargs)
+            else:
+                loop = asyncio.get_running_loop()
+                result = await loop.run_in_executor(executor, functools.partial(trial_fn, **kwargs))
+            error = None
+        except Exception as e:
+            # Una prueba fallida no debe cancelar el resto del lote
+            print(f"⚠️ Error en la prueba {index + 1}/{trials}: {e}")
+            result = None
+            error = str(e)
+        elapsed = time.perf_counter() - start
+        print(f"⏱️  Prueba {index + 1}/{trials} terminada en {elapsed:.1f} s")
+        return {"trial": index, "result": result, "error": error, "seconds": elapsed}
+
+
+async def run_trials_async(trial_fn, trials: int = 10, concurrency: int = 4, **kwargs) -> list[dict]:
+    """
+    Runs `trial_fn(**kwargs)` `trials` times with at most `concurrency` trials in flight.
+
+    Returns one dict per trial (in trial order) with the keys
+    'trial', 'result', 'error' and 'seconds'.
+    """
+    if trials < 1:
+        raise ValueError("❌ trials must be at least 1.")
+    if concurrency < 1:
+        raise ValueError("❌ concurrency must be at least 1.")
+
+    semaphore = asyncio.Semaphore(concurrency)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        tasks = [_run_trial(i, trials, trial_fn, semaphore, executor, kwargs) for i in range(trials)]
+        return await asyncio.gather(*tasks)
+
+
+def run_trials(trial_fn, trials: int = 10, concurrency: int = 4, **kwargs) -> list[dict]:
+    """
+    Synchronous entry point for scripts: runs the batch and prints a short summary.
+    """
+    start = time.perf_counter()
+    outcomes = asyncio.run(run_trials_async(trial_fn, trials=trials, concurrency=concurrency, **kwargs))
+    elapsed = time.perf_counter() - start
+
+    failed = sum(1 for o in outcomes if o["error"] is not None)
+    sequential = sum(o["seconds"] for o in outcomes)
+    print(f"\n📊 {trials} pruebas en {elapsed:.1f} s (secuencial: {sequential:.1f} s, "
+          f"concurrencia = {concurrency}, errores = {failed})")
+    return outcomes
@@ -0,0 +1,149 @@
+"""
+Per-iteration checkpoints for the stepwise experiments.
+
+The stepwise loops keep the current state, the accumulated moves and the per-iteration token
+lists only in memory, so a crash, Ctrl-C or API error at iteration 8 of a long run threw away
+every token already paid for. After each completed iteration the loop now saves them to
+`results/checkpoints/<experiment name>.json`, written to a temp file and renamed so that a
+checkpoint is never left half written.
+
+    run_steps_experiment(resume="N9_p150_20250614_101500")
+
+reloads the last good iteration (and the N / p / model of the run) and continues under the same
+experiment name; the CSV row is then named "<name>_resumed". Runs that ended with a result
+(ok / fail) cannot be resumed.
+
+Example:
+    checkpoint = Checkpoint.start(f"N{N}_p{p}_{timestamp}", "hanoi_steps", {"N": N, "p": p})
+    checkpoint.save(iteration, new_config, total_moves, prompt_tokens=prompt_tokens)
+    checkpoint.finish("ok")
+"""
+import json
+import os
+import time
+
+CHECKPOINT_DIR = os.path.join("results", "checkpoints")
+RESUMED_SUFFIX = "_resumed"
+
+
+class Checkpoint:
+    def __init__(self, name: str, kind: str, params: dict, directory: str = CHECKPOINT_DIR):
+        self.name = name
+        self.kind = kind
+        self.params = dict(params)
+        self.directory = directory
+        self.iteration = 0
+        self.state = None
+        self.total_moves = []
+        self.series = {}
+        self.status = "running"
+        self.resumed = 0
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.directory, f"{self.name}.json")
+
+    #####CREATE / LOAD#####
+    @classmethod
+    def start(cls, name: str, kind: str, params: dict, directory: str = CHECKPOINT_DIR) -> "Checkpoint":
+        """
+        New checkpoint for a run. The file is claimed with an exclusive create, so concurrent
+        trials started in the same second get distinct names (suffix _2, _3, ...).
+        """
+        os.makedirs(directory, exist_ok=True)
+        candidate, n = name, 1
+        while True:
+            try:
+                with open(os.path.join(directory, f"{candidate}.json"), "x"):
+                    pass
+                break
+            except FileExistsError:
+                n += 1
+                candidate = f"{name}_{n}"
+        checkpoint = cls(candidate, kind, params, directory)
+        checkpoint._write()
+        return checkpoint
+
+    @classmethod
+    def load(cls, name: str, kind: str, directory: str = CHECKPOINT_DIR) -> "Checkpoint":
+        path = os.path.join(directory, f"{name}.json")
+        if not os.path.exists(path):
+            raise ValueError(f"❌ No existe el checkpoint {path}")
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if data["kind"] != kind:
+            raise ValueError(f"❌ El checkpoint {name} es de un experimento '{data['kind']}', no '{kind}'.")
+        if data["status"] != "running":
+            raise ValueError(f"❌ El experimento {name} ya terminó ({data['status']}); no hay nada que reanudar.")
+
+        checkpoint = cls(name, kind, data["params"], directory)
+        checkpoint.iteration = data["iteration"]
+        checkpoint.state = data["state"]
+        checkpoint.total_moves = data["total_moves"]
+        checkpoint.series = data["series"]
+        checkpoint.resumed = data.get("resumed", 0) + 1
+        print(f"♻️  Reanudando {name} tras la iteración {checkpoint.iteration} "
+              f"({len(checkpoint.total_moves)} movimientos, parámetros {checkpoint.params})")
+        return checkpoint
+
+    #####UPDATE#####
+    def get(self, series: str) -> list:
+        return list(self.series.get(series, []))
+
+    def save(self, iteration: int, state, total_moves: list, **series):
+        """
+        Records a completed iteration: the state after its moves, all the moves so far and
+        the per-iteration lists (tokens, latencies) given as keyword arguments.
+        """
+        self.iteration = iteration
+        self.state = state
+        self.total_moves = [list(move) for move in total_moves]
+        self.series.update({key: list(values) for key, values in series.items()})
+        self._write()
+
+    def finish(self, results: str):
+        self.status = results
+        self._write()
+
+    def row_name(self) -> str:
+        return self.name + RESUMED_SUFFIX if self.resumed else self.name
+
+    def _write(self):
+        data = {
+            "name": self.name,
+            "kind": self.kind,
+            "params": self.params,
+            "iteration": self.iteration,
+            "state": self.state,
+            "total_moves": self.total_moves,
+            "series": self.series,
+            "status": self.status,
+            "resumed": self.resumed,
+            "updated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+
+def unfinished(kind: str = None, directory: str = CHECKPOINT_DIR) -> list[str]:
+    """
+    Names of the runs without a result: interrupted (resumable) or still running elsewhere.
+    """
+    if not os.path.isdir(directory):
+        return []
+    names = []
+    for file_name in sorted(os.listdir(directory)):
+        if not file_name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(directory, file_name), encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            continue
+        if data.get("status") == "running" and (kind is None or data.get("kind") == kind):
+            names.append(data["name"])
+    return names
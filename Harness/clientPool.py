@@ -0,0 +1,137 @@
+"""
+Process-wide pool of reusable LLM clients.
+
+Building a `genai.Client`, a `genai.GenerativeModel` or a bare `requests.post` connection on every
+iteration pays client initialisation and TCP/TLS setup again for each step. The puzzle modules
+draw their clients from here instead:
+
+    get_genai_client(api_key_env)          -> google.genai Client, one per API key
+                                              (GEMINI_BASE_URL overrides the endpoint)
+    get_generative_model(model, system)    -> google.generativeai GenerativeModel, one per
+                                              (model, system instruction); they share the key set
+                                              with genai.configure()
+    get_http_session(backend)              -> keep-alive requests.Session (Ollama / LM Studio)
+
+Setup time (building clients) and generation time (the calls themselves, wrapped with `timed`)
+are accumulated separately per backend; `print_pool_stats()` shows how much setup the reuse saved.
+
+Example:
+    client = get_genai_client("GEMINI_API_KEY_HANOI")
+    response = timed("gemini", client.models.generate_content)(model=..., contents=...)
+"""
+import functools
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+_lock = threading.Lock()
+_clients = {}
+_stats = {}
+
+
+#####STATS#####
+def _stat(backend: str) -> dict:
+    return _stats.setdefault(backend, {
+        "setup_seconds": 0.0, "setups": 0, "reuses": 0,
+        "generation_seconds": 0.0, "calls": 0,
+    })
+
+
+def _get_or_create(backend: str, key: tuple, factory):
+    with _lock:
+        stat = _stat(backend)
+        if key in _clients:
+            stat["reuses"] += 1
+            return _clients[key]
+        start = time.perf_counter()
+        client = factory()
+        stat["setup_seconds"] += time.perf_counter() - start
+        stat["setups"] += 1
+        _clients[key] = client
+        return client
+
+
+def timed(backend: str, fn):
+    """
+    Wraps a client call so its wall time is accumulated as generation time of `backend`.
+    """
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            with _lock:
+                stat = _stat(backend)
+                stat["generation_seconds"] += elapsed
+                stat["calls"] += 1
+    return wrapper
+
+
+def pool_stats() -> dict:
+    with _lock:
+        return {backend: dict(stat) for backend, stat in _stats.items()}
+
+
+def print_pool_stats():
+    for backend, stat in pool_stats().items():
+        mean_setup = stat["setup_seconds"] / stat["setups"] if stat["setups"] else 0.0
+        print(f"🔌 {backend}: {stat['setups']} clientes creados ({stat['setup_seconds']:.2f} s de setup), "
+              f"{stat['reuses']} reutilizaciones (~{stat['reuses'] * mean_setup:.2f} s ahorrados), "
+              f"{stat['calls']} llamadas ({stat['generation_seconds']:.1f} s de generación)")
+
+
+#####CLIENTS#####
+def get_genai_client(api_key_env: str = "GEMINI_API_KEY_HANOI"):
+    """
+    google.genai Client for the API key stored in the environment variable `api_key_env`.
+    """
+    # El import del SDK queda fuera del tiempo de setup medido
+    from google import genai
+    from google.genai import types
+
+    base_url = os.getenv("GEMINI_BASE_URL")
+
+    def factory():
+        http_options = types.HttpOptions(base_url=base_url) if base_url else None
+        return genai.Client(api_key=os.getenv(api_key_env), http_options=http_options)
+    return _get_or_create("gemini", ("genai", api_key_env, base_url), factory)
+
+
+def generativeai_options() -> dict:
+    """
+    Extra genai.configure() kwargs for google.generativeai: when GEMINI_BASE_URL is set
+    (e.g. the record/replay proxy) requests go over REST to that endpoint.
+    """
+    base_url = os.getenv("GEMINI_BASE_URL")
+    if not base_url:
+        return {}
+    return {"transport": "rest", "client_options": {"api_endpoint": base_url}}
+
+
+def get_generative_model(model_name: str, system_instruction: str = None):
+    """
+    google.generativeai GenerativeModel for (model, system instruction).
+    """
+    import google.generativeai as generativeai
+
+    def factory():
+        return generativeai.GenerativeModel(model_name=model_name, system_instruction=system_instruction)
+    return _get_or_create("gemini", ("generativeai", model_name, system_instruction), factory)
+
+
+def get_http_session(backend: str = "ollama", pool_size: int = 16) -> requests.Session:
+    """
+    Keep-alive requests.Session for an HTTP backend; connections are reused across calls and threads.
+    """
+    def factory():
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+    return _get_or_create(backend, ("http", backend), factory)
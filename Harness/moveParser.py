@@ -0,0 +1,458 @@
+"""
+Incremental move parsing for streamed answers.
+
+In stepwise mode the whole answer used to be generated, then parsed with extract_moves_vector and
+only then rejected by simulate_moves at the first bad move. `IncrementalMoveParser` extracts each
+move (an innermost [...] list inside the moves vector) as soon as its closing bracket arrives, and
+`StreamingMoveValidator` applies every move to the puzzle state with the puzzle's own validator.
+Used as the `on_chunk` hook of streaming.collect_stream, it aborts the request at the first
+illegal move and estimates how many tokens and seconds the early abort saved.
+
+For complete answers `parse_int_moves` replaces the old slice + regex cleanup + ast.literal_eval
+path: it scans the moves vector (the last 'moves = [' block when a marker is given, up to the ']'
+that closes it, without '#' comments) once, window by window, and stores the integer moves in a flat
+array('i') (12 bytes per Hanoi move instead of a list of three int objects per move), wrapped in
+a `MoveArray` that behaves like the old list of lists. `parse_move_lists` does the same scan for
+moves with labels (blocks, checker colours) and returns plain lists.
+
+For free-form answers whose moves have a variable number of names (River Crossing),
+`extract_move_list` finds the best candidate list with a single bracket-depth scan, in linear
+time and without eval: the last well-formed list right after 'moves =' first, otherwise the last
+well-formed list of lists anywhere in the text.
+
+Example:
+    validator = StreamingMoveValidator(k_current, HanoiVisualizer.apply_move, expected_moves=p)
+    result = collect_stream(chunks, on_chunk=validator)
+    if validator.error:
+        tokens_saved, seconds_saved = validator.savings()
+
+    moves = parse_int_moves(final_answer)      # MoveArray, e.g. 2^20 - 1 moves in well under a second
+    moves = extract_move_list(answer)          # [['A_1', 'a_1'], ['A_1'], ...]
+"""
+import re
+import time
+from array import array
+from collections.abc import Sequence
+from itertools import chain
+
+# Caracteres por token en listas de movimientos (dígitos, comas y corchetes tokenizan mal)
+CHARS_PER_TOKEN = 3.0
+
+_INT = re.compile(r"-?\d+")
+_INNER = re.compile(r"\[([^\[\]]*)\]")
+_BRACKET = re.compile(r"[\[\]]")
+_ANOMALY = re.compile(r"\][^\[\]]*\]|\[[^\[\]]*\[")
+_COMMENT = re.compile(r"#[^\n]*")
+_NON_WORD = re.compile(r"\W+")
+_STRICT = {}
+
+# Tamaño de la ventana de texto analizada de una vez (memoria extra acotada)
+WINDOW_CHARS = 1 << 20
+
+
+def parse_move(raw: str) -> list:
+    """
+    '1, 0, 2' -> [1, 0, 2]; '"A_1", "a_1 "' -> ['A_1', 'a_1']
+    """
+    move = []
+    for token in raw.split(","):
+        token = token.strip().strip("'\"`").strip()
+        if not token:
+            continue
+        move.append(int(token) if _INT.fullmatch(token) else token)
+    return move
+
+
+class IncrementalMoveParser:
+    """
+    Feed it text chunks; feed() returns the moves completed by each chunk.
+
+    Parsing starts at the first '[' (or right after `marker`, e.g. "moves", when given) and stops
+    when that outer list is closed. Every innermost list nested inside it is a move; '#' comments
+    are skipped.
+    """
+    def __init__(self, marker: str = None):
+        self.marker = marker.lower() if marker else None
+        self.armed = marker is None
+        self.tail = ""
+        self.depth = 0
+        self.current = None
+        self.comment = False
+        self.done = False
+
+    def feed(self, text: str) -> list:
+        moves = []
+        if self.done:
+            return moves
+        if not self.armed:
+            buffer = self.tail + text
+            index = buffer.lower().find(self.marker)
+            if index == -1:
+                self.tail = buffer[-(len(self.marker) - 1):] if len(self.marker) > 1 else ""
+                return moves
+            self.armed = True
+            text = buffer[index + len(self.marker):]
+
+        for ch in text:
+            # Los comentarios '#' llegan hasta el final de la línea y no aportan movimientos
+            if self.comment:
+                self.comment = ch != "\n"
+            elif ch == "#":
+                self.comment = True
+            elif ch == "[":
+                self.depth += 1
+                self.current = []
+            elif ch == "]":
+                if self.depth == 0:
+                    continue
+                if self.current is not None and self.depth >= 2:
+                    moves.append(parse_move("".join(self.current)))
+                self.current = None
+                self.depth -= 1
+                if self.depth == 0:
+                    self.done = True
+                    break
+            elif self.current is not None:
+                self.current.append(ch)
+        return moves
+
+
+class StreamingMoveValidator:
+    """
+    on_chunk hook: applies each streamed answer move with `apply_move(state, move) -> new_state`
+    (which raises ValueError on an illegal move) and returns True to abort at the first failure.
+    """
+    def __init__(self, initial_state, apply_move, expected_moves: int = None, marker: str = None):
+        self.state = initial_state
+        self.apply_move = apply_move
+        self.expected_moves = expected_moves
+        self.parser = IncrementalMoveParser(marker)
+        self.moves = []
+        self.error = None
+        self.failed_move = None
+        self.chars = 0
+        self.first_at = None
+        self.abort_at = None
+
+    def __call__(self, kind: str, text: str) -> bool:
+        if self.error is not None:
+            return True
+        if kind != "answer":
+            return False
+        now = time.perf_counter()
+        if self.first_at is None:
+            self.first_at = now
+        self.chars += len(text)
+        for move in self.parser.feed(text):
+            try:
+                self.state = self.apply_move(self.state, move)
+            except (ValueError, IndexError, TypeError, KeyError) as e:
+                self.error = f"Movimiento {len(self.moves) + 1} inválido {move}: {e}"
+                self.failed_move = move
+                self.abort_at = now
+                return True
+            self.moves.append(move)
+        return False
+
+    def savings(self) -> tuple[int, float]:
+        """
+        Estimated (tokens, seconds) not generated thanks to the abort: the moves still missing up
+        to `expected_moves`, at the characters-per-move and characters-per-second observed so far.
+        """
+        if self.error is None or not self.expected_moves:
+            return 0, 0.0
+        seen = len(self.moves) + 1
+        remaining_chars = max(0, self.expected_moves - seen) * self.chars / seen
+        elapsed = self.abort_at - self.first_at
+        seconds = remaining_chars * elapsed / self.chars if elapsed > 0 else 0.0
+        return int(round(remaining_chars / CHARS_PER_TOKEN)), round(seconds, 3)
+
+
+#####COMPLETE ANSWERS#####
+class MoveArray(Sequence):
+    """
+    Flat integer array of moves viewed as a list of [a, b, c] lists (created on access).
+    """
+    __slots__ = ("data", "width")
+
+    def __init__(self, data: array = None, width: int = 3):
+        self.data = data if data is not None else array("i")
+        self.width = width
+
+    def __len__(self):
+        return len(self.data) // self.width
+
+    def __getitem__(self, index):
+        w = self.width
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            return MoveArray(self.data[start * w:stop * w], w)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("move index out of range")
+        return self.data[index * w:(index + 1) * w].tolist()
+
+    def __iter__(self):
+        data, w = self.data, self.width
+        for i in range(0, len(data), w):
+            yield data[i:i + w].tolist()
+
+    def __eq__(self, other):
+        if isinstance(other, MoveArray):
+            return self.width == other.width and self.data == other.data
+        if isinstance(other, (list, tuple)):
+            return len(other) == len(self) and all(list(a) == b for a, b in zip(other, self))
+        return NotImplemented
+
+    def tolist(self) -> list:
+        return list(self)
+
+    def __repr__(self):
+        return repr(self.tolist())
+
+
+def _vector_start(text: str, marker: str = None) -> int:
+    """
+    Position of the '[' that opens the moves vector: the last 'marker = [' (drafts come before the
+    final answer), or the first '[' when there is no marker.
+    """
+    if marker is None:
+        start = text.find("[")
+        if start == -1:
+            raise ValueError("❌ No se encontró un bloque válido delimitado por [ y ].")
+        return start
+    start = -1
+    for match in re.finditer(marker + r"\s*=\s*\[", text):
+        start = match.end() - 1
+    if start == -1:
+        raise ValueError(f"❌ No se encontró '{marker} = [' en la respuesta.")
+    return start
+
+
+def _vector_chunks(text: str, marker: str = None, window: int = WINDOW_CHARS):
+    """
+    Yields the text of the moves vector, window by window, without its outer brackets and without
+    '#' comments, stopping at the ']' that closes it (tracking the bracket depth). Each window is
+    cut right after a ']' so that no move is split. The leading run of flat '[...]' moves at depth 1
+    is skipped with one regex search; only what follows it is scanned bracket by bracket. Without a marker a second list after the vector raises ValueError, as the old
+    first '[' / last ']' slice did.
+    """
+    start = _vector_start(text, marker)
+    pos, end, depth, moves_seen = start + 1, len(text), 1, False
+    while pos < end:
+        stop = pos + window
+        if stop >= end:
+            stop = end
+        else:
+            cut = text.rfind("]", pos, stop)
+            if cut == -1:
+                cut = text.find("]", stop, end)
+            stop = end if cut == -1 else cut + 1
+        # Un comentario cortado por la ventana se lleva hasta el final de su línea
+        line_start = text.rfind("\n", pos, stop) + 1 or pos
+        if "#" in text[line_start:stop]:
+            newline = text.find("\n", stop)
+            stop = end if newline == -1 else newline + 1
+        chunk = text[pos:stop]
+        pos = stop
+        if "#" in chunk:
+            chunk = _COMMENT.sub("", chunk)
+
+        # A profundidad 1 los movimientos planos alternan '[' y ']': la profundidad solo cambia de
+        # patrón en el primer par de corchetes iguales seguidos (búsqueda en C); desde ahí se
+        # recorre corchete a corchete
+        flat = 0
+        if depth == 1:
+            first = _BRACKET.search(chunk)
+            if first is None or first.group() == "[":
+                anomaly = _ANOMALY.search(chunk)
+                flat = len(chunk) if anomaly is None else anomaly.start()
+                depth = 2 if anomaly is not None and anomaly.group()[0] == "]" else 1
+        moves_seen = moves_seen or chunk.find("[", 0, flat) != -1
+        if flat == len(chunk):
+            yield chunk
+            continue
+        for match in _BRACKET.finditer(chunk, flat):
+            depth += 1 if match.group() == "[" else -1
+            moves_seen = moves_seen or depth > 1
+            if depth == 0:
+                if not moves_seen and chunk[:match.start()].strip():
+                    raise ValueError("❌ El contenido extraído no es una lista de movimientos.")
+                if marker is None and ("[" in chunk[match.end():] or "[" in _COMMENT.sub("", text[pos:])):
+                    raise ValueError("❌ Hay más de una lista de movimientos en la respuesta.")
+                yield chunk[:match.start()]
+                return
+        yield chunk
+
+
+def parse_int_moves(text: str, width: int = 3, marker: str = None, window: int = WINDOW_CHARS) -> MoveArray:
+    """
+    Single-pass parser of an integer moves vector such as '[[1, 0, 2], [2, 0, 1], ...]'.
+
+    The vector is the last 'marker = [...]' list (or the first list when there is no marker), up
+    to the ']' that closes it; '#' comments are skipped. Every innermost [...] list in it must hold
+    exactly `width` integers; anything else in the list (quotes, words, spaces) is ignored as
+    noise. Clean windows go through one regex findall; a window with noise falls back to
+    move-by-move parsing.
+    """
+    strict = _STRICT.get(width)
+    if strict is None:
+        strict = _STRICT[width] = re.compile(r"\[\s*" + r"\s*,\s*".join([r"(-?\d+)"] * width) + r"\s*\]")
+
+    data = array("i")
+    for chunk in _vector_chunks(text, marker, window):
+        found = strict.findall(chunk)
+        if len(found) == chunk.count("[") == chunk.count("]"):
+            data.extend(map(int, chain.from_iterable(found)))
+            continue
+        for match in _INNER.finditer(chunk):
+            values = _INT.findall(match.group(1))
+            if len(values) != width:
+                raise ValueError(f"❌ Movimiento {len(data) // width + 1} inválido: [{match.group(1).strip()}] "
+                                 f"(se esperaban {width} enteros).")
+            data.extend(map(int, values))
+    return MoveArray(data, width)
+
+
+def parse_move_lists(text: str, width: int = 3, marker: str = None, window: int = WINDOW_CHARS) -> list:
+    """
+    Same scan as parse_int_moves for moves with labels ('["A", 0, 2]', "['R', 1, 2]"):
+    returns a list of lists with ints converted and quotes stripped.
+    """
+    moves = []
+    for chunk in _vector_chunks(text, marker, window):
+        for match in _INNER.finditer(chunk):
+            move = parse_move(match.group(1))
+            if len(move) != width:
+                raise ValueError(f"❌ Movimiento {len(moves) + 1} inválido: [{match.group(1).strip()}] "
+                                 f"(se esperaban {width} elementos).")
+            moves.append(move)
+    return moves
+
+
+def _list_spans(text: str) -> list:
+    """
+    (start, end) of every [...] list whose items are flat lists, in closing order. One pass over
+    the brackets with a depth stack: linear time whatever the nesting or the unbalanced brackets.
+    """
+    spans, stack = [], []          # stack: [posición del '[', altura máxima de sus hijos]
+    for match in _BRACKET.finditer(text):
+        if match.group() == "[":
+            stack.append([match.start(), 0])
+        elif stack:
+            start, child_height = stack.pop()
+            height = child_height + 1
+            if height == 2:
+                spans.append((start, match.end()))
+            if stack and stack[-1][1] < height:
+                stack[-1][1] = height
+    return spans
+
+
+def _name_moves(text: str, start: int, end: int):
+    """
+    Moves of the list of flat lists text[start:end], with every item reduced to its word
+    characters ('"A_1"' -> 'A_1'); None if it is empty or has an empty move.
+    """
+    moves = []
+    for match in _INNER.finditer(text, start + 1, end - 1):
+        move = [_NON_WORD.sub("", token) for token in match.group(1).split(",")]
+        move = [token for token in move if token]
+        if not move:
+            return None
+        moves.append(move)
+    return moves or None
+
+
+def extract_move_list(text: str, marker: str = "moves") -> list:
+    """
+    Best candidate move list in a free-form answer: the last well-formed list that follows
+    '`marker` =', otherwise the last well-formed list of lists in the text. '#' comments are
+    removed first, so brackets inside them never become trips. Linear time, no eval.
+    """
+    if "#" in text:
+        text = _COMMENT.sub("", text)
+    spans = _list_spans(text)
+    if marker:
+        starts = {match.end() - 1 for match in re.finditer(re.escape(marker) + r"\s*=\s*\[", text, re.IGNORECASE)}
+        for start, end in reversed(spans):
+            if start in starts:
+                moves = _name_moves(text, start, end)
+                if moves is not None:
+                    return moves
+    for start, end in reversed(spans):
+        moves = _name_moves(text, start, end)
+        if moves is not None:
+            return moves
+    raise ValueError("❌ No se pudo extraer una lista válida de movimientos del texto")
+
+
+if __name__ == "__main__":
+    # Benchmark: parser lineal frente al camino anterior (limpieza con regex + ast.literal_eval)
+    import ast
+    import tracemalloc
+
+    def legacy(response_text):
+        start, end = response_text.find("["), response_text.rfind("]")
+        return ast.literal_eval(re.sub(r"[^\d\[\],]", "", response_text[start:end + 1]))
+
+    def hanoi(n, source=0, target=2, spare=1):
+        if n:
+            yield from hanoi(n - 1, source, spare, target)
+            yield [n, source, target]
+            yield from hanoi(n - 1, spare, target, source)
+
+    for n in (12, 14, 16):
+        text = "Answer:\nmoves = [" + ", ".join(f"[{d}, {f}, {t}]" for d, f, t in hanoi(n)) + "]\nDone."
+        results = {}
+        for name, fn in (("literal_eval", legacy), ("parse_int_moves", parse_int_moves)):
+            t0 = time.perf_counter()
+            moves = fn(text)
+            seconds = time.perf_counter() - t0
+            tracemalloc.start()
+            fn(text)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            results[name] = (moves, seconds, peak)
+        assert results["parse_int_moves"][0] == results["literal_eval"][0]
+        (_, t_old, m_old), (_, t_new, m_new) = results["literal_eval"], results["parse_int_moves"]
+        print(f"N={n:2d} | {len(text) / 1e6:5.2f} MB | literal_eval {t_old:6.3f} s, {m_old / 1e6:6.1f} MB pico"
+              f" | parse_int_moves {t_new:6.3f} s, {m_new / 1e6:5.1f} MB pico | x{t_old / t_new:.1f}")
+
+    # Borradores y comentarios: solo cuenta el último 'moves = [...]', hasta su ']' de cierre
+    draft = 'First try moves = [["R",0,1]] hmm wrong.\nFinal: moves = [["R", 0, 1], ["B", 2, 0]]'
+    assert parse_move_lists(draft, marker="moves") == [['R', 0, 1], ['B', 2, 0]]
+    commented = 'moves = [[1,0,2],\n# then move [2] to peg 1\n[2,0,1]]'
+    for window in (4, 16, WINDOW_CHARS):
+        assert parse_int_moves(commented, window=window) == [[1, 0, 2], [2, 0, 1]]
+    parser = IncrementalMoveParser("moves")
+    assert [move for ch in commented for move in parser.feed(ch)] == [[1, 0, 2], [2, 0, 1]]
+    for text in ('[[1, 0, 2]] hmm [[1, 0, 2]]', 'moves = [1, 2]'):
+        try:
+            parse_int_moves(text)
+            raise AssertionError(text)
+        except ValueError:
+            pass
+    commented = 'moves = [\n ["A_1","a_1"], # pair crosses [first]\n ["A_1"]\n]'
+    assert extract_move_list(commented) == [['A_1', 'a_1'], ['A_1']]
+    print("✅ Borradores, comentarios y listas sobrantes")
+
+    # Respuestas adversariales (~100k tokens): la regex anidada de la estrategia 2 de
+    # BaseLineRiverCrossing crece exponencialmente con cada '[' sin cerrar
+    nested = re.compile(r"\[(?:[^\[\]]*(?:\[[^\[\]]*\][^\[\]]*)*)*\]")
+    for n in (16, 18, 20, 22):
+        t0 = time.perf_counter()
+        nested.findall("[" + "x" * n)
+        print(f"regex anidada | '[' + {n} caracteres sin cerrar: {time.perf_counter() - t0:7.3f} s")
+    answer = [[f"A_{i}", f"a_{i}"] for i in range(1, 2001)]
+    noise = "Let me try [A_1, a_1 then maybe [[A_2], [a_2 ... no wait, moves = [ this fails ] "
+    text = noise * (400_000 // len(noise)) + f"\nFinal answer:\nmoves = {answer}\n" + noise * 3
+    t0 = time.perf_counter()
+    moves = extract_move_list(text)
+    seconds = time.perf_counter() - t0
+    assert moves == answer
+    print(f"extract_move_list | {len(text) / 1e6:.2f} MB (~{int(len(text) / CHARS_PER_TOKEN / 1000)}k tokens) "
+          f"de ruido adversarial: {seconds:.3f} s")
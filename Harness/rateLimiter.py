@@ -0,0 +1,244 @@
+"""
+Shared token-bucket rate limiter with AIMD concurrency control.
+
+Every Gemini/Ollama call site goes through a limiter obtained with `get_limiter(backend)`.
+The limiter state lives in a small JSON file guarded by an fcntl lock, so all the processes of
+a sweep (and every thread of an asyncRunner batch) draw from the same budget:
+
+    • a request bucket refilled at `rpm` requests per minute,
+    • a token bucket refilled at `tpm` tokens per minute, debited with an estimate before the
+      call and corrected with the real `usage_metadata` counts afterwards,
+    • a concurrency window (max requests in flight) that grows additively after every successful
+      call and is halved when the provider answers with a throttling error (429 /
+      RESOURCE_EXHAUSTED), followed by a short cool-down.
+
+Limits are configured per backend with environment variables, e.g. GEMINI_RPM, GEMINI_TPM,
+GEMINI_MAX_CONCURRENCY (OLLAMA_* for the local server).
+
+Example:
+    limiter = get_limiter("gemini")
+    response = limiter.call(client.models.generate_content, model=..., contents=...)
+"""
+import fcntl
+import json
+import os
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+
+# Valores por defecto por backend: (rpm, tpm, max_concurrency)
+DEFAULT_LIMITS = {
+    "gemini": (60, 1_000_000, 8),
+    "ollama": (600, 10_000_000, 2),
+}
+
+LEASE_TIMEOUT = 900        # s: una petición que no se libera en este tiempo se da por perdida
+THROTTLE_COOLDOWN = 10.0   # s: pausa global tras un 429
+DEFAULT_ESTIMATE = 8000    # tokens estimados por petición hasta tener medias reales
+
+
+def is_throttle_error(error: Exception) -> bool:
+    """
+    True if the exception raised by the SDK / HTTP client means "slow down".
+    """
+    code = getattr(error, "code", None)
+    if callable(code):
+        code = None
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    if code == 429 or status == 429:
+        return True
+    text = str(error).upper()
+    return "429" in text or "RESOURCE_EXHAUSTED" in text or "RATE LIMIT" in text
+
+
+class _Slot:
+    """Handle returned by RateLimiter.request(); call record(usage) with the response usage."""
+    def __init__(self):
+        self.tokens = None
+
+    def record(self, usage):
+        if usage is None:
+            return
+        total = getattr(usage, "total_token_count", None)
+        if total is None and isinstance(usage, dict):
+            total = usage.get("total_tokens")
+        if total:
+            self.tokens = int(total)
+
+
+class RateLimiter:
+    def __init__(self, name: str, rpm: float, tpm: float, max_concurrency: int,
+                 min_concurrency: int = 1, state_dir: str = None):
+        self.name = name
+        self.rpm = float(rpm)
+        self.tpm = float(tpm)
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.min_concurrency = max(1, min(int(min_concurrency), self.max_concurrency))
+        state_dir = state_dir or os.getenv("LLM_RATE_LIMIT_DIR", tempfile.gettempdir())
+        os.makedirs(state_dir, exist_ok=True)
+        self.state_path = os.path.join(state_dir, f"llm_ratelimit_{name}.json")
+        self.lock_path = self.state_path + ".lock"
+
+    #####SHARED STATE#####
+    @contextmanager
+    def _locked_state(self):
+        with open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                state = self._load()
+                self._refill(state)
+                yield state
+                tmp_path = f"{self.state_path}.{os.getpid()}.tmp"
+                with open(tmp_path, "w") as f:
+                    json.dump(state, f)
+                os.replace(tmp_path, self.state_path)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _load(self) -> dict:
+        try:
+            with open(self.state_path) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {
+                "requests": self.rpm,
+                "tokens": self.tpm,
+                "updated_at": time.time(),
+                "window": float(self.min_concurrency),
+                "blocked_until": 0.0,
+                "avg_tokens": DEFAULT_ESTIMATE,
+                "leases": {},
+                "throttled": 0,
+            }
+
+    def _refill(self, state: dict):
+        now = time.time()
+        elapsed = max(0.0, now - state["updated_at"])
+        state["requests"] = min(self.rpm, state["requests"] + elapsed * self.rpm / 60.0)
+        state["tokens"] = min(self.tpm, state["tokens"] + elapsed * self.tpm / 60.0)
+        state["updated_at"] = now
+        # Limpiar concesiones de procesos muertos o colgados
+        for lease_id, (pid, started) in list(state["leases"].items()):
+            if now - started > LEASE_TIMEOUT or not _pid_alive(pid):
+                del state["leases"][lease_id]
+
+    #####ACQUIRE / RELEASE#####
+    def acquire(self, estimated_tokens: int = None) -> tuple[str, int]:
+        """
+        Blocks until a request slot, one request from the bucket and the estimated tokens are
+        available. Returns (lease_id, estimated_tokens).
+        """
+        while True:
+            with self._locked_state() as state:
+                estimate = int(estimated_tokens or state["avg_tokens"])
+                # Una petición más grande que el cubo entero solo necesita el cubo lleno
+                needed_tokens = min(estimate, self.tpm)
+                now = time.time()
+                window = max(self.min_concurrency, int(state["window"]))
+                if (now >= state["blocked_until"] and len(state["leases"]) < window
+                        and state["requests"] >= 1 and state["tokens"] >= needed_tokens):
+                    lease_id = uuid.uuid4().hex
+                    state["requests"] -= 1
+                    state["tokens"] -= estimate
+                    state["leases"][lease_id] = (os.getpid(), now)
+                    return lease_id, estimate
+
+                waits = [0.05]
+                if now < state["blocked_until"]:
+                    waits.append(state["blocked_until"] - now)
+                if state["requests"] < 1:
+                    waits.append((1 - state["requests"]) * 60.0 / self.rpm)
+                if state["tokens"] < needed_tokens:
+                    waits.append((needed_tokens - state["tokens"]) * 60.0 / self.tpm)
+            time.sleep(min(max(waits), 2.0))
+
+    def release(self, lease_id: str, estimate: int, used_tokens: int = None, throttled: bool = False):
+        with self._locked_state() as state:
+            state["leases"].pop(lease_id, None)
+            if used_tokens is not None:
+                # Corregir la estimación con el consumo real
+                state["tokens"] -= used_tokens - estimate
+                state["avg_tokens"] = 0.8 * state["avg_tokens"] + 0.2 * used_tokens
+            if throttled:
+                # Multiplicative decrease + pausa global
+                state["window"] = max(float(self.min_concurrency), state["window"] / 2.0)
+                state["blocked_until"] = time.time() + THROTTLE_COOLDOWN
+                state["throttled"] += 1
+            else:
+                # Additive increase: ~+1 por ventana completa de éxitos
+                state["window"] = min(float(self.max_concurrency), state["window"] + 1.0 / max(1.0, state["window"]))
+
+    @contextmanager
+    def request(self, estimated_tokens: int = None):
+        """
+        Context manager around one provider call:
+
+            with limiter.request() as slot:
+                response = client.models.generate_content(...)
+                slot.record(response.usage_metadata)
+        """
+        lease_id, estimate = self.acquire(estimated_tokens)
+        slot = _Slot()
+        try:
+            yield slot
+        except Exception as e:
+            self.release(lease_id, estimate, slot.tokens, throttled=is_throttle_error(e))
+            raise
+        self.release(lease_id, estimate, slot.tokens)
+
+    def call(self, fn, *args, estimated_tokens: int = None, retries: int = 3,
+             usage_of=lambda response: getattr(response, "usage_metadata", None), **kwargs):
+        """
+        Calls fn(*args, **kwargs) under the limiter, retrying throttled calls up to `retries` times.
+        """
+        for attempt in range(retries + 1):
+            try:
+                with self.request(estimated_tokens) as slot:
+                    response = fn(*args, **kwargs)
+                    slot.record(usage_of(response))
+                    return response
+            except Exception as e:
+                if not is_throttle_error(e) or attempt == retries:
+                    raise
+                print(f"⏳ Límite de cuota alcanzado ({self.name}), reintento {attempt + 1}/{retries}...")
+
+    def snapshot(self) -> dict:
+        """Current shared state (window, buckets, requests in flight) for logging."""
+        with self._locked_state() as state:
+            return {
+                "window": state["window"],
+                "in_flight": len(state["leases"]),
+                "requests": state["requests"],
+                "tokens": state["tokens"],
+                "avg_tokens": state["avg_tokens"],
+                "throttled": state["throttled"],
+            }
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+_limiters = {}
+
+def get_limiter(backend: str = "gemini") -> RateLimiter:
+    """
+    Process-wide limiter for a backend; all processes using the same backend share its state file.
+    """
+    if backend not in _limiters:
+        rpm, tpm, concurrency = DEFAULT_LIMITS.get(backend, DEFAULT_LIMITS["gemini"])
+        prefix = backend.upper()
+        _limiters[backend] = RateLimiter(
+            backend,
+            rpm=float(os.getenv(f"{prefix}_RPM", rpm)),
+            tpm=float(os.getenv(f"{prefix}_TPM", tpm)),
+            max_concurrency=int(os.getenv(f"{prefix}_MAX_CONCURRENCY", concurrency)),
+        )
+    return _limiters[backend]
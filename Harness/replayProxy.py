@@ -0,0 +1,280 @@
+"""
+Record/replay proxy for the Gemini and OpenAI-compatible (Ollama / LM Studio) endpoints.
+
+    record  Forwards every request to the real provider and appends the request/response pair
+            (full JSON body, so usage_metadata and thought parts included; streamed responses
+            chunk by chunk with their time offsets) to a JSONL archive. API keys are never stored.
+    replay  Serves the archived responses back without any provider, with their original
+            latencies multiplied by --latency-scale (0 = as fast as possible). Requests are
+            matched by a hash of method, path and canonical JSON body; repeated identical
+            requests are answered with the recorded responses in order (round robin).
+
+Point the scripts at the proxy with environment variables:
+
+    GEMINI_BASE_URL=http://127.0.0.1:8089                       (google.genai / google.generativeai)
+    OLLAMA_URL=http://127.0.0.1:8089/v1/chat/completions         (DeepSeek scripts)
+    LM_STUDIO_URL=http://127.0.0.1:8089/v1/chat/completions      (test_*.py)
+
+Example:
+    python3 Harness/replayProxy.py record Harness/recordings/hanoi.jsonl
+    python3 Harness/replayProxy.py replay Harness/recordings/hanoi.jsonl --latency-scale 0
+"""
+import argparse
+import codecs
+import hashlib
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import requests
+
+GEMINI_UPSTREAM = "https://generativelanguage.googleapis.com"
+OPENAI_UPSTREAM = "http://127.0.0.1:1234"
+FORWARDED_HEADERS = ("content-type", "authorization", "x-goog-api-key", "x-goog-api-client", "user-agent")
+
+
+def request_key(method: str, path: str, body: bytes) -> str:
+    """
+    Hash that identifies a request independently of API keys and JSON key order.
+    """
+    parts = urlsplit(path)
+    query = urlencode(sorted((k, v) for k, v in parse_qsl(parts.query) if k != "key"))
+    try:
+        canonical = json.dumps(json.loads(body), sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    except (ValueError, UnicodeDecodeError):
+        canonical = body.decode("utf-8", errors="replace")
+    raw = f"{method} {parts.path}?{query}\n{canonical}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ReplayProxy:
+    def __init__(self, mode: str, archive: str, latency_scale: float = 1.0,
+                 gemini_upstream: str = GEMINI_UPSTREAM, openai_upstream: str = OPENAI_UPSTREAM):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"❌ Unknown proxy mode '{mode}'. Options: record, replay")
+        self.mode = mode
+        self.archive = archive
+        self.latency_scale = latency_scale
+        self.gemini_upstream = gemini_upstream.rstrip("/")
+        self.openai_upstream = openai_upstream.rstrip("/")
+        self.session = requests.Session()
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "served": 0, "missing": 0, "recorded": 0}
+        self.entries = {}
+        self.cursors = {}
+        if mode == "replay":
+            self._load_archive()
+
+    #####ARCHIVE#####
+    def _load_archive(self):
+        if not os.path.exists(self.archive):
+            raise ValueError(f"❌ Archive not found: {self.archive}")
+        with open(self.archive, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                self.entries.setdefault(entry["key"], []).append(entry)
+        print(f"📼 {sum(len(v) for v in self.entries.values())} respuestas cargadas desde {self.archive}")
+
+    def _append(self, entry: dict):
+        with self.lock:
+            directory = os.path.dirname(self.archive)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.archive, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self.stats["recorded"] += 1
+
+    def upstream_for(self, path: str) -> str:
+        if path.startswith("/v1/chat/completions") or path.startswith("/v1/completions") or path.startswith("/api/"):
+            return self.openai_upstream
+        return self.gemini_upstream
+
+    #####RECORD#####
+    def record(self, handler: BaseHTTPRequestHandler, body: bytes):
+        key = request_key(handler.command, handler.path, body)
+        headers = {k: v for k, v in handler.headers.items() if k.lower() in FORWARDED_HEADERS}
+        start = time.perf_counter()
+        resp = self.session.request(handler.command, self.upstream_for(handler.path) + handler.path,
+                                    data=body, headers=headers, stream=True, timeout=900)
+        content_type = resp.headers.get("Content-Type", "application/json")
+        handler.send_response(resp.status_code)
+        handler.send_header("Content-Type", content_type)
+
+        chunks = []
+        if _is_stream(content_type, handler.path):
+            # Respuesta en streaming: se reenvía y se graba trozo a trozo con su instante
+            # (decodificador incremental: un carácter UTF-8 puede quedar partido entre dos trozos)
+            handler.send_header("Transfer-Encoding", "chunked")
+            handler.end_headers()
+            decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+            try:
+                for chunk in resp.iter_content(chunk_size=None):
+                    text = decoder.decode(chunk)
+                    if text:
+                        chunks.append([time.perf_counter() - start, text])
+                    _write_chunk(handler, chunk)
+                _write_chunk(handler, b"")
+            except (BrokenPipeError, ConnectionResetError):
+                # El cliente cortó la generación (early abort): se graba lo recibido hasta ahí
+                handler.close_connection = True
+            finally:
+                resp.close()
+                text = decoder.decode(b"", final=True)
+                if text:
+                    chunks.append([time.perf_counter() - start, text])
+        else:
+            content = resp.content
+            chunks.append([time.perf_counter() - start, content.decode("utf-8", errors="replace")])
+            handler.send_header("Content-Length", str(len(content)))
+            handler.end_headers()
+            handler.wfile.write(content)
+
+        parts = urlsplit(handler.path)
+        try:
+            request_json = json.loads(body) if body else None
+        except ValueError:
+            request_json = body.decode("utf-8", errors="replace")
+        self._append({
+            "key": key,
+            "method": handler.command,
+            "path": parts.path,
+            "request": request_json,
+            "status": resp.status_code,
+            "content_type": content_type,
+            "latency": time.perf_counter() - start,
+            "chunks": chunks,
+            "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        })
+        print(f"⏺️  {handler.command} {parts.path} -> {resp.status_code} ({time.perf_counter() - start:.2f} s)")
+
+    #####REPLAY#####
+    def replay(self, handler: BaseHTTPRequestHandler, body: bytes):
+        key = request_key(handler.command, handler.path, body)
+        with self.lock:
+            recorded = self.entries.get(key)
+            if recorded:
+                index = self.cursors.get(key, 0)
+                self.cursors[key] = index + 1
+                entry = recorded[index % len(recorded)]
+            else:
+                self.stats["missing"] += 1
+
+        if not recorded:
+            message = json.dumps({"error": {"code": 404, "status": "NOT_FOUND",
+                                            "message": f"No recording for {handler.command} {urlsplit(handler.path).path} ({key[:12]})"}})
+            payload = message.encode("utf-8")
+            handler.send_response(404)
+            handler.send_header("Content-Type", "application/json")
+            handler.send_header("Content-Length", str(len(payload)))
+            handler.end_headers()
+            handler.wfile.write(payload)
+            print(f"❓ Sin grabación para {handler.command} {urlsplit(handler.path).path} ({key[:12]})")
+            return
+
+        handler.send_response(entry["status"])
+        handler.send_header("Content-Type", entry["content_type"])
+        streaming = _is_stream(entry["content_type"], entry["path"])
+        if streaming:
+            handler.send_header("Transfer-Encoding", "chunked")
+        else:
+            payload = "".join(text for _, text in entry["chunks"]).encode("utf-8")
+            handler.send_header("Content-Length", str(len(payload)))
+        start = time.perf_counter()
+        if not streaming:
+            self._sleep_until(start, entry["latency"])
+            handler.end_headers()
+            handler.wfile.write(payload)
+        else:
+            handler.end_headers()
+            for offset, text in entry["chunks"]:
+                self._sleep_until(start, offset)
+                _write_chunk(handler, text.encode("utf-8"))
+            _write_chunk(handler, b"")
+        with self.lock:
+            self.stats["served"] += 1
+
+    def _sleep_until(self, start: float, offset: float):
+        remaining = offset * self.latency_scale - (time.perf_counter() - start)
+        if remaining > 0:
+            time.sleep(remaining)
+
+
+def _is_stream(content_type: str, path: str) -> bool:
+    # SSE, o el array JSON en streaming de google.generativeai (transport="rest", stream=True)
+    return "text/event-stream" in content_type or ":streamGenerateContent" in path
+
+
+def _write_chunk(handler: BaseHTTPRequestHandler, data: bytes):
+    # Transfer-Encoding: chunked, para que los clientes reciban cada trozo en cuanto llega
+    handler.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+    handler.wfile.flush()
+
+
+class _ProxyHandler(BaseHTTPRequestHandler):
+    server_version = "ReplayProxy/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self._handle()
+
+    def do_GET(self):
+        self._handle()
+
+    def _handle(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        proxy = self.server.proxy
+        with proxy.lock:
+            proxy.stats["requests"] += 1
+        if proxy.mode == "record":
+            proxy.record(self, body)
+        else:
+            proxy.replay(self, body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(proxy: ReplayProxy, host: str = "127.0.0.1", port: int = 8089) -> ThreadingHTTPServer:
+    """
+    Starts the proxy on a background thread and returns the server (call shutdown() to stop it).
+    """
+    server = ThreadingHTTPServer((host, port), _ProxyHandler)
+    server.daemon_threads = True
+    server.proxy = proxy
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record/replay proxy for the LLM endpoints.")
+    parser.add_argument("mode", choices=["record", "replay"])
+    parser.add_argument("archive", help="JSONL archive with the recorded request/response pairs")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-scale", type=float, default=1.0,
+                        help="Replay latency multiplier (1 = original, 0 = no delay)")
+    parser.add_argument("--gemini-upstream", default=GEMINI_UPSTREAM)
+    parser.add_argument("--openai-upstream", default=OPENAI_UPSTREAM,
+                        help="OpenAI-compatible server (LM Studio / Ollama)")
+    args = parser.parse_args()
+
+    proxy = ReplayProxy(args.mode, args.archive, latency_scale=args.latency_scale,
+                        gemini_upstream=args.gemini_upstream, openai_upstream=args.openai_upstream)
+    server = serve(proxy, args.host, args.port)
+    print(f"🛰️  Proxy en modo {args.mode} escuchando en http://{args.host}:{args.port}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
+        print(f"\n📊 {proxy.stats}")
@@ -0,0 +1,172 @@
+"""
+Content-addressed on-disk cache for deterministic LLM calls.
+
+The Ollama paths run at temperature 0, so an identical request (model, messages, max_tokens, ...)
+always asks the server for the same answer. With the cache enabled the full request is hashed
+(sha256 of its canonical JSON) and the response (text + usage) is stored under
+`<cache dir>/<h[:2]>/<h>.json`; re-running an analysis or extending a sweep then costs no
+inference time for the requests already answered.
+
+Configuration (environment variables, opt-in):
+    LLM_CACHE_MODE     off (default) | readwrite | readonly
+                       (readonly: hermetic replay, serve hits, never write, and raise on a miss of a
+                       cacheable request instead of calling the provider)
+    LLM_CACHE_DIR      cache directory (default: <repo>/.llm_cache)
+    LLM_CACHE_MAX_MB   size bound; least recently used entries are evicted first (default: 512)
+
+Example:
+    data = cached_call(payload, lambda: session.post(url, json=payload).json())
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+MODES = ("off", "readwrite", "readonly")
+
+
+class CacheMiss(RuntimeError):
+    """
+    A cacheable request is not in the cache and LLM_CACHE_MODE=readonly. Not a ValueError on
+    purpose: the stepwise loops treat ValueError as an invalid move and would score the run 'fail'.
+    """
+
+
+class ResponseCache:
+    def __init__(self, directory: str, max_bytes: int = 512 * 1024 * 1024, mode: str = "readwrite"):
+        if mode not in MODES:
+            raise ValueError(f"❌ Unknown cache mode '{mode}'. Options: {MODES}")
+        self.directory = directory
+        self.max_bytes = int(max_bytes)
+        self.mode = mode
+        self.hits = 0
+        self.misses = 0
+        self._size = None
+        self._lock = threading.Lock()
+
+    #####KEYS#####
+    @staticmethod
+    def key(request: dict) -> str:
+        canonical = json.dumps(request, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    #####READ / WRITE#####
+    def get(self, request: dict):
+        """
+        Returns the cached response for `request`, or None. A hit refreshes the entry's LRU position.
+        """
+        path = self.path(self.key(request))
+        try:
+            with open(path, encoding="utf-8") as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            with self._lock:
+                self.misses += 1
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+        return entry["response"]
+
+    def put(self, request: dict, response):
+        if self.mode != "readwrite":
+            return
+        key = self.key(request)
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        entry = {"request": request, "response": response, "created_at": time.time()}
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+
+        with self._lock:
+            # Si la clave ya existía, su tamaño anterior deja de contar
+            try:
+                old_size = os.path.getsize(path)
+            except FileNotFoundError:
+                old_size = 0
+            os.replace(tmp_path, path)
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self._entries())
+            else:
+                self._size += os.path.getsize(path) - old_size
+            if self._size > self.max_bytes:
+                self._evict()
+
+    #####EVICTION#####
+    def _entries(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".json"):
+                    full = os.path.join(root, name)
+                    try:
+                        stat = os.stat(full)
+                    except FileNotFoundError:
+                        continue
+                    yield full, stat.st_size, stat.st_mtime
+
+    def _evict(self):
+        """
+        Deletes the least recently used entries until the cache is below 90% of its bound.
+        """
+        entries = sorted(self._entries(), key=lambda e: e[2])
+        total = sum(size for _, size, _ in entries)
+        target = 0.9 * self.max_bytes
+        for full, size, _ in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(full)
+            except FileNotFoundError:
+                pass
+            total -= size
+        self._size = total
+
+
+_cache = None
+
+def get_cache():
+    """
+    Process-wide cache configured from the environment, or None when LLM_CACHE_MODE is off.
+    """
+    global _cache
+    mode = os.getenv("LLM_CACHE_MODE", "off")
+    if mode == "off":
+        return None
+    if _cache is None or _cache.mode != mode:
+        _cache = ResponseCache(
+            os.getenv("LLM_CACHE_DIR", os.path.join(ROOT_DIR, ".llm_cache")),
+            max_bytes=float(os.getenv("LLM_CACHE_MAX_MB", 512)) * 1024 * 1024,
+            mode=mode,
+        )
+    return _cache
+
+
+def cached_call(request: dict, fn):
+    """
+    Returns the cached response of `request` or calls fn() and caches its result.
+    Only deterministic requests (temperature 0) are cached; other requests always call fn().
+    In readonly mode a miss raises CacheMiss instead of calling fn(), so a replay never reaches
+    the provider for a cacheable request.
+    """
+    cache = get_cache()
+    if cache is None or request.get("temperature") != 0:
+        return fn()
+    response = cache.get(request)
+    if response is not None:
+        print(f"💾 Respuesta servida desde caché ({cache.key(request)[:12]})")
+        return response
+    if cache.mode == "readonly":
+        raise CacheMiss(f"❌ No cached response for {cache.key(request)[:12]} and LLM_CACHE_MODE=readonly "
+                         f"(the provider is not called in readonly mode).")
+    response = fn()
+    cache.put(request, response)
+    return response
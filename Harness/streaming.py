@@ -0,0 +1,257 @@
+"""
+Streaming generation helpers with latency metrics.
+
+The blocking calls (`generate_content`, `requests.post`) only return once the whole reasoning
+trace is finished. In streaming mode the chunks are consumed as they arrive:
+
+    gemini_stream_chunks(stream)     chunks of client.models.generate_content_stream(...)
+    openai_sse_chunks(response)      SSE chunks of an OpenAI-compatible endpoint (Ollama / LM Studio)
+                                     requested with "stream": true; DeepSeek-R1 <think> blocks
+                                     are split into thought chunks
+
+Both yield ("thought" | "answer", text) tuples, ("finish", finish_reason) and a final ("usage", usage) tuple.
+`collect_stream` consumes them, prints them as they arrive and measures:
+
+    ttft          time to first token (thought or answer), seconds
+    ttfat         time to first answer token, seconds
+    decode_rate   output tokens / (last token - first token), tokens per second
+
+An `on_chunk(kind, text)` hook can stop the generation early by returning True (see
+moveParser.StreamingMoveValidator); the request is then closed and `result.aborted` is set.
+
+Example:
+    result = stream_gemini(client, model, config, contents)
+    print(result.answer, result.metrics())
+"""
+import json
+import time
+
+from clientPool import timed
+from rateLimiter import get_limiter
+
+THINK_OPEN = "<think>"
+THINK_CLOSE = "</think>"
+
+
+class StreamResult:
+    def __init__(self):
+        self.thought = ""
+        self.answer = ""
+        self.usage = None
+        self.finish_reason = None
+        self.aborted = False
+        self.ttft = None
+        self.ttfat = None
+        self.seconds = None
+        self.first_token_at = None
+        self.last_token_at = None
+        self.chunks = 0
+
+    def output_tokens(self):
+        if self.usage is None:
+            return None
+        if isinstance(self.usage, dict):
+            return self.usage.get("completion_tokens")
+        # Gemini: los tokens de pensamiento también se decodifican
+        return (self.usage.candidates_token_count or 0) + (getattr(self.usage, "thoughts_token_count", None) or 0)
+
+    def decode_rate(self):
+        tokens = self.output_tokens()
+        if not tokens or self.first_token_at is None or self.last_token_at <= self.first_token_at:
+            return None
+        return tokens / (self.last_token_at - self.first_token_at)
+
+    def metrics(self) -> dict:
+        rate = self.decode_rate()
+        return {
+            "ttft": round(self.ttft, 3) if self.ttft is not None else None,
+            "ttfat": round(self.ttfat, 3) if self.ttfat is not None else None,
+            "decode_rate": round(rate, 2) if rate is not None else None,
+            "seconds": round(self.seconds, 3) if self.seconds is not None else None,
+        }
+
+
+#####CHUNK SOURCES#####
+def gemini_stream_chunks(stream):
+    """
+    Chunks of google.genai generate_content_stream (with include_thoughts=True).
+    The usage is yielded with every chunk that carries it, so an aborted stream keeps the last count.
+    """
+    try:
+        for chunk in stream:
+            if chunk.usage_metadata is not None:
+                yield "usage", chunk.usage_metadata
+            if not chunk.candidates:
+                continue
+            if chunk.candidates[0].finish_reason:
+                yield "finish", str(chunk.candidates[0].finish_reason)
+            if chunk.candidates[0].content is None:
+                continue
+            for part in chunk.candidates[0].content.parts or []:
+                if part.text:
+                    yield ("thought" if part.thought else "answer"), part.text
+    finally:
+        # Cerrar la respuesta HTTP si se abandona el stream (early abort)
+        close = getattr(stream, "close", None)
+        if close:
+            close()
+
+
+def generativeai_stream_chunks(response):
+    """
+    Chunks of google.generativeai generate_content(..., stream=True).
+    """
+    for chunk in response:
+        if chunk.usage_metadata:
+            yield "usage", chunk.usage_metadata
+        for candidate in chunk.candidates[:1]:
+            for part in candidate.content.parts:
+                if part.text:
+                    yield ("thought" if getattr(part, "thought", False) else "answer"), part.text
+            if candidate.finish_reason:
+                yield "finish", str(candidate.finish_reason)
+
+
+class _ThinkSplitter:
+    """Splits '<think>...</think>answer' text into thought/answer pieces across chunk boundaries."""
+    def __init__(self):
+        self.in_think = False
+        self.pending = ""
+
+    def feed(self, text: str):
+        text = self.pending + text
+        self.pending = ""
+        pieces = []
+        while text:
+            tag = THINK_CLOSE if self.in_think else THINK_OPEN
+            index = text.find(tag)
+            if index != -1:
+                if index:
+                    pieces.append(("thought" if self.in_think else "answer", text[:index]))
+                text = text[index + len(tag):]
+                self.in_think = not self.in_think
+                continue
+            # Guardar un posible prefijo de etiqueta cortado entre dos chunks
+            keep = next((n for n in range(min(len(tag) - 1, len(text)), 0, -1) if tag.startswith(text[-n:])), 0)
+            emit, self.pending = (text[:-keep], text[-keep:]) if keep else (text, "")
+            if emit:
+                pieces.append(("thought" if self.in_think else "answer", emit))
+            break
+        return pieces
+
+    def flush(self):
+        pending, self.pending = self.pending, ""
+        return [("thought" if self.in_think else "answer", pending)] if pending else []
+
+
+def openai_sse_chunks(response):
+    """
+    Chunks of an OpenAI-compatible chat completion requested with "stream": true and
+    "stream_options": {"include_usage": true}. The usage is yielded as a dict.
+    """
+    splitter = _ThinkSplitter()
+    usage = None
+    for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+        if not line or not line.startswith("data:"):
+            continue
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            break
+        event = json.loads(data)
+        if event.get("usage"):
+            usage = event["usage"]
+        for choice in event.get("choices") or []:
+            delta = choice.get("delta") or {}
+            # Algunos servidores separan el razonamiento en su propio campo
+            reasoning = delta.get("reasoning_content") or delta.get("reasoning")
+            if reasoning:
+                yield "thought", reasoning
+            if delta.get("content"):
+                yield from splitter.feed(delta["content"])
+            if choice.get("finish_reason"):
+                yield "finish", choice["finish_reason"]
+    yield from splitter.flush()
+    yield "usage", usage
+
+
+#####CONSUMER#####
+def collect_stream(chunks, echo: bool = True, start: float = None, on_chunk=None) -> StreamResult:
+    """
+    Consumes a chunk source, printing thoughts and answer as they arrive, and returns a StreamResult.
+    `start` is the time.perf_counter() taken before sending the request (default: now), so that
+    the time to first token includes the server's prefill. If `on_chunk(kind, text)` returns True
+    the stream is abandoned.
+    """
+    result = StreamResult()
+    start = time.perf_counter() if start is None else start
+    current = None
+    for kind, payload in chunks:
+        if kind == "usage":
+            result.usage = payload
+            continue
+        if kind == "finish":
+            result.finish_reason = payload
+            continue
+        if not payload:
+            continue
+        now = time.perf_counter() - start
+        result.chunks += 1
+        if result.ttft is None:
+            result.ttft = now
+            result.first_token_at = now
+        if kind == "answer" and result.ttfat is None:
+            result.ttfat = now
+        result.last_token_at = now
+        if kind == "thought":
+            result.thought += payload
+        else:
+            result.answer += payload
+        if echo:
+            if kind != current:
+                print(("\nThought summary:" if kind == "thought" else "\nAnswer:"), flush=True)
+                current = kind
+            print(payload, end="", flush=True)
+        if on_chunk is not None and on_chunk(kind, payload):
+            result.aborted = True
+            close = getattr(chunks, "close", None)
+            if close:
+                close()
+            if echo:
+                print("\n🛑 Generación cortada: movimiento inválido detectado en el stream", flush=True)
+            break
+    result.seconds = time.perf_counter() - start
+    if echo:
+        m = result.metrics()
+        print(f"\n⏱️  TTFT = {m['ttft']} s | primera respuesta = {m['ttfat']} s | decodificación = {m['decode_rate']} tokens/s\n")
+    return result
+
+
+def stream_gemini(client, model: str, config, contents: str, on_chunk=None) -> StreamResult:
+    """
+    Streams one google.genai generation under the shared rate limiter.
+    """
+    def generate():
+        start = time.perf_counter()
+        stream = client.models.generate_content_stream(model=model, config=config, contents=contents)
+        return collect_stream(gemini_stream_chunks(stream), start=start, on_chunk=on_chunk)
+
+    return get_limiter("gemini").call(timed("gemini", generate), usage_of=lambda r: r.usage)
+
+
+#####CSV#####
+def add_stream_columns(headers: list, row: list, ttft: list, ttfat: list, decode_rate: list,
+                       tokens_saved: int = 0, seconds_saved: float = 0.0, max_iters: int = 10) -> tuple[list, list]:
+    """
+    Inserts the per-iteration latency columns and the early-abort savings before 'results'
+    in a stepwise CSV header/row pair.
+    """
+    ttft = ttft + [''] * (max_iters - len(ttft))
+    ttfat = ttfat + [''] * (max_iters - len(ttfat))
+    decode_rate = decode_rate + [''] * (max_iters - len(decode_rate))
+    headers = headers[:-1] + \
+              [f"ttft_iter{i+1}" for i in range(max_iters)] + \
+              [f"ttfat_iter{i+1}" for i in range(max_iters)] + \
+              [f"decode_rate_iter{i+1}" for i in range(max_iters)] + \
+              ['early_abort_tokens_saved', 'early_abort_seconds_saved'] + headers[-1:]
+    row = row[:-1] + ttft + ttfat + decode_rate + [tokens_saved, seconds_saved] + row[-1:]
+    return headers, row
@@ -0,0 +1,326 @@
+"""
+Resumable parameter sweeps over (puzzle, N, p/k, model) grids.
+
+A sweep is described declaratively (a dict or a JSON file, see Harness/sweeps/*.json):
+
+    {
+        "name": "hanoi_steps_main",
+        "puzzle": "hanoi_steps",
+        "trials": 10,
+        "grid": {"N": [5, 6], "p": [30], "model": ["gemini-2.5-pro-preview-06-05"]},
+        "configs": [{"N": 8, "p": 100}]
+    }
+
+`grid` is expanded as a cartesian product and `configs` adds explicit cells (both optional,
+at least one required). Every (config, trial) pair is a job. Jobs are fanned out over a
+process pool and each finished job is appended to a JSONL manifest next to the puzzle results.
+When the sweep is started again, cells that already have `trials` finished runs, counting both
+the manifest and the rows already present in the puzzle's results CSV, are skipped, so a sweep
+that died halfway (crash, quota exhaustion, Ctrl-C) only runs the missing trials.
+
+Puzzles with an exact solvability oracle (ORACLES) can skip cells without a solution before
+spending API calls with `"skip_unsolvable": true`; otherwise those cells still run (the baseline
+reproduces the paper's unsolvable instances) and the dry run labels them.
+"""
+import argparse
+import csv
+import importlib
+import inspect
+import itertools
+import json
+import os
+import re
+import string
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+from checkpoint import RESUMED_SUFFIX
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+# puzzle -> (directory, module, function, results csv, pattern of the 'Name' column)
+PUZZLES = {
+    "hanoi_steps": ("Hanoi_Towers", "HanoiTowersSolverSteps", "run_steps_experiment",
+                    "results/hanoi_token_usage.csv", "N{N}_p{p}_{timestamp}"),
+    "hanoi_steps_pegs": ("Hanoi_Towers", "HanoiTowersSolverSteps", "run_steps_experiment",
+                         "results/hanoi_token_usage_pegs.csv", "N{N}_p{p}_pegs{pegs}_{timestamp}"),
+    "hanoi_steps_deepseek": ("Hanoi_Towers", "DeepSeekHanoiTowersSolverSteps", "run_steps_experiment",
+                             "results/Deep_Seek_Steps_hanoi_token_usage.csv", "N{N}_p{p}_{timestamp}"),
+    "hanoi_conver": ("Hanoi_Towers", "HanoiTowersSolverConver", "run_hanoi_experiment",
+                     "results/hanoi_token_usage_conver.csv", "N{N}_p{p}_{timestamp}"),
+    "blocks_steps": ("BlocksWorld", "BlocksWorldSolverSteps", "run_steps_experiment",
+                     "results/blocks_world_steps.csv", "N{N}_p{p}_{timestamp}"),
+    "blocks_steps_tiers": ("BlocksWorld", "BlocksWorldSolverSteps", "run_steps_experiment",
+                           "results/blocks_world_steps.csv", "N{N}_p{p}_{tier}_{timestamp}_{instance}"),
+    "checker_steps": ("CheckerJumping", "CheckerJumpingSteps", "run_steps_experiment",
+                      "results/checker_jumping_steps.csv", "N{N}_p{p}_{timestamp}"),
+    "river_baseline": ("RiverCrossing", "BaseLineRiverCrossing", "run_baseline_experiment",
+                       "results/river_crossing_baseline.csv", "N{N}_k{k}_{timestamp}"),
+    "river_steps": ("RiverCrossing", "RiverCrossingSolverSteps", "run_steps_experiment",
+                    "results/river_crossing_steps.csv", "N{N}_k{k}_p{p}_{timestamp}"),
+}
+
+# puzzle -> (directory, module, function) that says whether a config has a solution
+ORACLES = {
+    "river_baseline": ("RiverCrossing", "riverSolver", "is_solvable"),
+    "river_steps": ("RiverCrossing", "riverSolver", "is_solvable"),
+}
+
+
+#####SWEEP SPEC#####
+def load_spec(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def expand_configs(spec: dict) -> list[dict]:
+    """
+    Expands `grid` (cartesian product) and `configs` (explicit cells) into a list of
+    unique parameter dicts, preserving declaration order.
+    """
+    if spec.get("puzzle") not in PUZZLES:
+        raise ValueError(f"❌ Unknown puzzle '{spec.get('puzzle')}'. Options: {sorted(PUZZLES)}")
+
+    configs = []
+    grid = spec.get("grid") or {}
+    if grid:
+        keys = list(grid)
+        for values in itertools.product(*(grid[key] for key in keys)):
+            configs.append(dict(zip(keys, values)))
+    configs.extend(dict(c) for c in spec.get("configs") or [])
+    if not configs:
+        raise ValueError("❌ The sweep spec needs a 'grid' or a 'configs' list.")
+
+    # Validar parámetros contra la firma de la función del puzzle
+    directory, module_name, function_name, _, _ = PUZZLES[spec["puzzle"]]
+    accepted = set(inspect.signature(_load_function(directory, module_name, function_name)).parameters)
+    unique = []
+    for config in configs:
+        unknown = set(config) - accepted
+        if unknown:
+            raise ValueError(f"❌ {module_name}.{function_name} does not accept {sorted(unknown)}")
+        if config not in unique:
+            unique.append(config)
+    return unique
+
+
+def config_key(config: dict) -> str:
+    return json.dumps(config, sort_keys=True)
+
+
+def is_solvable(puzzle: str, config: dict):
+    """
+    Oracle verdict for a config: True / False, or None if the puzzle has no oracle.
+    """
+    if puzzle not in ORACLES:
+        return None
+    oracle = _load_function(*ORACLES[puzzle])
+    accepted = inspect.signature(oracle).parameters
+    return oracle(**{key: value for key, value in config.items() if key in accepted})
+
+
+#####MANIFEST#####
+def manifest_path(spec: dict) -> str:
+    directory = PUZZLES[spec["puzzle"]][0]
+    return spec.get("manifest") or os.path.join(ROOT_DIR, directory, "results", f"sweep_{spec['name']}.jsonl")
+
+
+def read_manifest(path: str) -> list[dict]:
+    if not os.path.exists(path):
+        return []
+    records = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                # Última línea truncada por un corte abrupto: se ignora
+                continue
+    return records
+
+
+def append_manifest(path: str, record: dict):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a") as f:
+        f.write(json.dumps(record) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+# Campos de los nombres que no vienen de la config
+_NAME_FIELDS = {"timestamp": r"\d{8}_\d{6}", "instance": r"\d+x\d+-\d+"}
+
+
+def _name_pattern(pattern: str, config: dict) -> re.Pattern:
+    """
+    Regex for the whole 'Name' of a run of this cell: the config fields of `pattern` are filled in,
+    {timestamp} / {instance} match any value, and the name may end in a collision suffix (_2, _3,
+    ... from Checkpoint.start) and in RESUMED_SUFFIX. Raises KeyError if the config lacks a field.
+    Matching the full name keeps e.g. N5_p5_ from also counting the N5_p5_easy_... tier rows or the
+    N5_p5_pegs4_... rows.
+    """
+    regex = []
+    for literal, field, _, _ in string.Formatter().parse(pattern):
+        regex.append(re.escape(literal))
+        if field is not None:
+            regex.append(_NAME_FIELDS[field] if field in _NAME_FIELDS else re.escape(str(config[field])))
+    # Checkpoint.start añade _2, _3, ... si dos ejecuciones empiezan en el mismo segundo
+    return re.compile("".join(regex) + rf"(?:_\d+)?(?:{re.escape(RESUMED_SUFFIX)})?$")
+
+
+def _csv_names(spec: dict, config: dict) -> set:
+    """
+    Names of the runs of this cell already present in the puzzle results CSV.
+    Only used for cells that run with the puzzle's default model, since the CSV does not store it.
+    """
+    directory, module_name, function_name, csv_rel, pattern = PUZZLES[spec["puzzle"]]
+    if "model" in config:
+        default = inspect.signature(_load_function(directory, module_name, function_name)).parameters["model"].default
+        if config["model"] != default:
+            return set()
+    csv_path = os.path.join(ROOT_DIR, directory, csv_rel)
+    if not os.path.exists(csv_path):
+        return set()
+    try:
+        name_pattern = _name_pattern(pattern, config)
+    except KeyError:
+        return set()
+    with open(csv_path, newline="") as f:
+        return {row["Name"] for row in csv.DictReader(f) if name_pattern.match(row.get("Name", ""))}
+
+
+def pending_jobs(spec: dict) -> list[tuple[dict, int]]:
+    """
+    Returns the (config, trial) jobs that still have to run.
+    """
+    trials = int(spec.get("trials", 1))
+    # Por celda: nombres de las filas terminadas y número de ejecuciones sin nombre (runners que no
+    # lo devolvían; los manifiestos antiguos guardaban entonces la clave sintética '<config>#<trial>')
+    done, anonymous = {}, {}
+    for record in read_manifest(manifest_path(spec)):
+        key = config_key(record["config"])
+        if record.get("name") and not record["name"].startswith(f"{key}#"):
+            done.setdefault(key, set()).add(record["name"])
+        else:
+            anonymous[key] = anonymous.get(key, 0) + 1
+
+    jobs = []
+    for config in expand_configs(spec):
+        if spec.get("skip_unsolvable") and is_solvable(spec["puzzle"], config) is False:
+            continue
+        names = done.get(config_key(config), set())
+        finished = len(names) + anonymous.get(config_key(config), 0)
+        if spec.get("count_existing_csv", True):
+            # Una ejecución sin nombre puede estar también en el CSV: se cuenta una sola vez
+            finished = max(finished, len(names | _csv_names(spec, config)))
+        for trial in range(finished, trials):
+            jobs.append((config, trial))
+    return jobs
+
+
+#####WORKER#####
+def _load_function(directory: str, module_name: str, function_name: str):
+    puzzle_dir = os.path.join(ROOT_DIR, directory)
+    if puzzle_dir not in sys.path:
+        sys.path.insert(0, puzzle_dir)
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+def _run_job(puzzle: str, config: dict) -> dict:
+    directory, module_name, function_name, _, _ = PUZZLES[puzzle]
+    # Los scripts escriben en rutas relativas (results/...)
+    os.chdir(os.path.join(ROOT_DIR, directory))
+    function = _load_function(directory, module_name, function_name)
+    return function(**config) or {}
+
+
+#####SWEEP#####
+def run_sweep(spec: dict, workers: int = 2, dry_run: bool = False) -> dict:
+    """
+    Runs every pending job of the sweep and returns a summary with the number of
+    jobs that were skipped, finished and failed.
+    """
+    path = manifest_path(spec)
+    configs = expand_configs(spec)
+    trials = int(spec.get("trials", 1))
+    unsolvable = [c for c in configs if is_solvable(spec["puzzle"], c) is False]
+    total = len(configs) * trials
+    jobs = pending_jobs(spec)
+    print(f"🧮 Barrido '{spec['name']}': {total} trabajos, {total - len(jobs)} ya completados u omitidos, {len(jobs)} pendientes")
+    print(f"📒 Manifiesto: {path}")
+    if unsolvable:
+        action = "omitidas" if spec.get("skip_unsolvable") else "se ejecutan igualmente"
+        print(f"🚫 {len(unsolvable)} configuraciones sin solución ({action}): {unsolvable}")
+
+    summary = {"skipped": total - len(jobs), "finished": 0, "failed": 0,
+               "unsolvable": len(unsolvable) * trials if spec.get("skip_unsolvable") else 0}
+    if dry_run or not jobs:
+        for config, trial in jobs:
+            label = " (sin solución)" if config in unsolvable else ""
+            print(f"   • {config} prueba {trial + 1}{label}")
+        return summary
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(_run_job, spec["puzzle"], config): (config, trial) for config, trial in jobs}
+        for future in as_completed(futures):
+            config, trial = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                summary["failed"] += 1
+                print(f"⚠️ Falló {config} prueba {trial + 1}: {e}")
+                continue
+            summary["finished"] += 1
+            append_manifest(path, {
+                "puzzle": spec["puzzle"],
+                "config": config,
+                "trial": trial,
+                "name": result.get("name"),
+                "results": result.get("results"),
+                "solvable": is_solvable(spec["puzzle"], config),
+                "finished_at": datetime.now().isoformat(timespec="seconds"),
+            })
+            print(f"✅ {config} prueba {trial + 1} -> {result.get('results')}")
+
+    print(f"\n📊 Terminados: {summary['finished']} | Fallidos: {summary['failed']} | Omitidos: {summary['skipped']}")
+    return summary
+
+
+def _self_check():
+    """Name patterns of _csv_names against the names the runners write."""
+    cases = [
+        ("blocks_steps", {"N": 5, "p": 30}, "N5_p30_20250101_120000", True),
+        ("blocks_steps", {"N": 5, "p": 30}, "N5_p30_20250101_120000_2", True),
+        ("blocks_steps", {"N": 5, "p": 30}, "N5_p30_20250101_120000_2_resumed", True),
+        ("blocks_steps", {"N": 5, "p": 30}, "N5_p30_20250101_120000_resumed", True),
+        ("blocks_steps", {"N": 5, "p": 30}, "N5_p300_20250101_120000", False),
+        ("blocks_steps", {"N": 5, "p": 30}, "N5_p30_easy_20250101_120000_5x3-12", False),
+        ("blocks_steps_tiers", {"N": 5, "p": 30, "tier": "easy"}, "N5_p30_easy_20250101_120000_5x3-12_3", True),
+        ("blocks_steps_tiers", {"N": 5, "p": 30, "tier": "hard"}, "N5_p30_easy_20250101_120000_5x3-12", False),
+        ("hanoi_steps", {"N": 5, "p": 30}, "N5_p30_pegs4_20250101_120000", False),
+        ("hanoi_steps_pegs", {"N": 5, "p": 30, "pegs": 4}, "N5_p30_pegs4_20250101_120000", True),
+        ("river_steps", {"N": 3, "k": 2, "p": 5}, "N3_k2_p5_20250101_120000_resumed", True),
+        ("river_baseline", {"N": 3, "k": 2}, "N3_k2_p5_20250101_120000", False),
+    ]
+    for puzzle, config, name, expected in cases:
+        assert bool(_name_pattern(PUZZLES[puzzle][4], config).match(name)) == expected, (puzzle, name)
+    print(f"✅ {len(cases)} nombres de ejecución comprobados")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a resumable parameter sweep.")
+    parser.add_argument("spec", nargs="?", help="Path to the JSON sweep spec")
+    parser.add_argument("--self-check", action="store_true", help="Check the run-name patterns and exit")
+    parser.add_argument("--workers", type=int, default=2, help="Number of worker processes")
+    parser.add_argument("--dry-run", action="store_true", help="Only list the pending jobs")
+    args = parser.parse_args()
+    if args.self_check:
+        _self_check()
+        sys.exit(0)
+    if not args.spec:
+        parser.error("the spec is required (or use --self-check)")
+    run_sweep(load_spec(args.spec), workers=args.workers, dry_run=args.dry_run)
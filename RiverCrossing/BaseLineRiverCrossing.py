@@ -1,14 +1,21 @@
 import os
-import re
-import ast
 from typing import List
 import google.generativeai as genai
 from RiverCrossingViewer import RiverCrossingVisualizer
-import pandas as pd
 from datetime import datetime
+import time
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Harness"))
+from rateLimiter import get_limiter
+from clientPool import generativeai_options, get_generative_model, timed
+from moveParser import StreamingMoveValidator, extract_move_list
+from streaming import collect_stream, generativeai_stream_chunks
+from movementValidator import RiverCrossingChecker
+from riverSolver import min_trips
+from resultsStore import BASELINE_TOKENS_CSV, TOKENS_HEADERS, append_record
 
 # CONFIGURA TU API KEY
-genai.configure(api_key=os.getenv("GEMINI_API_KEY_HANOI"))
+genai.configure(api_key=os.getenv("GEMINI_API_KEY_HANOI"), **generativeai_options())
 
 
 def build_river_crossing_prompt(N: int, k: int) -> str:
@@ -36,12 +43,15 @@ def call_gemini_model(
     prompt_text: str,
     N: int,
     k: int,
-    csv_path: str = "tokens_river_baseline.csv",
-    model_name: str = "gemini-2.5-pro-preview-06-05"
-) -> tuple[str, object]:
+    csv_path: str = BASELINE_TOKENS_CSV,
+    model_name: str = "gemini-2.5-pro-preview-06-05",
+    stream: bool = False,
+    on_chunk=None
+) -> tuple[str, object, dict]:
     """
     Call Gemini model with the exact system and user prompts specified.
-    Returns both the response text and usage metadata.
+    Returns the response text, the usage metadata and the streaming latency metrics
+    (empty unless stream=True). With stream=True `on_chunk` can abort the generation.
     """
     # System prompt - exact copy as requested
     system_instruction = (
@@ -55,118 +65,74 @@ def call_gemini_model(
         "IMPORTANT: Your response must have the correct format as this is vital for the evaluation."
     )
     
-    model = genai.GenerativeModel(
+    model = get_generative_model(
         model_name=model_name,
         system_instruction=system_instruction
     )
     
-    response = model.generate_content(prompt_text)
-    usage = response.usage_metadata
+    metrics = {}
+    if stream:
+        def generate():
+            start = time.perf_counter()
+            response = model.generate_content(prompt_text, stream=True)
+            return collect_stream(generativeai_stream_chunks(response), start=start, on_chunk=on_chunk)
+
+        result = get_limiter("gemini").call(timed("gemini", generate), usage_of=lambda r: r.usage)
+        # Si se corta la generación puede no haber llegado el recuento de tokens
+        usage = result.usage or genai.protos.GenerateContentResponse.UsageMetadata()
+        text = result.answer
+        metrics = result.metrics()
+    else:
+        response = get_limiter("gemini").call(timed("gemini", model.generate_content), prompt_text)
+        usage = response.usage_metadata
+        text = response.text
 
     # Mostrar en pantalla
     print(f"Prompt:  {usage.prompt_token_count} tokens")
     print(f"Salida:  {usage.candidates_token_count} tokens")
     print(f"Total:   {usage.total_token_count} tokens")
 
-    # Preparar datos CSV
+    # Guardar la ejecución como una fila nueva (resultsStore: solo se añade al final)
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    col_name = f"N{N}_k{k}_{timestamp}"
-    rows = ["tokens_prompt", "tokens_candidates", "tokens_thoughts", "tokens_total", "results"]
-    values = [
-        usage.prompt_token_count,
-        usage.candidates_token_count,
-        getattr(usage, "thoughts_token_count", 0),
-        usage.total_token_count,
-        "baseline"  # Mark as baseline experiment
-    ]
-
-    if os.path.exists(csv_path):
-        df = pd.read_csv(csv_path, index_col=0)
-        # Ensure all rows exist
-        df = df.reindex(index=rows)
-    else:
-        df = pd.DataFrame(index=rows)
-
-    df[col_name] = values
-    df.to_csv(csv_path)
+    append_record(csv_path, {
+        "Name": f"N{N}_k{k}_{timestamp}",
+        "model": model_name,
+        "N": N,
+        "k": k,
+        "tokens_prompt": usage.prompt_token_count,
+        "tokens_candidates": usage.candidates_token_count,
+        "tokens_thoughts": getattr(usage, "thoughts_token_count", 0),
+        "tokens_total": usage.total_token_count,
+        "results": "baseline",  # Mark as baseline experiment
+    }, TOKENS_HEADERS)
 
-    return response.text, usage
+    return text, usage, metrics
 
 
 def extract_solution_from_text(text: str) -> List[List[str]]:
     """
-    Extrae la lista de movimientos de un texto usando múltiples estrategias robustas.
-    Busca patrones como 'moves=[...]' o simplemente listas aisladas.
+    Extrae la lista de movimientos de un texto con un único recorrido por profundidad de corchetes
+    (moveParser.extract_move_list): primero el bloque 'moves = [...]', si no la última lista de
+    listas bien formada. Tiempo lineal y sin eval.
     """
-    
-    # Estrategia 1: Buscar 'moves = [...]' explícitamente
-    moves_pattern = re.search(r'moves\s*=\s*(\[.*?\])', text, re.DOTALL | re.IGNORECASE)
-    if moves_pattern:
-        try:
-            moves_text = moves_pattern.group(1)
-            # Limpiar comentarios y caracteres extraños
-            cleaned_text = re.sub(r'#.*', '', moves_text)  # Remover comentarios
-            cleaned_text = re.sub(r'[^\w\[\],"\'_\s]', '', cleaned_text)  # Solo chars válidos
-            
-            result = ast.literal_eval(cleaned_text)
-            if isinstance(result, list) and all(isinstance(m, list) for m in result):
-                return result
-        except Exception:
-            pass  # Continuar con la siguiente estrategia
-    
-    # Estrategia 2: Buscar la última lista completa en el texto
-    # Encuentra todos los bloques que empiecen con [ y terminen con ]
-    list_blocks = re.findall(r'\[(?:[^\[\]]*(?:\[[^\[\]]*\][^\[\]]*)*)*\]', text)
-    
-    for block in reversed(list_blocks):  # Empezar por el último (más probable)
-        try:
-            # Limpiar el bloque
-            cleaned_block = re.sub(r'[^a-zA-Z0-9_\[\]\",\'\s]', '', block)
-            result = ast.literal_eval(cleaned_block)
-            
-            # Verificar que sea una lista de listas válida para movimientos
-            if (isinstance(result, list) and 
-                len(result) > 0 and 
-                all(isinstance(m, list) for m in result) and
-                all(len(m) > 0 for m in result) and
-                all(isinstance(item, str) for m in result for item in m)):
-                return result
-        except Exception:
-            continue
-    
-    # Estrategia 3: Buscar entre el primer [ y último ] (método original mejorado)
-    start = text.find('[')
-    end = text.rfind(']')
-    if start != -1 and end != -1 and end > start:
-        try:
-            raw_block = text[start:end + 1]
-            # Limpieza más agresiva
-            cleaned_block = re.sub(r'[^a-zA-Z0-9_\[\]\",\'\s]', '', raw_block)
-            
-            result = ast.literal_eval(cleaned_block)
-            if isinstance(result, list) and all(isinstance(m, list) for m in result):
-                return result
-        except Exception:
-            pass
-    
-    # Si nada funciona, lanzar error
-    raise ValueError("❌ No se pudo extraer una lista válida de movimientos del texto")
+    return extract_move_list(text, marker="moves")
 
 
 def save_results_to_csv(N: int, k: int, success: bool, usage_metadata=None, 
-                       csv_path: str = "results/river_crossing_baseline.csv"):
+                       csv_path: str = "results/river_crossing_baseline.csv", extra: dict = None,
+                       name: str = None):
     """
     Guarda los resultados del experimento en un archivo CSV en la carpeta results,
-    siguiendo el mismo formato que los otros puzzles.
+    siguiendo el mismo formato que los otros puzzles. `extra` añade columnas antes de 'results';
+    `name` fija la columna Name (por defecto N{N}_k{k}_<timestamp>).
     """
     # Crear directorio results si no existe
     os.makedirs("results", exist_ok=True)
     
-    # Timestamp para el experimento
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    
     # Nombre único para esta ejecución
-    name = f"N{N}_k{k}_{timestamp}"
+    if name is None:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        name = f"N{N}_k{k}_{timestamp}"
     
     # Resultado (ok/fail)
     result = "ok" if success else "fail"
@@ -179,34 +145,39 @@ def save_results_to_csv(N: int, k: int, success: bool, usage_metadata=None,
         "tokens_prompt": usage_metadata.prompt_token_count if usage_metadata else 0,
         "tokens_candidates": usage_metadata.candidates_token_count if usage_metadata else 0,
         "tokens_total": usage_metadata.total_token_count if usage_metadata else 0,
+        **(extra or {}),
         "results": result
     }
     
-    # Cargar CSV existente o crear uno nuevo
-    if os.path.exists(csv_path):
-        df = pd.read_csv(csv_path)
-        # Agregar la nueva fila
-        df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
-    else:
-        # Crear nuevo DataFrame
-        df = pd.DataFrame([new_row])
-    
-    # Guardar el CSV
-    df.to_csv(csv_path, index=False)
-    
+    # Añadir la fila al final del CSV (sin releerlo ni reescribirlo)
+    append_record(csv_path, new_row)
+
     print(f"📁 Resultados guardados en: {csv_path}")
     return csv_path
 
 
-if __name__ == "__main__":
-    # Configuración del experimento baseline
-    N = 8  # Number of jealous couples
-    k = 3  # Capacity of the boat
-    
+def _apply_boat_move(checker: RiverCrossingChecker, move: list) -> RiverCrossingChecker:
+    # Adaptador para StreamingMoveValidator: un viaje de la barca, ValueError si es ilegal
+    if not checker.step(move):
+        raise ValueError(f"elementos conflictivos: {checker.failed_people}")
+    return checker
+
+
+def run_baseline_experiment(N: int = 8, k: int = 3, model: str = "gemini-2.5-pro-preview-06-05",
+                            stream: bool = False) -> dict:
+    """
+    Runs one baseline experiment (no solvability check) and stores its results.
+    Returns a small summary so several runs can be collected by asyncRunner.
+    With stream=True every boat move is validated as it arrives and the generation is cut at the
+    first illegal one; the latency metrics go to results/river_crossing_baseline_stream.csv.
+    """
     print("🧪 BASELINE RIVER CROSSING EXPERIMENT")
     print("=" * 50)
     print(f"⚠️  WARNING: Using potentially unsolvable configuration (N={N}, k={k})")
     print("   This matches the original paper conditions.")
+    # El oráculo exacto solo etiqueta la configuración; el prompt se envía igualmente
+    trips = min_trips(N, k)
+    print(f"   Exact oracle: {'solvable in ' + str(trips) + ' trips' if trips else 'NO solution'}")
     print("=" * 50)
     
     # Paso 1: Construir el prompt para N actores/agentes y k capacidad del bote
@@ -216,7 +187,14 @@ if __name__ == "__main__":
 
     # Paso 2: Llamar al modelo Gemini con ese prompt
     print("🤖 Llamando al modelo Gemini...")
-    respuesta, usage_metadata = call_gemini_model(prompt, N, k)
+    validator = None
+    if stream:
+        checker = RiverCrossingChecker(N, k, [])
+        checker.reset()
+        # Sin solución no hay número de viajes esperado y no se estima el ahorro
+        validator = StreamingMoveValidator(checker, _apply_boat_move, expected_moves=trips, marker="moves")
+    respuesta, usage_metadata, metrics = call_gemini_model(prompt, N, k, model_name=model,
+                                                           stream=stream, on_chunk=validator)
     print(f"📋 Respuesta del modelo:\n{respuesta}\n")
 
     # Variables para guardar resultados
@@ -226,6 +204,8 @@ if __name__ == "__main__":
 
     # Paso 3: Intentar extraer la solución (lista de movimientos) del texto generado
     try:
+        if validator is not None and validator.error:
+            raise ValueError(f"{validator.error} (stream cortado)")
         moves = extract_solution_from_text(respuesta)
         print("✅ Movimientos extraídos:")
         print(moves)
@@ -254,10 +234,24 @@ if __name__ == "__main__":
         print(f"❌ Error inesperado: {e}")
         error_message = f"Error inesperado: {e}"
     
-    # Guardar resultados en CSV
-    save_results_to_csv(N, k, success, usage_metadata)
+    # Guardar resultados en CSV (el mismo nombre se devuelve para el manifiesto de sweepEngine)
+    name = f"N{N}_k{k}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    if stream:
+        save_results_to_csv(N, k, success, usage_metadata, csv_path="results/river_crossing_baseline_stream.csv",
+                            extra={**metrics, "early_abort": bool(validator.error)}, name=name)
+    else:
+        save_results_to_csv(N, k, success, usage_metadata, name=name)
     
     print("\n" + "=" * 50)
     print("📊 Experimento baseline completado.")
-    print("   Los resultados se han guardado en tokens_river_baseline.csv")
+    print(f"   Los resultados se han guardado en {BASELINE_TOKENS_CSV}")
     print("   y en results/river_crossing_baseline.csv")
+    return {"name": name, "N": N, "k": k, "results": "ok" if success else "fail", "error": error_message,
+            "solvable": trips is not None, "min_trips": trips}
+
+
+if __name__ == "__main__":
+    # Configuración del experimento baseline
+    N = 8  # Number of jealous couples
+    k = 3  # Capacity of the boat
+    run_baseline_experiment(N=N, k=k)
@@ -1,11 +1,17 @@
 import os
-import re
 from typing import List
 import requests
 from datetime import datetime
-import pandas as pd
 from types import SimpleNamespace  # para mimetizar usage con atributos
 from RiverCrossingViewer import RiverCrossingVisualizer
+from riverSolver import check_solvable
+from resultsStore import TOKENS_CSV, TOKENS_HEADERS, append_record
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Harness"))
+from rateLimiter import get_limiter
+from clientPool import get_http_session, timed
+from responseCache import cached_call
+from moveParser import extract_move_list
 
 # =========================
 # Ollama (OpenAI-compatible) config
@@ -18,30 +24,18 @@ def build_river_crossing_prompt(N: int, k: int) -> str:
     """
     Build the river-crossing statement only when the instance is solvable.
 
-    Solvability rules for the symmetric “N actors and N agents” variant
-    (same logic as the missionaries-and-cannibals puzzle):
+    Solvability is decided by the exact oracle in riverSolver.py (BFS over the safe
+    couple / lone actor / lone agent counts). For the symmetric “N actors and N agents”
+    variant it reproduces the known rules:
 
         • k == 1  →  impossible (no one can bring the boat back).
-        • k == 2  →  solvable only if N ≤ 3  (upper bound 2k-1).
-        • k == 3  →  solvable only if N ≤ 5  (upper bound 2k-1).
+        • k == 2  →  solvable only if N ≤ 3.
+        • k == 3  →  solvable only if N ≤ 5.
         • k ≥ 4   →  always solvable for any N ≥ 1.
 
-    A ValueError is raised for any (N, k) pair that violates these rules.
+    A ValueError is raised for any (N, k) pair without a solution.
     """
-    if k < 1:
-        raise ValueError("❌ Boat capacity k must be at least 1.")
-    if N < 1:
-        raise ValueError("❌ There must be at least one actor and one agent (N ≥ 1).")
-
-    # Unsatisfiable cases
-    if k == 1:
-        raise ValueError("❌ A single-seat boat makes the puzzle impossible.")
-    if k in (2, 3) and N > 2 * k - 1:
-        raise ValueError(
-            f"❌ The puzzle has no solution for N={N} and k={k} "
-            f"(for k={k}, N must satisfy N ≤ {2 * k - 1})."
-        )
-    # For k ≥ 4 there is no upper bound on N
+    check_solvable(N, k)
 
     return (
         f"{N} actors and their {N} agents want to cross a river in a boat that is capable of holding "
@@ -52,11 +46,26 @@ def build_river_crossing_prompt(N: int, k: int) -> str:
     )
 
 
+def _post_chat(payload: dict) -> dict:
+    """
+    POST to the Ollama chat endpoint under the shared rate limiter.
+    Served from the on-disk response cache when LLM_CACHE_MODE is enabled.
+    """
+    def post():
+        with get_limiter("ollama").request() as slot:
+            resp = timed("ollama", get_http_session("ollama").post)(OLLAMA_URL, json=payload, timeout=600)
+            resp.raise_for_status()
+            data = resp.json()
+            slot.record(data.get("usage"))
+        return data
+    return cached_call(payload, post)
+
+
 def call_gemini_model(  # mantenemos el nombre y firma
     prompt_text: str,
     N: int,
     k: int,
-    csv_path: str = "tokens_river.csv",
+    csv_path: str = TOKENS_CSV,
     model_name: str = "gemini-2.5-pro-preview-06-05"  # ignorado; se usa OLLAMA_MODEL
 ) -> str:
     # System prompt EXACTO (no modificado)
@@ -82,9 +91,7 @@ def call_gemini_model(  # mantenemos el nombre y firma
         "max_tokens": 8192
     }
 
-    r = requests.post(OLLAMA_URL, json=payload, timeout=600)
-    r.raise_for_status()
-    data = r.json()
+    data = _post_chat(payload)
 
     # Texto de salida (idéntico uso)
     content = data["choices"][0]["message"]["content"]
@@ -102,26 +109,19 @@ def call_gemini_model(  # mantenemos el nombre y firma
     print(f"Salida:  {usage.candidates_token_count} tokens")
     print(f"Total:   {usage.total_token_count} tokens")
 
-    # Guardado CSV (sin cambios)
+    # Guardado CSV: una fila nueva por ejecución (resultsStore)
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    col_name = f"N{N}_k{k}_{timestamp}"
-    rows = ["tokens_prompt", "tokens_candidates", "tokens_thoughts", "tokens_total", "results"]
-    values = [
-        usage.prompt_token_count,
-        usage.candidates_token_count,
-        0,  # no hay 'thoughts' separado
-        usage.total_token_count,
-        "ok"
-    ]
-
-    if os.path.exists(csv_path):
-        df = pd.read_csv(csv_path, index_col=0)
-        df = df.reindex(index=rows)
-    else:
-        df = pd.DataFrame(index=rows)
-
-    df[col_name] = values
-    df.to_csv(csv_path)
+    append_record(csv_path, {
+        "Name": f"N{N}_k{k}_{timestamp}",
+        "model": OLLAMA_MODEL,
+        "N": N,
+        "k": k,
+        "tokens_prompt": usage.prompt_token_count,
+        "tokens_candidates": usage.candidates_token_count,
+        "tokens_thoughts": 0,  # no hay 'thoughts' separado
+        "tokens_total": usage.total_token_count,
+        "results": "ok",
+    }, TOKENS_HEADERS)
 
     return content
 
@@ -130,31 +130,11 @@ import json
 
 def extract_solution_from_text(text: str) -> List[List[str]]:
     """
-    Extrae la lista de movimientos de un texto, siguiendo esta lógica:
-    - Mantiene solo lo que está entre el primer `[` y el último `]`.
-    - Elimina caracteres innecesarios como saltos, comentarios, símbolos no válidos.
-    - Evalúa la estructura como una lista de listas de strings.
+    Extrae la lista de movimientos de un texto con un único recorrido por profundidad de corchetes
+    (moveParser.extract_move_list): primero el bloque 'moves = [...]', si no la última lista de
+    listas bien formada. Tiempo lineal y sin eval.
     """
-    # Paso 1: encontrar límites del bloque de lista
-    start = text.find('[')
-    end = text.rfind(']')
-    if start == -1 or end == -1 or end <= start:
-        raise ValueError("❌ No se encontraron corchetes válidos.")
-
-    raw_block = text[start:end + 1]
-
-    # Paso 2: eliminar caracteres no deseados
-    # Permitimos solo: letras, números, _, comas, comillas, corchetes y espacios mínimos
-    cleaned_block = re.sub(r"[^a-zA-Z0-9_\[\]\",']", "", raw_block)
-
-    # Paso 3: evaluar
-    try:
-        result = eval(cleaned_block)
-        if not isinstance(result, list) or not all(isinstance(m, list) for m in result):
-            raise ValueError("❌ El formato no es una lista de listas.")
-        return result
-    except Exception as e:
-        raise ValueError(f"❌ No se pudo evaluar la lista: {e}")
+    return extract_move_list(text, marker="moves")
 
 
 # ------------------ Uso (sin cambios) ------------------
@@ -1,42 +1,35 @@
 import os
-import re
 from typing import List
 import google.generativeai as genai
 from RiverCrossingViewer import RiverCrossingVisualizer
-import pandas as pd
+from riverSolver import check_solvable
+from resultsStore import TOKENS_CSV, TOKENS_HEADERS, append_record
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Harness"))
+from rateLimiter import get_limiter
+from clientPool import generativeai_options, get_generative_model, timed
+from moveParser import extract_move_list
 
 # CONFIGURA TU API KEY
-genai.configure(api_key=os.getenv("GEMINI_API_KEY_HANOI"))
+genai.configure(api_key=os.getenv("GEMINI_API_KEY_HANOI"), **generativeai_options())
 
 
 def build_river_crossing_prompt(N: int, k: int) -> str:
     """
     Build the river-crossing statement only when the instance is solvable.
 
-    Solvability rules for the symmetric “N actors and N agents” variant
-    (same logic as the missionaries-and-cannibals puzzle):
+    Solvability is decided by the exact oracle in riverSolver.py (BFS over the safe
+    couple / lone actor / lone agent counts). For the symmetric “N actors and N agents”
+    variant it reproduces the known rules:
 
         • k == 1  →  impossible (no one can bring the boat back).
-        • k == 2  →  solvable only if N ≤ 3  (upper bound 2k-1).
-        • k == 3  →  solvable only if N ≤ 5  (upper bound 2k-1).
+        • k == 2  →  solvable only if N ≤ 3.
+        • k == 3  →  solvable only if N ≤ 5.
         • k ≥ 4   →  always solvable for any N ≥ 1.
 
-    A ValueError is raised for any (N, k) pair that violates these rules.
+    A ValueError is raised for any (N, k) pair without a solution.
     """
-    if k < 1:
-        raise ValueError("❌ Boat capacity k must be at least 1.")
-    if N < 1:
-        raise ValueError("❌ There must be at least one actor and one agent (N ≥ 1).")
-
-    # Unsatisfiable cases
-    if k == 1:
-        raise ValueError("❌ A single-seat boat makes the puzzle impossible.")
-    if k in (2, 3) and N > 2 * k - 1:
-        raise ValueError(
-            f"❌ The puzzle has no solution for N={N} and k={k} "
-            f"(for k={k}, N must satisfy N ≤ {2 * k - 1})."
-        )
-    # For k ≥ 4 there is no upper bound on N
+    check_solvable(N, k)
 
     return (
         f"{N} actors and their {N} agents want to cross a river in a boat that is capable of holding "
@@ -49,7 +42,6 @@ def build_river_crossing_prompt(N: int, k: int) -> str:
 
 
 import os
-import pandas as pd
 from datetime import datetime
 import google.generativeai as genai
 
@@ -57,10 +49,10 @@ def call_gemini_model(
     prompt_text: str,
     N: int,
     k: int,
-    csv_path: str = "tokens_river.csv",
+    csv_path: str = TOKENS_CSV,
     model_name: str = "gemini-2.5-pro-preview-06-05"
 ) -> str:
-    model = genai.GenerativeModel(
+    model = get_generative_model(
         model_name=model_name,
         system_instruction=(
         "You are a helpful assistant. Solve this puzzle for me. You can represent actors with a_1, a_2, ... "
@@ -73,7 +65,7 @@ def call_gemini_model(
         "final answer also includes the complete list of moves for final solution."
     )
     )
-    response = model.generate_content(prompt_text)
+    response = get_limiter("gemini").call(timed("gemini", model.generate_content), prompt_text)
     usage = response.usage_metadata
 
     # Mostrar en pantalla
@@ -82,27 +74,19 @@ def call_gemini_model(
     print(f"Salida:  {usage.candidates_token_count} tokens")
     print(f"Total:   {usage.total_token_count} tokens")
 
-    # Preparar datos CSV
+    # Guardar la ejecución como una fila nueva (resultsStore: solo se añade al final)
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    col_name = f"N{N}_k{k}_{timestamp}"
-    rows = ["tokens_prompt", "tokens_candidates", "tokens_thoughts", "tokens_total","results"]
-    values = [
-        usage.prompt_token_count,
-        usage.candidates_token_count,
-        getattr(usage, "thoughts_token_count", 0),
-        usage.total_token_count,
-        "ok"
-    ]
-
-    if os.path.exists(csv_path):
-        df = pd.read_csv(csv_path, index_col=0)
-        # Optionally ensure all rows exist
-        df = df.reindex(index=rows)
-    else:
-        df = pd.DataFrame(index=rows)
-
-    df[col_name] = values
-    df.to_csv(csv_path)
+    append_record(csv_path, {
+        "Name": f"N{N}_k{k}_{timestamp}",
+        "model": model_name,
+        "N": N,
+        "k": k,
+        "tokens_prompt": usage.prompt_token_count,
+        "tokens_candidates": usage.candidates_token_count,
+        "tokens_thoughts": getattr(usage, "thoughts_token_count", 0),
+        "tokens_total": usage.total_token_count,
+        "results": "ok",
+    }, TOKENS_HEADERS)
 
     return response.text
 
@@ -111,32 +95,11 @@ import json
 
 def extract_solution_from_text(text: str) -> List[List[str]]:
     """
-    Extrae la lista de movimientos de un texto, siguiendo esta lógica:
-    - Mantiene solo lo que está entre el primer `[` y el último `]`.
-    - Elimina caracteres innecesarios como saltos, comentarios, símbolos no válidos.
-    - Evalúa la estructura como una lista de listas de strings.
+    Extrae la lista de movimientos de un texto con un único recorrido por profundidad de corchetes
+    (moveParser.extract_move_list): primero el bloque 'moves = [...]', si no la última lista de
+    listas bien formada. Tiempo lineal y sin eval.
     """
-    # Paso 1: encontrar límites del bloque de lista
-    start = text.find('[')
-    end = text.rfind(']')
-    if start == -1 or end == -1 or end <= start:
-        raise ValueError("❌ No se encontraron corchetes válidos.")
-
-    raw_block = text[start:end + 1]
-
-    # Paso 2: eliminar caracteres no deseados
-    # Permitimos solo: letras, números, _, comas, comillas, corchetes y espacios mínimos
-    cleaned_block = re.sub(r"[^a-zA-Z0-9_\[\]\",']", "", raw_block)
-
-    # Paso 3: evaluar
-    try:
-        result = eval(cleaned_block)
-        if not isinstance(result, list) or not all(isinstance(m, list) for m in result):
-            raise ValueError("❌ El formato no es una lista de listas.")
-        return result
-    except Exception as e:
-        raise ValueError(f"❌ No se pudo evaluar la lista: {e}")
-
+    return extract_move_list(text, marker="moves")
 
 
 N=5 # Number of jealous couples
@@ -0,0 +1,311 @@
+from google import genai
+from google.genai import types
+import os
+import csv
+import math
+import threading
+import time
+from datetime import datetime
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Harness"))
+from rateLimiter import get_limiter
+from clientPool import get_genai_client, timed
+from checkpoint import Checkpoint
+from moveParser import StreamingMoveValidator, extract_move_list
+from streaming import add_stream_columns, stream_gemini
+from riverEngine import RiverEngine
+from riverSolver import check_solvable
+from resultsStore import append_record
+
+# Configura la API
+client = get_genai_client("GEMINI_API_KEY_HANOI")
+
+# Modelo por defecto (se puede sobrescribir por experimento)
+MODEL_NAME = "gemini-2.5-pro-preview-06-05"
+
+# Tokens y segundos de cada iteración (una fila por llamada, sin límite de iteraciones)
+ITERATIONS_CSV = os.path.join("results", "river_crossing_steps_iterations.csv")
+ITERATIONS_HEADERS = ['Name', 'iteration', 'trips_requested', 'trips_applied', 'tokens_prompt',
+                      'tokens_candidates', 'tokens_total', 'seconds', 'results']
+
+#####FUNCTION FOR BUILDING THE PROMPT#####
+"""
+This function builds a prompt for the River Crossing puzzle from the current state of the banks:
+who is on each bank and where the boat is. The model only has to return the next p boat trips, so
+the answer length no longer grows with N (the one-shot scripts ask for every trip at once).
+"""
+def _people(names: set) -> str:
+    # a_1, A_1, a_2, A_2, ... (cada actor junto a su agente)
+    ordered = sorted(names, key=lambda name: (int(name[2:]), name[0] == 'A'))
+    return ', '.join(ordered) if ordered else '(nobody)'
+
+
+def build_river_prompt(N: int, k: int, engine: RiverEngine, p: int) -> str:
+    prompt = f"""
+    {N} actors and their {N} agents want to cross a river in a boat that is capable of holding only {k} people
+    at a time, with the constraint that no actor can be in the presence of another agent, including while riding
+    the boat, unless their own agent is also present, because each agent is worried their rivals will poach their
+    client. The boat cannot travel empty. Initially all actors and agents were on the left side of the river with
+    the boat, and some trips have already been made. I want to make {p} boat trips to bring us closer to the solution.
+
+    Current state:
+    Left bank: {_people(engine.bank(0))}
+    Right bank: {_people(engine.bank(1))}
+    Boat: on the {engine.boat_side} bank
+
+    Goal: everyone on the right bank.
+
+    Find the next {p} boat trips, starting from the {engine.boat_side} bank, to bring the current state closer to
+    the goal. If fewer than {p} trips are needed to finish, return only those.
+    """
+    return prompt
+
+# Instrucción de sistema y configuración comunes a las llamadas normales y en streaming
+GENERATION_CONFIG = types.GenerateContentConfig(
+    system_instruction="""
+            You are a helpful assistant. Solve this puzzle for me. You can represent actors with a_1, a_2, ... and agents with A_1, A_2, ... . Your solution must be a list of boat moves where each move indicates the people on the boat. For example, moves = [["A_2", "a_2"], ["A_2"], ["A_1", "A_2"]] indicates that in the first move A_2 and a_2 row from the boat's bank to the other bank, in the second move A_2 rows back, and so on.
+
+            Requirements:
+            • When exploring potential solutions in your thinking process, always include the corresponding complete list of boat moves.
+            • The current state of the problem, since it may be in the initial state or in an intermediate state.
+            • The desired number of boat moves p. This parameter indicates how many moves I want you to make to bring us closer to the solution. Therefore, I don't want you to provide the complete solution, but rather the next p moves that move us toward the goal.
+
+            IMPORTANT: Your response must be ONLY the list in the exact format 'moves = [[...], [...], ...]' with no additional text, comments, explanations, or variations. Any output with comments, extra text, or different formats is invalid and will not be accepted.
+            """,
+    thinking_config=types.ThinkingConfig(include_thoughts=True)
+)
+
+######FUNCTION FOR ASKING THE AGENT#####
+"""
+This function interacts with the Gemini AI model to solve the River Crossing puzzle.
+It sends a prompt with the current state and the number of trips to make, and processes the response.
+The response includes the thought process and the final answer, which is a list of boat moves.
+"""
+def ask_river_agent(contents: str, model: str = MODEL_NAME) -> tuple:
+    response = get_limiter("gemini").call(timed("gemini", client.models.generate_content),
+        model=model,
+        config=GENERATION_CONFIG,
+        contents=contents
+    )
+
+    final_answer = ""
+    for part in response.candidates[0].content.parts:
+        if not part.text:
+            continue
+        if part.thought:
+            print("Thought summary:")
+            print(part.text)
+            print()
+        else:
+            print("Answer:")
+            print(part.text)
+            print()
+            final_answer += part.text
+
+    return final_answer, response.usage_metadata
+
+"""
+Streaming variant: thoughts and answer are printed as they arrive and the latency metrics are returned
+as a third value. `on_chunk` can abort the generation (e.g. at the first illegal move).
+"""
+def ask_river_agent_stream(contents: str, model: str = MODEL_NAME, on_chunk=None) -> tuple:
+    result = stream_gemini(client, model, GENERATION_CONFIG, contents, on_chunk=on_chunk)
+    usage = result.usage or types.GenerateContentResponseUsageMetadata()
+    return result.answer, usage, result.metrics()
+
+#####FUNCTION FOR APPLYING MOVES#####
+"""
+Applies one boat move to the RiverEngine with the checker's rules (O(k) per move) and raises
+ValueError if it is illegal, so it can also be used as the apply_move of StreamingMoveValidator.
+"""
+def apply_trip(engine: RiverEngine, move: list) -> RiverEngine:
+    if not engine.step(move):
+        raise ValueError(f"viaje {engine.failed_step + 1} inválido, elementos conflictivos: {engine.failed_people}")
+    return engine
+
+######STEPWISE EXPERIMENT######
+# Varias pruebas pueden ejecutarse a la vez en el mismo proceso (asyncRunner)
+_csv_lock = threading.Lock()
+
+def run_steps_experiment(N: int = 5, k: int = 3, p: int = 10, model: str = MODEL_NAME, stream: bool = False,
+                         resume: str = None, max_iterations: int = None) -> dict:
+    """
+    Ejecuta un experimento stepwise completo: en cada iteración se envía el estado de las orillas y
+    de la barca y se piden los siguientes p viajes, que se validan con RiverEngine (las reglas del
+    checker). El resumen va a results/river_crossing_steps.csv y los tokens y segundos de cada
+    iteración a results/river_crossing_steps_iterations.csv.
+    Con stream=True cada viaje se valida según llega (la generación se corta en el primero inválido)
+    y el resumen, con las métricas de latencia, va a results/river_crossing_steps_stream.csv.
+    Como los viajes pueden deshacerse (ir y volver), el experimento falla tras `max_iterations`
+    llamadas sin llegar al objetivo (por defecto tres veces las necesarias con la solución óptima).
+    Cada iteración completada se guarda en results/checkpoints/; resume="<nombre del experimento>"
+    continúa un experimento interrumpido desde su última iteración correcta.
+    """
+    # Checkpoint por iteración: nuevo experimento o reanudación de uno interrumpido
+    if resume:
+        checkpoint = Checkpoint.load(resume, "river_steps")
+        N, k, p, model, stream, max_iterations = (checkpoint.params[key] for key in
+                                                   ("N", "k", "p", "model", "stream", "max_iterations"))
+
+    # Solo instancias con solución (oráculo exacto); el mínimo de viajes sirve de referencia.
+    # Se comprueba antes de crear el checkpoint para no dejar uno "running" huérfano
+    trips = check_solvable(N, k)
+    if not resume:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        checkpoint = Checkpoint.start(f"N{N}_k{k}_p{p}_{timestamp}", "river_steps",
+                                      {"N": N, "k": k, "p": p, "model": model, "stream": stream,
+                                       "max_iterations": max_iterations})
+    if max_iterations is None:
+        max_iterations = max(10, 3 * math.ceil(trips / p))
+
+    # El estado se reconstruye repitiendo los viajes ya validados (O(k) por viaje)
+    engine = RiverEngine(N, k)
+    total_moves = checkpoint.total_moves
+    for move in total_moves:
+        apply_trip(engine, move)
+    iteration = checkpoint.iteration
+
+    prompt_tokens = checkpoint.get("prompt_tokens")
+    output_tokens = checkpoint.get("output_tokens")
+    total_tokens = checkpoint.get("total_tokens")
+    seconds = checkpoint.get("seconds")
+    ttft = checkpoint.get("ttft")
+    ttfat = checkpoint.get("ttfat")
+    decode_rate = checkpoint.get("decode_rate")
+    tokens_saved = 0
+    seconds_saved = 0.0
+    success = engine.solved()
+    experiment_name = checkpoint.row_name()
+
+    while not success and iteration < max_iterations:
+        iteration += 1
+        print(f"\n🔄 Iteración {iteration} | N = {N} | k = {k} | p = {p}")
+        applied = 0
+        usage = None
+        result = "fail"     # solo pasa a "ok" si la iteración termina sin excepción
+        start = time.perf_counter()
+        try:
+            # Construir el prompt
+            prompt = build_river_prompt(N=N, k=k, engine=engine, p=p)
+
+            # Preguntar al LLM
+            if stream:
+                # Validar cada viaje según llega y cortar la generación en el primero inválido
+                validator = StreamingMoveValidator(engine, apply_trip, expected_moves=p, marker="moves")
+                response_text, usage, metrics = ask_river_agent_stream(prompt, model=model, on_chunk=validator)
+                ttft.append(metrics["ttft"])
+                ttfat.append(metrics["ttfat"])
+                decode_rate.append(metrics["decode_rate"])
+            else:
+                response_text, usage = ask_river_agent(prompt, model=model)
+            seconds.append(round(time.perf_counter() - start, 3))
+            prompt_tokens.append(usage.prompt_token_count)
+            output_tokens.append(usage.candidates_token_count)
+            total_tokens.append(usage.total_token_count)
+
+            if stream:
+                applied = len(validator.moves)
+                total_moves.extend(validator.moves)
+                if validator.error:
+                    tokens_saved, seconds_saved = validator.savings()
+                    raise ValueError(f"{validator.error} (stream cortado, ~{tokens_saved} tokens y {seconds_saved} s ahorrados)")
+            else:
+                # Extraer la lista de viajes y aplicarlos uno a uno
+                for move in extract_move_list(response_text, marker="moves"):
+                    apply_trip(engine, move)
+                    total_moves.append(move)
+                    applied += 1
+
+            # Guardar la iteración completada (permite reanudar tras un corte)
+            checkpoint.save(iteration, {"left": sorted(engine.bank(0)), "boat": engine.boat_side}, total_moves,
+                            prompt_tokens=prompt_tokens, output_tokens=output_tokens, total_tokens=total_tokens,
+                            seconds=seconds, ttft=ttft, ttfat=ttfat, decode_rate=decode_rate)
+            success = engine.solved()
+            result = "ok"
+
+        except ValueError as e:
+            print(f"❌ Se ha producido un error en la iteración {iteration}: {e}")
+            print("🛑 El experimento se detiene aquí debido a un movimiento inválido.")
+        finally:
+            if usage is None:
+                seconds.append(round(time.perf_counter() - start, 3))
+            append_record(ITERATIONS_CSV, {
+                "Name": experiment_name,
+                "iteration": iteration,
+                "trips_requested": p,
+                "trips_applied": applied,
+                "tokens_prompt": usage.prompt_token_count if usage else None,
+                "tokens_candidates": usage.candidates_token_count if usage else None,
+                "tokens_total": usage.total_token_count if usage else None,
+                "seconds": seconds[-1],
+                "results": result,
+            }, ITERATIONS_HEADERS)
+
+        if result == "fail":
+            break
+        if success:
+            print("🎯 ¡Todos han cruzado a la orilla derecha!")
+        else:
+            print(f"Viajes hasta ahora: {len(total_moves)} | Barca en la orilla {engine.boat_side} | "
+                  f"Orilla izquierda: {_people(engine.bank(0))}")
+
+    if not success and iteration >= max_iterations:
+        print(f"🛑 Sin llegar al objetivo tras {max_iterations} iteraciones.")
+
+    print(f"\n✅ Secuencia de viajes obtenida ({len(total_moves)} viajes, mínimo {trips}):", total_moves)
+
+    results_value = 'ok' if success else 'fail'
+    checkpoint.finish(results_value)
+
+    # Número máximo de iteraciones registrables en el resumen (todas están en ITERATIONS_CSV)
+    max_iters = 10
+
+    def columns(values: list) -> list:
+        return values[:max_iters] + [''] * (max_iters - len(values))
+
+    # Sumas totales
+    prompt_sum = sum([t for t in prompt_tokens if isinstance(t, int)])
+    output_sum = sum([t for t in output_tokens if isinstance(t, int)])
+    total_sum = sum([t for t in total_tokens if isinstance(t, int)])
+    seconds_sum = round(sum(seconds), 3)
+
+    # Encabezado
+    headers = ['Name'] + \
+              [f"tokens_prompt_iter{i+1}" for i in range(max_iters)] + \
+              [f"tokens_candidates_iter{i+1}" for i in range(max_iters)] + \
+              [f"tokens_total_iter{i+1}" for i in range(max_iters)] + \
+              ['tokens_prompt_sum', 'tokens_candidates_sum', 'tokens_total_sum', 'seconds_sum',
+               'iterations', 'trips', 'min_trips', 'results']
+
+    # Fila de datos
+    row = [experiment_name] + columns(prompt_tokens) + columns(output_tokens) + columns(total_tokens) + \
+          [prompt_sum, output_sum, total_sum, seconds_sum, iteration, len(total_moves), trips, results_value]
+
+    # Métricas de latencia y early abort (solo en modo streaming, en un CSV aparte)
+    if stream:
+        headers, row = add_stream_columns(headers, row, columns(ttft), columns(ttfat), columns(decode_rate),
+                                          tokens_saved, seconds_saved, max_iters)
+
+    # Guardar en CSV
+    os.makedirs("results", exist_ok=True)
+    csv_path = os.path.join("results", "river_crossing_steps_stream.csv" if stream else "river_crossing_steps.csv")
+
+    with _csv_lock:
+        file_exists = os.path.exists(csv_path)
+        with open(csv_path, mode='a', newline='') as file:
+            writer = csv.writer(file)
+            if not file_exists:
+                writer.writerow(headers)
+            writer.writerow(row)
+
+    print(f"\n📄 Resultados guardados en: {csv_path}")
+    return {"name": experiment_name, "results": results_value, "moves": len(total_moves), "tokens_total": total_sum,
+            "seconds": seconds_sum, "min_trips": trips}
+
+
+if __name__ == "__main__":
+    N = 5  # Number of jealous couples
+    k = 3  # Capacity of the boat
+    p = 10  # Number of boat trips to make in each iteration
+    resume = None  # Nombre de un experimento interrumpido para continuarlo (ver results/checkpoints)
+    run_steps_experiment(N=N, k=k, p=p, resume=resume)
@@ -5,16 +5,15 @@ import os
 import time
 import numpy as np
 
+from riverEngine import RiverEngine
+
 class RiverCrossingVisualizer:
     def __init__(self, N, k, moves):
         self.N = N
         self.k = k
         self.moves = moves
-        self.left_bank = set([f'a_{i+1}' for i in range(N)] + [f'A_{i+1}' for i in range(N)])
-        self.right_bank = set()
-        self.boat_side = 'left'
+        self.engine = RiverEngine(N, k)
         self.failed_move_index = None
-        self.failed_people = []
         self.colors = self._generate_color_map()
 
     def _generate_color_map(self):
@@ -26,37 +25,30 @@ class RiverCrossingVisualizer:
         np.random.shuffle(pastel_colors)
         return {person: pastel_colors[i % len(pastel_colors)] for i, person in enumerate(all_people)}
 
-    def _validate_state(self):
-        for side in [self.left_bank, self.right_bank]:
-            actors = {p for p in side if p.startswith('a_')}
-            agents = {p for p in side if p.startswith('A_')}
-            for actor in actors:
-                num = actor.split('_')[1]
-                if f'A_{num}' not in agents and agents:
-                    self.failed_people = [actor] + list(agents)
-                    return False
-        return True
+    @property
+    def left_bank(self):
+        return self.engine.bank(0)
 
-    def _validate_move(self, move):
-        boat_set = set(move)
-        if len(boat_set) == 0 or len(boat_set) > self.k:
-            self.failed_people = list(boat_set)
-            return False
+    @property
+    def right_bank(self):
+        return self.engine.bank(1)
 
-        side = self.left_bank if self.boat_side == 'left' else self.right_bank
-        if not boat_set.issubset(side):
-            self.failed_people = list(boat_set - side)
-            return False
+    @property
+    def boat_side(self):
+        return self.engine.boat_side
 
-        return True
+    @property
+    def failed_people(self):
+        return self.engine.failed_people
+
+    def _validate_state(self):
+        return self.engine.is_safe()
+
+    def _validate_move(self, move):
+        return self.engine.can_move(move)
 
     def _apply_move(self, move):
-        side_from = self.left_bank if self.boat_side == 'left' else self.right_bank
-        side_to = self.right_bank if self.boat_side == 'left' else self.left_bank
-        for person in move:
-            side_from.remove(person)
-            side_to.add(person)
-        self.boat_side = 'right' if self.boat_side == 'left' else 'left'
+        self.engine.apply_move(move)
 
     def _draw_state(self, step, highlight=None):
         self.ax.clear()
@@ -131,27 +123,12 @@ class RiverCrossingVisualizer:
         plt.show()
 
     def is_valid_solution(self) -> bool:
-        # Reiniciar el estado
-        self.left_bank = set([f'a_{i+1}' for i in range(self.N)] + [f'A_{i+1}' for i in range(self.N)])
-        self.right_bank = set()
-        self.boat_side = 'left'
+        # Reiniciar el estado y validar con el motor de bitsets
         self.failed_move_index = None
-        self.failed_people = []
-
-        for i, move in enumerate(self.moves):
-            if not self._validate_move(move):
-                self.failed_move_index = i
-                return False
-
-            self._apply_move(move)
-
-            if not self._validate_state():
-                self.failed_move_index = i
-                return False
-
-        # Verificar si todos han cruzado
-        expected = set([f'a_{i+1}' for i in range(self.N)] + [f'A_{i+1}' for i in range(self.N)])
-        return self.right_bank == expected
+        if not self.engine.check(self.moves):
+            self.failed_move_index = self.engine.failed_step
+            return False
+        return True
 
 
 
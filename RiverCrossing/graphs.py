@@ -3,25 +3,22 @@ import matplotlib.pyplot as plt
 import numpy as np
 import re
 
-# Ruta al archivo CSV
-file_path = "tokens_river.csv"  # Asegúrate de que el archivo está en el mismo directorio o pon la ruta completa
+# Ruta al archivo CSV (una fila por ejecución, ver resultsStore.py)
+file_path = "results/river_tokens.csv"  # Asegúrate de que el archivo está en el mismo directorio o pon la ruta completa
 
-# Cargar el CSV y reestructurar
-df_raw = pd.read_csv(file_path)
-df = df_raw.set_index(df_raw.columns[0])
-df = df.drop(columns=df.columns[0])
+# Cargar el CSV
+df = pd.read_csv(file_path)
 
-# Extraer las configuraciones experimentales
-columns = df.columns
+# Extraer las configuraciones experimentales (en orden de aparición)
 experiments = {}
 
-for col in columns:
-    match = re.match(r'N(\d+)_k(\d+)_\d+', col)
+for index, name in df["Name"].items():
+    match = re.match(r'N(\d+)_k(\d+)_\d+', str(name))
     if match:
         key = f'N={match.group(1)} k={match.group(2)}'
         if key not in experiments:
             experiments[key] = []
-        experiments[key].append(col)
+        experiments[key].append(index)
 
 # Inicializar estructuras
 means = []
@@ -31,9 +28,9 @@ ok_percentages = []
 fail_percentages = []
 
 # Calcular estadísticas
-for key, cols in experiments.items():
-    tokens_total = df.loc["tokens_total", cols].astype(float)
-    results = df.loc["results", cols]
+for key, rows in experiments.items():
+    tokens_total = df.loc[rows, "tokens_total"].astype(float)
+    results = df.loc[rows, "results"]
 
     mean = tokens_total.mean()
     std = tokens_total.std()
@@ -1,14 +1,17 @@
-import subprocess
 import os
+import sys
 
-# Cambiar al directorio del script
+# Cambiar al directorio del script y hacer visible el runner compartido
 os.chdir(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Harness"))
 
-# Ejecutar BlocksWorldSolver.py 10 veces
-for i in range(9):
-    print(f"Ejecución {i+1}/10")
-    try:
-        subprocess.run(["python3", "BaseLineRiverCrossing.py"], check=True)
-    except subprocess.CalledProcessError as e:
-        print(f"Error en ejecución {i+1}: {e}")
-    print()
+from asyncRunner import run_trials
+from clientPool import print_pool_stats
+from BaseLineRiverCrossing import run_baseline_experiment
+
+TRIALS = 9        # Número de pruebas
+CONCURRENCY = 4   # Pruebas simultáneas (limitado por la cuota del proveedor)
+
+# Ejecutar BaseLineRiverCrossing 9 veces
+run_trials(run_baseline_experiment, trials=TRIALS, concurrency=CONCURRENCY, N=8, k=3)
+print_pool_stats()
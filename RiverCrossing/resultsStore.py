@@ -0,0 +1,108 @@
+"""
+Append-only run records for the River Crossing scripts.
+
+call_gemini_model used to keep tokens_river*.csv transposed (one column per run): every call read
+the whole file with pandas, reindexed it and wrote it back, so the cost of saving a run grew with
+the number of runs already stored, and save_results_to_csv did the same with pd.concat. Here each
+run is one row appended to a long CSV; only the header line is read to order the values, so
+saving a run is O(1) whatever the size of the file:
+
+    results/river_tokens.csv            RiverCrossingSolver.py and DeepSeekRiverCrossingSolver.py
+    results/river_tokens_baseline.csv   BaseLineRiverCrossing.py
+
+`migrate_wide_csv` converts the old transposed files once (`python resultsStore.py` migrates
+tokens_river.csv and tokens_river_baseline.csv if they are still there and removes them).
+
+Example:
+    append_record(TOKENS_CSV, {"Name": "N3_k2_20250101_120000", "N": 3, "k": 2, "tokens_total": 812,
+                               "results": "ok"})
+    df = load_records(TOKENS_CSV)
+"""
+import csv
+import os
+import threading
+
+TOKENS_CSV = os.path.join("results", "river_tokens.csv")
+BASELINE_TOKENS_CSV = os.path.join("results", "river_tokens_baseline.csv")
+TOKENS_HEADERS = ['Name', 'model', 'N', 'k', 'tokens_prompt', 'tokens_candidates', 'tokens_thoughts',
+                  'tokens_total', 'results']
+
+# Tabla antigua (traspuesta) -> tabla larga
+LEGACY_FILES = {"tokens_river.csv": TOKENS_CSV, "tokens_river_baseline.csv": BASELINE_TOKENS_CSV}
+
+# Varias pruebas en paralelo (asyncRunner) escriben en los mismos ficheros
+_lock = threading.Lock()
+
+
+def _header(csv_path: str):
+    if not os.path.exists(csv_path) or os.path.getsize(csv_path) == 0:
+        return None
+    with open(csv_path, newline='') as file:
+        return next(csv.reader(file), None)
+
+
+def append_record(csv_path: str, record: dict, headers: list = None) -> str:
+    """
+    Appends one run as a row. A new file gets `headers` (default: the record keys); an existing
+    one keeps its header and missing fields are left empty. Fields that are not in the header
+    raise ValueError, since the columns of an existing results file are never changed.
+    """
+    with _lock:
+        existing = _header(csv_path)
+        columns = existing or headers or list(record)
+        unknown = set(record) - set(columns)
+        if unknown:
+            raise ValueError(f"❌ {csv_path} no tiene las columnas {sorted(unknown)}; usa otro fichero de resultados.")
+        os.makedirs(os.path.dirname(csv_path) or ".", exist_ok=True)
+        with open(csv_path, mode='a', newline='') as file:
+            writer = csv.writer(file)
+            if existing is None:
+                writer.writerow(columns)
+            writer.writerow(['' if record.get(column) is None else record.get(column) for column in columns])
+    return csv_path
+
+
+def load_records(csv_path: str):
+    import pandas as pd
+    return pd.read_csv(csv_path)
+
+
+#####MIGRATION#####
+def _number(value: str):
+    try:
+        number = float(value)
+    except ValueError:
+        return value
+    return int(number) if number.is_integer() else number
+
+
+def migrate_wide_csv(wide_path: str, csv_path: str, remove: bool = True) -> int:
+    """
+    Appends every run column of an old transposed CSV (rows tokens_prompt, ..., results) to the
+    long CSV and removes the old file. Returns the number of migrated runs.
+    """
+    with open(wide_path, newline='') as file:
+        rows = list(csv.reader(file))
+    names = rows[0][1:]
+    fields = {row[0]: row[1:] for row in rows[1:] if row}
+    for i, name in enumerate(names):
+        record = {"Name": name}
+        parts = name.split("_")
+        if len(parts) >= 2 and parts[0][:1] == "N" and parts[1][:1] == "k":
+            record["N"], record["k"] = _number(parts[0][1:]), _number(parts[1][1:])
+        for field, values in fields.items():
+            value = values[i] if i < len(values) else ''
+            record[field] = _number(value) if field != "results" else value
+        append_record(csv_path, record, TOKENS_HEADERS)
+    if remove:
+        os.remove(wide_path)
+    return len(names)
+
+
+if __name__ == "__main__":
+    for wide_path, csv_path in LEGACY_FILES.items():
+        if os.path.exists(wide_path):
+            count = migrate_wide_csv(wide_path, csv_path)
+            print(f"✅ {wide_path}: {count} ejecuciones migradas a {csv_path}")
+        else:
+            print(f"ℹ️  {wide_path} no existe (ya migrado)")
@@ -0,0 +1,211 @@
+"""
+Integer-indexed bitset engine for River Crossing validation.
+
+RiverCrossingChecker and RiverCrossingVisualizer used to keep each bank as a set of strings and,
+after every move, rebuild the actor / agent subsets of both banks and split every 'a_17' name:
+O(N) string work per step, O(N·M) for a whole answer. Here every person has an integer ID
+(actor a_i -> i - 1, agent A_i -> N + i - 1, so partner(x) = x ± N), each bank is a bitset (a
+bytearray with one bit per person, set and cleared in O(1)) and two counters per bank are kept up
+to date while people cross:
+
+    agents[bank]        agents on that bank
+    unprotected[bank]   actors on that bank whose own agent is on the other bank
+
+A bank is unsafe iff both counters are non-zero, so a move of at most k people is validated and
+applied in O(k). Names are only rebuilt to report a failure or to draw a frame.
+
+With check_boat=True the people in the boat must also satisfy the rule during the crossing (the
+original checkers, and therefore the default here, only validate the banks).
+
+Example:
+    engine = RiverEngine(N=3, k=2)
+    ok = engine.step(["A_1", "a_1"])          # False sets engine.failed_people
+    valid = engine.check(moves)              # whole sequence, everyone on the right bank
+"""
+import time
+
+LEFT, RIGHT = 0, 1
+SIDES = ("left", "right")
+
+
+class RiverEngine:
+    __slots__ = ("N", "k", "check_boat", "ids", "names", "side", "banks", "agents", "unprotected",
+                 "boat", "steps", "failed_step", "failed_people")
+
+    def __init__(self, N: int, k: int, check_boat: bool = False):
+        self.N = N
+        self.k = k
+        self.check_boat = check_boat
+        self.names = [f'a_{i+1}' for i in range(N)] + [f'A_{i+1}' for i in range(N)]
+        self.ids = {name: person for person, name in enumerate(self.names)}
+        self.reset()
+
+    def reset(self):
+        people = 2 * self.N
+        self.side = bytearray(people)                     # orilla de cada persona (0 izquierda, 1 derecha)
+        full = bytearray([0xFF]) * (people >> 3) + (bytearray([(1 << (people & 7)) - 1]) if people & 7 else bytearray())
+        self.banks = [full, bytearray(len(full))]         # bitsets de cada orilla
+        self.agents = [self.N, 0]
+        self.unprotected = [0, 0]
+        self.boat = LEFT
+        self.steps = 0
+        self.failed_step = None
+        self.failed_people = []
+
+    #####QUERIES#####
+    @property
+    def boat_side(self) -> str:
+        return SIDES[self.boat]
+
+    def bank(self, side: int) -> set:
+        """Names of the people on a bank (O(N); only for reports and drawing)."""
+        bits = self.banks[side]
+        return {self.names[person] for person in range(2 * self.N) if bits[person >> 3] >> (person & 7) & 1}
+
+    def is_safe(self) -> bool:
+        """
+        True if no actor is with a foreign agent without their own agent on either bank.
+        Otherwise `failed_people` gets the first unprotected actor and the agents on that bank.
+        """
+        for side in (LEFT, RIGHT):
+            if self.unprotected[side] and self.agents[side]:
+                self.failed_people = self._conflict(side)
+                return False
+        return True
+
+    def _conflict(self, side: int) -> list:
+        N, placed = self.N, self.side
+        actor = next(i for i in range(N) if placed[i] == side and placed[N + i] != side)
+        return [self.names[actor]] + [self.names[N + i] for i in range(N) if placed[N + i] == side]
+
+    #####MOVES#####
+    def can_move(self, move) -> bool:
+        """
+        Boat check: between 1 and k distinct people, all of them on the boat's bank.
+        """
+        boat_set = set(move)
+        if len(boat_set) == 0 or len(boat_set) > self.k:
+            self.failed_people = list(boat_set)
+            return False
+        ids, placed, here = self.ids, self.side, self.boat
+        missing = [name for name in boat_set if ids.get(name) is None or placed[ids[name]] != here]
+        if missing:
+            self.failed_people = missing
+            return False
+        if self.check_boat:
+            people = {self.ids[name] for name in boat_set}
+            N = self.N
+            agents = [p for p in people if p >= N]
+            alone = [p for p in people if p < N and p + N not in people]
+            if agents and alone:
+                self.failed_people = [self.names[alone[0]]] + [self.names[p] for p in agents]
+                return False
+        return True
+
+    def apply_move(self, move):
+        """
+        Moves the people to the other bank and updates the counters in O(k) (no validation).
+        """
+        N, placed = self.N, self.side
+        source, target = self.boat, 1 - self.boat
+        unprotected, agents = self.unprotected, self.agents
+        here, there = self.banks[source], self.banks[target]
+        for person in {self.ids[name] for name in move}:
+            byte, bit = person >> 3, 1 << (person & 7)
+            here[byte] &= ~bit
+            there[byte] |= bit
+            if person < N:
+                # Actor: deja de contar en el origen y cuenta en el destino si su agente no está allí
+                if placed[person + N] != source:
+                    unprotected[source] -= 1
+                placed[person] = target
+                if placed[person + N] != target:
+                    unprotected[target] += 1
+            else:
+                actor = person - N
+                agents[source] -= 1
+                agents[target] += 1
+                placed[person] = target
+                # Su actor queda desprotegido en el origen o protegido en el destino
+                if placed[actor] == source:
+                    unprotected[source] += 1
+                elif placed[actor] == target:
+                    unprotected[target] -= 1
+        self.boat = target
+
+    def step(self, move) -> bool:
+        """
+        Validates and applies one boat move. Returns False (with `failed_step` and
+        `failed_people`) if the boat or the resulting banks are invalid.
+        """
+        if not self.can_move(move):
+            self.failed_step = self.steps
+            return False
+        self.apply_move(move)
+        if not self.is_safe():
+            self.failed_step = self.steps
+            return False
+        self.steps += 1
+        return True
+
+    def solved(self) -> bool:
+        return not any(self.banks[LEFT])
+
+    def check(self, moves) -> bool:
+        """True if every move is valid and everyone ends on the right bank."""
+        self.reset()
+        for move in moves:
+            if not self.step(move):
+                return False
+        return self.solved()
+
+
+if __name__ == "__main__":
+    # Benchmark frente al validador anterior (conjuntos de strings revisados tras cada paso)
+    def legacy_check(N, k, moves):
+        left = set([f'a_{i+1}' for i in range(N)] + [f'A_{i+1}' for i in range(N)])
+        right, boat = set(), 'left'
+        for move in moves:
+            boat_set = set(move)
+            here = left if boat == 'left' else right
+            if not boat_set or len(boat_set) > k or not boat_set <= here:
+                return False
+            there = right if boat == 'left' else left
+            for person in move:
+                here.remove(person)
+                there.add(person)
+            boat = 'right' if boat == 'left' else 'left'
+            for bank in (left, right):
+                agents = {p for p in bank if p.startswith('A_')}
+                for actor in (p for p in bank if p.startswith('a_')):
+                    if f"A_{actor.split('_')[1]}" not in agents and agents:
+                        return False
+        return right == set([f'a_{i+1}' for i in range(N)] + [f'A_{i+1}' for i in range(N)])
+
+    def pairs_solution(N):
+        # k=4: dos parejas cruzan, una vuelve (las orillas solo tienen parejas completas)
+        left, right, moves = list(range(1, N + 1)), [], []
+        while left:
+            group = [left.pop(0) for _ in range(min(2, len(left)))]
+            moves.append([name for i in group for name in (f'A_{i}', f'a_{i}')])
+            right.extend(group)
+            if left:
+                back = right.pop(0)
+                moves.append([f'A_{back}', f'a_{back}'])
+                left.insert(0, back)
+        return moves
+
+    for N in (100, 1000, 10000):
+        moves = pairs_solution(N)
+        t0 = time.perf_counter()
+        engine_ok = RiverEngine(N, 4).check(moves)
+        t_engine = time.perf_counter() - t0
+        if N <= 1000:
+            t0 = time.perf_counter()
+            legacy_ok = legacy_check(N, 4, moves)
+            t_legacy = f"{time.perf_counter() - t0:8.3f} s"
+            assert legacy_ok == engine_ok
+        else:
+            t_legacy = "     (omitido, O(N·M))"
+        assert engine_ok
+        print(f"N={N:5d} | {len(moves):6d} viajes | conjuntos de strings {t_legacy} | bitsets {t_engine:6.3f} s")
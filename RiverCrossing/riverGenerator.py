@@ -0,0 +1,159 @@
+"""
+O(N) constructive River Crossing solutions for very large instances.
+
+riverSolver finds optimal solutions by search, which is fine up to N ~ 1000 but not for the
+N = 10^5 stress tests. For k >= 4 the optimal solutions have a periodic middle: with m = k // 2,
+a shuttle round takes m intact couples over and brings one couple back, so b = m - 1 couples
+cross every two trips while both banks only hold intact couples. Only the opening and the
+ending change with N (odd k uses the extra seat there).
+
+So the generator solves a small base instance once (a BFS over the riverSolver count states in
+which one block of b bystander couples crosses in a shuttle round somewhere in the middle) and
+then streams that plan with the shuttle round repeated as many times as N needs:
+
+    iter_solution(N, k)       explicit moves, O(k) per trip, nothing materialised
+    iter_answer_text(N, k)    the same moves as 'moves = [[...], ...]' text chunks, e.g. to back a
+                              fake 'perfect model' when load-testing the harness
+
+The trip counts match riverSolver.min_trips (optimal) for every N <= 200 and 4 <= k <= 12 checked
+in __main__; beyond that the plan is the periodic extension of those optimal solutions. For
+k < 4 only small N are solvable and the oracle's solution is returned.
+
+Example:
+    for move in iter_solution(100000, 4):     # [['A_1', 'a_1', 'A_2', 'a_2'], ['A_2', 'a_2'], ...]
+        checker.step(move)
+"""
+import json
+from collections import deque
+from functools import lru_cache
+from itertools import chain, repeat
+
+from riverSolver import LEFT, RIGHT, iter_moves, neighbours, solve
+
+BASE_MIN = 2   # bases se eligen en [BASE_MIN * k, BASE_MIN * k + b)
+
+
+def shuttle_block(k: int) -> int:
+    """Couples that cross per shuttle round (two trips)."""
+    return k // 2 - 1
+
+
+@lru_cache(maxsize=None)
+def _plan(base: int, k: int) -> tuple:
+    """
+    Optimal trips for `base` couples plus one block of shuttle_block(k) bystander couples that
+    crosses in a single shuttle round. Returns the (prefix, suffix) trips around that round.
+    """
+    b = shuttle_block(k)
+    start, goal = (base, 0, 0, LEFT, 0), (0, 0, 0, RIGHT, 2)
+    parent = {start: None}
+    queue = deque([start])
+    while queue:
+        node = queue.popleft()
+        if node == goal:
+            break
+        c, x, y, boat, phase = node
+        if phase == 1:
+            # Vuelta de la ronda: la pareja lanzadera regresa y el estado base no cambia
+            options = [((c, 0, 0, LEFT, 2), "back")]
+        else:
+            # Fase 0: el bloque espera en la izquierda; fase 2: ya está en la derecha
+            extra = (b, 0) if phase == 0 else (0, b)
+            options = [((*nxt, phase), load) for nxt, load in neighbours(base, k, (c, x, y, boat), extra)]
+            if phase == 0 and boat == LEFT and x == y == 0 and c >= 1:
+                options.append(((c, 0, 0, RIGHT, 1), "over"))
+        for nxt, load in options:
+            if nxt not in parent:
+                parent[nxt] = (node, load)
+                queue.append(nxt)
+    if goal not in parent:
+        raise ValueError(f"❌ No hay plan con ronda lanzadera para base={base}, k={k}.")
+
+    trips, node = [], goal
+    while parent[node] is not None:
+        node, load = parent[node]
+        trips.append((node[3], load))
+    trips.reverse()
+    loads = [load for _, load in trips]
+    over = loads.index("over")
+    return tuple(trips[:over]), tuple(trips[over + 2:])
+
+
+def plan_trips(N: int, k: int) -> int:
+    """Number of trips of iter_solution(N, k) without generating them."""
+    b = shuttle_block(k)
+    if b < 1 or N < BASE_MIN * k + b:
+        moves = solve(N, k)
+        if moves is None:
+            raise ValueError(f"❌ The puzzle has no solution for N={N} and k={k}.")
+        return len(moves)
+    base, rounds = _base(N, k)
+    prefix, suffix = _plan(base, k)
+    return len(prefix) + 2 * rounds + len(suffix)
+
+
+def _base(N: int, k: int) -> tuple:
+    b = shuttle_block(k)
+    base = BASE_MIN * k + (N - BASE_MIN * k) % b
+    return base, (N - base) // b
+
+
+#####GENERATION#####
+def iter_solution(N: int, k: int):
+    """
+    Yields the moves of a valid solution for any solvable (N, k), in O(k) per trip.
+    """
+    b = shuttle_block(k)
+    if b < 1 or N < BASE_MIN * k + b:
+        moves = solve(N, k)
+        if moves is None:
+            raise ValueError(f"❌ The puzzle has no solution for N={N} and k={k}.")
+        yield from moves
+        return
+    base, rounds = _base(N, k)
+    prefix, suffix = _plan(base, k)
+    shuttle = ((LEFT, (k // 2, 0, 0, 0, 0)), (RIGHT, (1, 0, 0, 0, 0)))
+    yield from iter_moves(N, chain(prefix, chain.from_iterable(repeat(shuttle, rounds)), suffix))
+
+
+def iter_answer_text(N: int, k: int, moves_per_chunk: int = 50):
+    """
+    Yields the solution as answer text ('moves = [["A_1", "a_1"], ...]') in chunks of
+    `moves_per_chunk` moves.
+    """
+    yield "moves = ["
+    chunk, first = [], True
+    for move in iter_solution(N, k):
+        chunk.append(json.dumps(move))
+        if len(chunk) == moves_per_chunk:
+            yield ("" if first else ", ") + ", ".join(chunk)
+            chunk, first = [], False
+    if chunk:
+        yield ("" if first else ", ") + ", ".join(chunk)
+    yield "]"
+
+
+if __name__ == "__main__":
+    # Comprobación: óptimo frente al oráculo (N <= 200) y prueba de carga del checker con N = 10^5
+    import time
+    from riverSolver import min_trips
+    from riverEngine import RiverEngine
+    from movementValidator import RiverCrossingChecker
+
+    for k in range(4, 13):
+        for N in range(1, 201):
+            trips = plan_trips(N, k)
+            assert trips == min_trips(N, k), (N, k, trips, min_trips(N, k))
+            if N % 37 == 0 or N < 3 * k:
+                moves = list(iter_solution(N, k))
+                assert len(moves) == trips and RiverEngine(N, k, check_boat=True).check(moves), (N, k)
+    text = "".join(iter_answer_text(30, 5, moves_per_chunk=4))
+    assert json.loads(text[len("moves = "):]) == list(iter_solution(30, 5))
+    print("✅ Soluciones generadas válidas y con el número óptimo de viajes (N <= 200, 4 <= k <= 12)")
+
+    for N, k in ((100000, 4), (100000, 5), (100000, 8)):
+        t0 = time.perf_counter()
+        checker = RiverCrossingChecker(N, k, iter_solution(N, k))
+        valid = checker.check()
+        print(f"N={N} k={k} | {checker.steps:6d} viajes | válida: {valid} | "
+              f"generar + validar en streaming: {time.perf_counter() - t0:.2f} s")
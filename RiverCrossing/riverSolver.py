@@ -0,0 +1,339 @@
+"""
+Exact River Crossing solver and solvability oracle (symmetry-reduced BFS).
+
+The prompt builders hardcoded the solvability rule (`k in (2, 3) and N > 2*k - 1`) and we had no
+machine-checked minimal trip counts. Couples are interchangeable, so instead of explicit people a
+state only counts, with the boat on one side:
+
+    c   intact couples on the left bank
+    x   lone actors on the left (their agent is on the right; they are the right bank's lone agents)
+    y   lone agents on the left (their actor is on the right)
+
+A bank with a lone actor and any agent is unsafe, which leaves only 3N + 1 safe (c, x, y) states:
+(c, 0, 0), (N - y, 0, y) and (0, x, 0). A boat load is safe if it has no lone actor or no agent:
+
+    case 1   p couples + r agents of intact couples + t lone agents      (no unprotected actor)
+    case 2   q actors of intact couples + s lone actors                  (no agent)
+
+so the load taking a state to a given target is found in O(1) from the count deltas. Solved per
+target line, the valid loads of a state always reach one contiguous range of targets, so the BFS
+visits index ranges with a 'next unvisited' array instead of trying every load: exact solvability
+and the minimal number of trips in O(N) whatever k is (~20 ms for N = 1000, k = 4 ... 1000).
+Loads from the right bank reuse the left ones on the mirrored state.
+`solve` turns the optimal loads into explicit moves ([['A_1', 'a_1'], ...]) that RiverEngine
+accepts with the boat rule enabled.
+
+Example:
+    is_solvable(4, 2)        # False
+    min_trips(100, 4)        # optimal number of boat trips
+    moves = solve(3, 2)      # [['A_1', 'a_1'], ['A_1'], ['a_2', 'a_3'], ...], 11 trips
+"""
+from collections import deque
+from functools import lru_cache
+
+LEFT, RIGHT = 0, 1
+
+
+#####STATES#####
+def safe(N: int, c: int, x: int, y: int, extra: tuple = (0, 0)) -> bool:
+    """
+    True if both banks are safe. `extra` adds intact bystander couples to the (left, right)
+    banks; they are never moved but their agents count (used by riverGenerator).
+    """
+    right_couples = N - c - x - y + extra[1]
+    return (x == 0 or c + extra[0] + y == 0) and (y == 0 or right_couples + x == 0)
+
+
+def _mirror(N: int, c: int, x: int, y: int) -> tuple:
+    """The same counts seen from the right bank."""
+    return N - c - x - y, y, x
+
+
+def _load(c: int, x: int, y: int, target: tuple, k: int):
+    """
+    Boat load (p, q, r, s, t) taking the left bank from (c, x, y) to `target`, or None.
+    """
+    dc, dx, dy = target[0] - c, target[1] - x, target[2] - y
+    # Caso 1: parejas, agentes de parejas y agentes solos (ningún actor desprotegido en la barca)
+    r, t = dx, -dy
+    p = -dc - r
+    if p >= 0 and r >= 0 and t >= 0 and p + r <= c and t <= y and 1 <= 2 * p + r + t <= k:
+        return p, 0, r, 0, t
+    # Caso 2: solo actores (de parejas o solos)
+    q, s = dy, -dx
+    if dc == -q and q >= 0 and s >= 0 and q <= c and s <= x and 1 <= q + s <= k:
+        return 0, q, 0, s, 0
+    return None
+
+
+def _targets(N: int, c: int, x: int, y: int, k: int):
+    """Safe left-bank counts at most k people away from (c, x, y)."""
+    for c2 in range(max(0, c - k), c + 1):
+        yield c2, 0, 0
+    for y2 in range(max(1, y - k), min(N, y + k) + 1):
+        yield N - y2, 0, y2
+    for x2 in range(max(1, x - k), min(N, x + k) + 1):
+        yield 0, x2, 0
+
+
+def neighbours(N: int, k: int, state: tuple, extra: tuple = (0, 0)):
+    """Yields (next state, load) for every safe trip from (c, x, y, boat)."""
+    c, x, y, boat = state
+    if boat == RIGHT:
+        c, x, y = _mirror(N, c, x, y)
+    for target in _targets(N, c, x, y, k):
+        load = _load(c, x, y, target, k)
+        if load is None or not safe(N, *(target if boat == LEFT else _mirror(N, *target)), extra):
+            continue
+        if boat == RIGHT:
+            target = _mirror(N, *target)
+        yield (*target, 1 - boat), load
+
+
+#####SEARCH#####
+# Los estados seguros forman tres líneas: A (c, 0, 0) c = 0..N, B (N - y, 0, y) y = 1..N y
+# C (0, x, 0) x = 1..N; en los arrays de la BFS ocupan los índices 0..N, N+1..2N y 2N+1..3N
+_A, _B, _C = 0, 1, 2
+
+
+def _counts(N: int, line: int, i: int) -> tuple:
+    return (i, 0, 0) if line == _A else (N - i, 0, i) if line == _B else (0, i, 0)
+
+
+def _mirror_line(N: int, line: int, i: int) -> tuple:
+    """_mirror on a (line, index) state: A(c) <-> A(N - c), B(y) <-> C(y)."""
+    return (_A, N - i) if line == _A else (_C, i) if line == _B else (_B, i)
+
+
+def _intervals(N: int, k: int, line: int, i: int):
+    """
+    Targets of every trip from the boat's bank as (line, lo, hi) index ranges: solving _load for
+    each target line always gives one contiguous range (every target state is safe).
+    """
+    if line == _A:
+        c = i
+        if c >= 1:
+            yield _A, max(0, c - k // 2), c - 1                   # parejas
+            yield _C, max(1, 2 * c - k), c                         # parejas + agentes de parejas
+        if c == N:
+            yield _B, 1, min(k, N)                                 # actores de parejas
+    elif line == _B:
+        y, c = i, N - i
+        if y <= k:
+            yield _A, max(0, c - (k - y) // 2), c                  # agentes solos + parejas
+        yield _B, y + 1, min(N, y + k)                             # actores de parejas
+        yield _C, max(1, 2 * N - y - k), N - y                     # agentes solos, de parejas y parejas
+    else:
+        x = i
+        if x <= k:
+            yield _A, 0, 0                                         # todos los actores solos
+        yield _C, max(1, x - k), x - 1                             # actores solos
+
+
+def _index(N: int, line: int, i: int) -> int:
+    return i if line == _A else N + i if line == _B else 2 * N + i
+
+
+@lru_cache(maxsize=256)
+def _search(N: int, k: int):
+    """
+    BFS from everyone on the left to everyone on the right. Returns the optimal list of
+    (boat side, load) trips, or None if the instance has no solution.
+
+    The targets of a state are at most three index ranges, so each boat side keeps a 'next
+    unvisited index' array (with path halving) and every state is reached once: O(N) trips
+    examined whatever k is, instead of O(N·min(N, k)) with neighbours().
+    """
+    if N < 1 or k < 1:
+        raise ValueError(f"❌ Se necesita N ≥ 1 y k ≥ 1 (N={N}, k={k}).")
+    size = 3 * N + 1
+    unvisited = [list(range(size + 1)), list(range(size + 1))]     # size = centinela
+    parent = [[None] * size, [None] * size]
+
+    def find(free: list, j: int) -> int:
+        while free[j] != j:
+            free[j] = free[free[j]]
+            j = free[j]
+        return j
+
+    start, goal = (LEFT, _A, N), (RIGHT, _A, 0)
+    unvisited[LEFT][N] = N + 1
+    queue = deque([start])
+    while queue:
+        state = queue.popleft()
+        if state == goal:
+            break
+        boat, line, i = state
+        view = (line, i) if boat == LEFT else _mirror_line(N, line, i)
+        free = unvisited[1 - boat]
+        for target_line, lo, hi in _intervals(N, k, *view):
+            if lo > hi:
+                continue
+            if boat == RIGHT:
+                target_line, lo, hi = (_A, N - hi, N - lo) if target_line == _A else \
+                                      (_C if target_line == _B else _B, lo, hi)
+            base = _index(N, target_line, 0)
+            j = find(free, base + lo)
+            while j <= base + hi:
+                parent[1 - boat][j] = state
+                queue.append((1 - boat, target_line, j - base))
+                free[j] = j + 1
+                j = find(free, j + 1)
+    else:
+        return None
+
+    # Las cargas se reconstruyen con _load en el camino (de la orilla de la barca)
+    trips = []
+    while state != start:
+        boat, line, i = state
+        previous = parent[boat][_index(N, line, i)]
+        source, target = _counts(N, *previous[1:]), _counts(N, line, i)
+        if previous[0] == RIGHT:
+            source, target = _mirror(N, *source), _mirror(N, *target)
+        trips.append((previous[0], _load(*source, target, k)))
+        state = previous
+    return tuple(reversed(trips))
+
+
+def is_solvable(N: int, k: int) -> bool:
+    return _search(N, k) is not None
+
+
+def min_trips(N: int, k: int):
+    """Minimal number of boat trips, or None if the instance has no solution."""
+    trips = _search(N, k)
+    return None if trips is None else len(trips)
+
+
+def check_solvable(N: int, k: int) -> int:
+    """
+    Raises ValueError if (N, k) has no solution; otherwise returns the minimal number of trips.
+    """
+    if k < 1:
+        raise ValueError("❌ Boat capacity k must be at least 1.")
+    if N < 1:
+        raise ValueError("❌ There must be at least one actor and one agent (N ≥ 1).")
+    trips = min_trips(N, k)
+    if trips is None:
+        raise ValueError(f"❌ The puzzle has no solution for N={N} and k={k} (exhaustive search of every safe state).")
+    return trips
+
+
+def solvability_table(max_N: int, max_k: int) -> dict:
+    """{(N, k): minimal trips or None} for 1 <= N <= max_N and 1 <= k <= max_k."""
+    return {(N, k): min_trips(N, k) for N in range(1, max_N + 1) for k in range(1, max_k + 1)}
+
+
+#####MOVES#####
+def solve(N: int, k: int):
+    """
+    Optimal solution as explicit moves (lists of 'a_i' / 'A_i'), or None if there is none.
+    """
+    trips = _search(N, k)
+    return None if trips is None else list(iter_moves(N, trips))
+
+
+def iter_moves(N: int, trips):
+    """
+    Turns (boat side, load) trips into explicit moves, O(k) per trip, so the trips can be streamed.
+    """
+    # Por orilla: parejas completas, actores solos y agentes solos (dicts como conjuntos ordenados)
+    banks = [{"couple": dict.fromkeys(range(N, 0, -1)), "actor": {}, "agent": {}}, {"couple": {}, "actor": {}, "agent": {}}]
+
+    def take(group: dict) -> int:
+        # Cualquier persona del grupo sirve; popitem es O(1) aunque el dict haya tenido muchas bajas
+        return group.popitem()[0]
+
+    for boat, (p, q, r, s, t) in trips:
+        here, there = banks[boat], banks[1 - boat]
+        move = []
+        for _ in range(s):
+            i = take(here["actor"])
+            del there["agent"][i]
+            there["couple"][i] = None
+            move.append(f"a_{i}")
+        for _ in range(t):
+            i = take(here["agent"])
+            del there["actor"][i]
+            there["couple"][i] = None
+            move.append(f"A_{i}")
+        for _ in range(p):
+            i = take(here["couple"])
+            there["couple"][i] = None
+            move += [f"A_{i}", f"a_{i}"]
+        for _ in range(q):
+            i = take(here["couple"])
+            here["agent"][i] = None
+            there["actor"][i] = None
+            move.append(f"a_{i}")
+        for _ in range(r):
+            i = take(here["couple"])
+            here["actor"][i] = None
+            there["agent"][i] = None
+            move.append(f"A_{i}")
+        yield move
+
+
+if __name__ == "__main__":
+    # Comprobación frente a BFS sobre personas explícitas (N pequeño) y tiempos para N grandes
+    import time
+    from itertools import combinations
+    from riverEngine import RiverEngine
+
+    def explicit_bfs(N, k):
+        people = [f'a_{i+1}' for i in range(N)] + [f'A_{i+1}' for i in range(N)]
+
+        def safe(group):
+            agents = {p[2:] for p in group if p[0] == 'A'}
+            return not agents or all(p[2:] in agents for p in group if p[0] == 'a')
+
+        start = (frozenset(people), LEFT)
+        depth, queue = {start: 0}, deque([start])
+        while queue:
+            left, boat = state = queue.popleft()
+            if not left:
+                return depth[state]
+            side = left if boat == LEFT else frozenset(people) - left
+            for size in range(1, k + 1):
+                for group in combinations(sorted(side), size):
+                    new_left = left - set(group) if boat == LEFT else left | set(group)
+                    right = frozenset(people) - new_left
+                    nxt = (new_left, 1 - boat)
+                    if safe(group) and safe(new_left) and safe(right) and nxt not in depth:
+                        depth[nxt] = depth[state] + 1
+                        queue.append(nxt)
+        return None
+
+    def plain_bfs(N, k):
+        start, goal = (N, 0, 0, LEFT), (0, 0, 0, RIGHT)
+        depth, queue = {start: 0}, deque([start])
+        while queue:
+            state = queue.popleft()
+            if state == goal:
+                return depth[state]
+            for nxt, _ in neighbours(N, k, state):
+                if nxt not in depth:
+                    depth[nxt] = depth[state] + 1
+                    queue.append(nxt)
+        return None
+
+    for N in range(1, 5):
+        for k in range(1, 5):
+            assert min_trips(N, k) == explicit_bfs(N, k), (N, k)
+    for N in range(1, 41):
+        for k in range(1, N + 3):
+            assert min_trips(N, k) == plain_bfs(N, k), (N, k)
+    for N in range(1, 31):
+        for k in range(1, 7):
+            moves = solve(N, k)
+            # Regla cerrada de los scripts: k=1 imposible, k=2 hasta N=3, k=3 hasta N=5, k>=4 siempre
+            assert (moves is not None) == (k >= 4 or (k == 2 and N <= 3) or (k == 3 and N <= 5)), (N, k)
+            if moves is not None:
+                assert len(moves) == min_trips(N, k) and RiverEngine(N, k, check_boat=True).check(moves), (N, k)
+    print("✅ Oráculo = BFS explícito (N, k <= 4), BFS sobre neighbours (N <= 40) y soluciones válidas con la regla de la barca (N <= 30)")
+
+    for N, k in ((100, 4), (1000, 4), (1000, 6), (1000, 3), (1000, 50), (1000, 200), (1000, 1000)):
+        _search.cache_clear()
+        t0 = time.perf_counter()
+        trips = min_trips(N, k)
+        print(f"N={N:4d} k={k:4d} | viajes mínimos: {str(trips):>5} | {1000 * (time.perf_counter() - t0):8.1f} ms")
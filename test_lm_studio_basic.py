@@ -1,8 +1,9 @@
+import os
 import requests
 import json
 
 # Configuración básica
-url = "http://127.0.0.1:1234/v1/chat/completions"
+url = os.getenv("LM_STUDIO_URL", "http://127.0.0.1:1234/v1/chat/completions")
 model = "deepseek/deepseek-r1-0528-qwen3-8b"
 
 # System prompt exacto de River Crossing
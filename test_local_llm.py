@@ -1,7 +1,8 @@
+import os
 import requests
 import json
 
-url = "http://127.0.0.1:1234/v1/chat/completions"
+url = os.getenv("LM_STUDIO_URL", "http://127.0.0.1:1234/v1/chat/completions")
 model = "deepseek/deepseek-r1-0528-qwen3-8b"
 
 system_prompt = ("You are a helpful assistant. Solve this puzzle for me. You can represent actors with a_1, a_2, ... "